@@ -1,9 +1,11 @@
-from typing import List, Set
+from typing import List, Set, Tuple
 from Lane import Lane, CarLane, BusLane, LeftTurnLane
 from exceptions import TooManyVehiclesException, NotEnoughLanesException
 from Box import Box
 from Vehicle import Vehicle
-from bisect import bisect_right
+from VehicleStore import VehicleStore
+import numpy as np
+import math
 
 class Arm:
     """
@@ -53,6 +55,10 @@ class Arm:
         # the number of people that have left the junction
         self._total_person_count: int = 0
 
+        # the distance of the closest vehicle to the junction, and the lanes' store versions when it was found
+        self._nearest_vehicle_distance: float = math.inf
+        self._nearest_lane_versions: List[int] = None
+
     @property
     def length(self) -> int:
         """ Returns the length of the arm """
@@ -68,6 +74,44 @@ class Arm:
         """ Returns the longest queue seen at any given point """
         return self._max_queue_length
     
+    @property
+    def nearest_vehicle_distance(self) -> float:
+        """
+        Returns the distance from the junction of the closest vehicle in the arm, or infinity if the arm is empty.
+        Kept from when the vehicles last moved, unless vehicles have joined or left a lane since.
+        """
+        if [lane.vehicles.version for lane in self._lanes] != self._nearest_lane_versions:
+            self.update_nearest_vehicle_distance()
+        return self._nearest_vehicle_distance
+
+    def update_nearest_vehicle_distance(self) -> None:
+        """ Finds the distance from the junction of the closest vehicle in the arm """
+        first_vehicles = [lane.get_first_vehicle() for lane in self._lanes]
+        self._nearest_vehicle_distance = min([float(vehicle.distance) for vehicle in first_vehicles if vehicle], default=math.inf)
+        self._nearest_lane_versions = [lane.vehicles.version for lane in self._lanes]
+    
+    def get_state(self) -> dict:
+        """ Returns the arm's running totals and lane queue lengths, for a snapshot of the junction """
+        return {
+            "max_queue_length": self._max_queue_length,
+            "total_wait_times": self._total_wait_times,
+            "total_car_count": self._total_car_count,
+            "max_wait_time": self._max_wait_time,
+            "total_person_count": self._total_person_count,
+            "queue_lengths": [lane.queue_length for lane in self._lanes],
+        }
+
+    def set_state(self, state: dict) -> None:
+        """ Restores what get_state returned. The lanes' vehicles are restored separately. """
+        self._max_queue_length = state["max_queue_length"]
+        self._total_wait_times = state["total_wait_times"]
+        self._total_car_count = state["total_car_count"]
+        self._max_wait_time = state["max_wait_time"]
+        self._total_person_count = state["total_person_count"]
+        for lane, queue_length in zip(self._lanes, state["queue_lengths"]):
+            lane.queue_length = queue_length
+        self.update_nearest_vehicle_distance()
+
     def create_lanes(self, bus_lane: bool, left_turn_lane: bool, width: int, length: int, num_lanes: int) -> None:
         """ Creates the lanes for this arm of the junction """
         self._lanes = []
@@ -94,6 +138,9 @@ class Arm:
                 self._lanes.append(CarLane(self._allowed_directions[i], width / num_lanes, length, self._num_arms))
 
     
+    def get_lanes(self) -> List[Lane]:
+        return self._lanes
+
     def get_lane(self, lane_num: int) -> Lane:
         return self._lanes[lane_num] if lane_num < len(self._lanes) else None
     
@@ -128,50 +175,119 @@ class Arm:
         # change lanes
         self.handle_lane_switching()
 
-    def handle_lane_switching(self):
-        """ Attempts lane switching for all vehicles in the arm of a junction, prioritising shortest lane """
-
-        previous_lane = None
-        vehicles_to_remove = [] # list of vehicles and what lane we want to remove them from
+        # the vehicles have moved, so find the closest one to the junction for the traffic light
+        self.update_nearest_vehicle_distance()
 
+    def handle_lane_switching(self):
+        """
+        Attempts lane switching for all vehicles in the arm of a junction, prioritising shortest lane. Lanes are only
+        looked at while they are at least two vehicles longer than a neighbour, and each lane's next merge is found
+        in one pass over its vehicles.
+        """
         for i, current_lane in enumerate(self._lanes):
-            
             # get adjacent lanes
-            adjacent_lanes: list[Lane] = []
-            if previous_lane:
-                adjacent_lanes.append(previous_lane)
-            if i < len(self._lanes) - 1:
-                adjacent_lanes.append(self._lanes[i + 1])
+            adjacent_lanes: list[Lane] = self._lanes[max(i - 1, 0):i] + self._lanes[i + 1:i + 2]
 
-            
-            for vehicle in current_lane.vehicles:
+            # the vehicles from this position in the queue back may still switch lanes
+            start = 0
+            while adjacent_lanes:
                 # sort the adjacent lanes by min queue_length to prioritise shorter lanes
                 adjacent_lanes.sort(key=lambda lane: lane.queue_length)
 
                 # stop checking if no more vehicles can switch lanes
-                if len(adjacent_lanes) > 0 and current_lane.queue_length - adjacent_lanes[0].queue_length < 2:
+                if current_lane.queue_length - adjacent_lanes[0].queue_length < 2:
                     break
 
-                for new_lane in adjacent_lanes:
-                    # check if the vehicle can merge into a new lane if the current lane is shorter
-                    # and goes where the vehicle wants to go
-                    if self.is_new_lane_shorter(current_lane, new_lane) and new_lane.can_enter_lane(vehicle):
-                        
-                        # stop looping if the vehicle has successfully merged into the new lane
-                        if self.move_vehicle_to_lane(vehicle, current_lane, new_lane):
-                            vehicles_to_remove.append((current_lane, vehicle))
-                            break
-
-            # update the previous lane
-            previous_lane = current_lane
-        
-        # remove all vehicles from the lanes they have switched to
-        for lane, vehicle in vehicles_to_remove:
-            lane.remove_vehicle(vehicle)
+                lane_switch = self.find_lane_switch(current_lane, adjacent_lanes, start)
+                if lane_switch is None:
+                    break
+                start, new_lane = lane_switch
+                self.move_vehicle_to_lane(current_lane.vehicles[start], current_lane, new_lane)
+
+    def find_lane_switch(self, current_lane: Lane, adjacent_lanes: List[Lane], start: int):
+        """
+        Finds the first vehicle from a position in a lane back that can merge into a shorter adjacent lane,
+        checking every vehicle against every lane at once
+
+        :param adjacent_lanes: The lanes next to the current lane, in the order a vehicle should try them
+        :param start: The position in the queue of the first vehicle to check
+        :return: The vehicle's position in the queue and the lane it should merge into, or None if no vehicle can
+        """
+        vehicles = current_lane.vehicles
+        if len(vehicles) <= start:
+            return None
+
+        # a vehicle can't switch lanes once it has reached the junction
+        moving = vehicles.distance[start:] != 0
+        can_merge = []
+        for new_lane in adjacent_lanes:
+            if self.is_new_lane_shorter(current_lane, new_lane):
+                can_merge.append(moving & new_lane.can_enter_lane_mask(vehicles)[start:]
+                                 & self.merge_space_mask(vehicles, start, new_lane))
+            else:
+                can_merge.append(np.zeros(len(moving), bool))
+
+        any_lane = np.logical_or.reduce(can_merge)
+        if not any_lane.any():
+            return None
+        index = int(any_lane.argmax())
+        # the vehicle goes into the first lane it can, in the order given
+        for new_lane, lane_mask in zip(adjacent_lanes, can_merge):
+            if lane_mask[index]:
+                return start + index, new_lane
+
+    def merge_space_mask(self, vehicles: VehicleStore, start: int, lane: Lane) -> np.ndarray:
+        """
+        Checks which vehicles from a position in a queue back would have enough space to merge into a lane, as
+        enough_space_to_merge does for one vehicle
+
+        :return: True for each vehicle that would fit between the vehicles ahead of and behind it in the lane
+        """
+        distances = vehicles.distance[start:]
+        lane_distances, lane_lengths, lane_stopping_distances = lane.vehicles.distance, lane.vehicles.length, lane.vehicles.stopping_distance
+        if len(lane_distances) == 0:
+            return np.ones(len(distances), bool)
+
+        # find where each vehicle would be inserted, then check the space to the vehicles ahead and behind
+        indexes = np.searchsorted(lane_distances, distances, "right")
+        ahead = np.maximum(indexes - 1, 0)
+        behind = np.minimum(indexes, len(lane_distances) - 1)
+        space_ahead = (indexes == 0) | (distances - lane_distances[ahead] - lane_lengths[ahead] > vehicles.stopping_distance[start:])
+        space_behind = (indexes == len(lane_distances)) | (lane_distances[behind] - distances - vehicles.length[start:] > lane_stopping_distances[behind])
+        return space_ahead & space_behind
+
+    def can_switch_lanes(self) -> bool:
+        """ Checks if handle_lane_switching would move any vehicle, without moving them """
+        for i, current_lane in enumerate(self._lanes):
+            adjacent_lanes = sorted(self._lanes[max(i - 1, 0):i] + self._lanes[i + 1:i + 2], key=lambda lane: lane.queue_length)
+            if len(adjacent_lanes) == 0 or current_lane.queue_length - adjacent_lanes[0].queue_length < 2:
+                continue
+            if self.find_lane_switch(current_lane, adjacent_lanes, 0) is not None:
+                return True
+        return False
+
+    def is_stationary(self, traffic_light_dir: int, junction_box: Box, update_length_ms: int, arm_id: int) -> bool:
+        """ Checks if no vehicle in the arm would move, leave or switch lanes in the next step """
+        for i, lane in enumerate(self._lanes):
+            if not lane.is_stationary(traffic_light_dir, update_length_ms, junction_box, arm_id, i):
+                return False
+        return not self.can_switch_lanes()
+
+    def can_release(self, traffic_light_dir: int, arm_id: int) -> bool:
+        """ Checks if any lane in the arm may let vehicles into the box with the traffic light as it is """
+        if traffic_light_dir == arm_id:
+            return True
+        return traffic_light_dir != -1 and any(isinstance(lane, LeftTurnLane) for lane in self._lanes)
+
+    def add_wait_time(self, wait_time_ms: float) -> None:
+        """ Adds to the wait time of every vehicle in the arm, for steps in which none of them move """
+        for lane in self._lanes:
+            lane.add_wait_time(wait_time_ms)
 
     def move_vehicle_to_lane(self, vehicle : Vehicle, current_lane: Lane, target_lane: Lane) -> bool:
         """
-        Moves a given vehicle into a new lane at a specified position
+        Moves a given vehicle into a new lane at a specified position. Adding the vehicle to the new lane
+        takes it out of the current one.
 
         :param vehicle: the vehicle we want to move
         :param current_lane: the lane the vehicle is currently in
@@ -185,7 +301,7 @@ class Arm:
             # add vehicle to new lane at specified index
             target_lane.add_vehicle_to_index(vehicle, new_lane_index)
 
-            # update current lane count (as if the vehicle has been removed) to ensure proper sorting
+            # update current lane count now the vehicle has been removed to ensure proper sorting
             current_lane.queue_length -= 1
 
             # return true, indicating vehicle has merged successfully
@@ -209,25 +325,8 @@ class Arm:
         if vehicle.distance == 0:
             return -1
 
-        # perform a binary search to find the index where the new vehicle would be inserted
-        vehicle_positions_arr = [v.distance for v in lane.vehicles]
-        new_vehicle_index = bisect_right(vehicle_positions_arr, vehicle.distance)
-
-        # find the vehicle ahead and behind of where the vehicle would be
-        vehicle_ahead = lane.vehicles[new_vehicle_index - 1] if new_vehicle_index > 0 else None
-        vehicle_behind = lane.vehicles[new_vehicle_index] if new_vehicle_index < len(lane.vehicles) else None
-
-        # check the space between the vehicle ahead and behind to ensure adequate space
-        if vehicle_ahead and vehicle.distance - vehicle_ahead.distance - vehicle_ahead.length <= vehicle.stopping_distance:
-            # return -1 to indicate we can't move into this lane
-            return -1
-        
-        # check if there is enough space for the vehicle behind to adequately stop
-        if vehicle_behind and vehicle_behind.distance - vehicle.distance - vehicle.length <= vehicle_behind.stopping_distance:
-            return -1
-    
-        # return the index the vehicle should be isnerted
-        return new_vehicle_index
+        # search the lane's positions for where the vehicle would be inserted and check the space either side
+        return lane.get_merge_index(vehicle.distance, vehicle.length, vehicle.stopping_distance)
 
     def is_new_lane_shorter(self, current_lane: Lane, new_lane: Lane) -> bool:
         """ Checks if there is at least two cars difference between two adjacent lanes """
@@ -237,6 +336,29 @@ class Arm:
     def get_kpi(self) -> List[float]:
         """ Returns the key performance indicators for this arm of the junction """
         # calculate the efficiency
+        total_wait_time, max_wait_time, total_vehicles = self.get_wait_totals()
+        average_wait_time = total_wait_time / total_vehicles if total_vehicles != 0 else 0
+        
+        # return the key kpi stats
+        return [round(average_wait_time, 1), round(max_wait_time, 1), self._max_queue_length]
+
+    def get_kpi_lower_bound(self, num_arrivals: int) -> List[float]:
+        """
+        Returns the lowest key performance indicators this arm could have once more vehicles have arrived. Wait
+        times and queue lengths never fall, so at best the wait so far is shared among every vehicle.
+
+        :param num_arrivals: The number of vehicles still to arrive
+        """
+        total_wait_time, max_wait_time, total_vehicles = self.get_wait_totals()
+        total_vehicles += num_arrivals
+        average_wait_time = total_wait_time / total_vehicles if total_vehicles != 0 else 0
+        return [round(average_wait_time, 1), round(max_wait_time, 1), self._max_queue_length]
+
+    def get_wait_totals(self) -> Tuple[float, float, int]:
+        """
+        Returns the total and maximum wait time in seconds of every vehicle to have arrived in this arm, including
+        those still queueing, and the number of those vehicles
+        """
         total_wait_time = self._total_wait_times
         max_wait_time = self._max_wait_time
 
@@ -250,16 +372,27 @@ class Arm:
                 if vehicle_wait_time > max_wait_time:
                     max_wait_time = vehicle_wait_time
 
-        
         total_vehicles = self._total_car_count + sum(len(lane.vehicles) for lane in self._lanes)
-        average_wait_time = total_wait_time / total_vehicles if total_vehicles != 0 else 0
-        
-        # return the key kpi stats
-        return [round(average_wait_time, 1), round(max_wait_time, 1), self._max_queue_length]
+        return total_wait_time, max_wait_time, total_vehicles
 
     def get_total_car_count(self) -> int:
         """Returns total car count for this arm of the junction"""
         return self._total_car_count
+
+    def get_total_wait_time(self) -> float:
+        """ Returns the total wait time in seconds of the vehicles that have left this arm """
+        return self._total_wait_times
+
+    def reset_kpis(self) -> None:
+        """
+        Start collecting the key performance indicators afresh, at the end of a warm-up period. Vehicles still
+        queueing keep their wait so far, and the longest queue starts from the current one.
+        """
+        self._total_wait_times = 0
+        self._total_car_count = 0
+        self._max_wait_time = 0
+        self._total_person_count = 0
+        self._max_queue_length = self.get_current_queue_length()
     
     def get_current_queue_length(self) -> int:
         """ Returns the length of the largest queue of vehicles currently in this arm of the junction to be used for graphing"""
@@ -282,12 +415,7 @@ class Arm:
         """ Create a new vehicle in the first """
         furthest_car_distance = 0
         for lane in self._lanes:
-            vehicle = lane.get_last_vehicle()
-            if vehicle == None:
-                dist = 0
-            else:
-                dist = vehicle.distance + vehicle.length + vehicle.stopping_distance
-            furthest_car_distance = max(furthest_car_distance, dist)
+            furthest_car_distance = max(furthest_car_distance, lane.get_tail_position())
         start_position = furthest_car_distance
         if start_position > self._length:
             raise TooManyVehiclesException
@@ -1,39 +1,154 @@
 from Vehicle import Vehicle
+from VehicleStore import VehicleStore
+from typing import List
+import math
+import numpy as np
 
 class Box:
-    def __init__(self, 
-                 lane_width: int, 
-                 maximum_lane_count: int):
-        self._vehicles: list[Vehicle] = list()
+    def __init__(self,
+                 lane_width: int,
+                 maximum_lane_count: int,
+                 num_arms: int = 4):
+        self._vehicles: VehicleStore = VehicleStore()
         """
         The size of the junction is equal to the width of each lane times the maximum number of lanes
         in a given arm.
         """
         self._size = lane_width * maximum_lane_count * 2
         self._arm_throughputs = [0, 0, 0, 0]
+        self._num_arms = num_arms
+        self._maximum_lane_count = maximum_lane_count
+        self._build_conflict_index()
 
     def add_vehicle(self, vehicle: Vehicle) -> None:
-        """Add a new vehicle to the box adding the box size to its distance and adding it to the list"""
+        """
+        Add a new vehicle to the box adding the box size to its distance. Vehicles are kept in the order they will
+        leave the box, so the ones leaving are always at the front.
+        """
         vehicle.set_position(self._size + vehicle.distance)
-        self._vehicles.append(vehicle)
+        speed = float(vehicle.speed)
+        exit_time = float(vehicle.distance) / speed if speed else np.inf
+        with np.errstate(divide="ignore", invalid="ignore"):
+            exit_times = self._vehicles.distance / self._vehicles.speed
+        self._vehicles.insert(int(np.searchsorted(exit_times, exit_time, "right")), vehicle)
+        self._update_conflict_index([vehicle], 1)
 
     def move_all_vehicles(self, update_length_ms: int) -> None:
         """ Move all vehicles in the box and delete any that have left"""
-        vehicles_to_delete: list[Vehicle] = []
-        for vehicle in self._vehicles:
-            #Move each vehicle
-            vehicle.set_position(vehicle.get_next_position(update_length_ms))
-            #If distance is less than 0, set vehicle to be deleted
-            if (vehicle.distance <= 0):
-                vehicles_to_delete.append(vehicle)
-                self._arm_throughputs[vehicle.source] += 1
-        if len(vehicles_to_delete) != 0:
-            #Remove all vehicles have distances below 0
-            self._vehicles = [v for v in self._vehicles if v not in vehicles_to_delete]
-
-
-    def get_vehicles(self) -> list[Vehicle]:
+        if not self._vehicles:
+            return
+        #Move every vehicle at once
+        distances = self._vehicles.distance
+        distances -= self._vehicles.speed * update_length_ms / 1000
+        #If distance is less than 0, the vehicle has left the box
+        exited = distances <= 0
+        #Vehicles leave from the front, so count how many have left there
+        leaving = len(exited) if exited.all() else int(exited.argmin())
+        if exited[leaving:].any():
+            #Rounding has put a vehicle out of order, so remove them wherever they are
+            leaving_vehicles = self._vehicles.remove_where(exited)
+        elif leaving:
+            leaving_vehicles = self._vehicles.remove_front(leaving)
+        else:
+            return
+        for vehicle in leaving_vehicles:
+            self._arm_throughputs[vehicle.source] += 1
+        self._update_conflict_index(leaving_vehicles, -1)
+
+    def is_path_blocked(self, source: int, lane_id: int, relative_direction: int) -> bool:
+        """
+        Returns true if a vehicle in the box from the same arm crosses the path of a vehicle leaving the given lane:
+        one from a lane to the left turning further right, or from a lane to the right turning further left.
+
+        :param relative_direction: The number of arms anticlockwise the vehicle is going. 1 = right, 2 = forward, 3 = left
+        """
+        if not self._vehicles:
+            return False
+        self._check_conflict_index()
+        return self._lane_conflicts[source][min(lane_id, self._lane_rows - 1)][relative_direction] > 0
+
+    def is_destination_taken(self, destination: int, source: int) -> bool:
+        """ Returns true if a vehicle in the box from a different arm is going to the given destination """
+        if not self._vehicles:
+            return False
+        self._check_conflict_index()
+        return self._destination_totals[destination] > self._destination_counts[destination][source]
+
+    def _build_conflict_index(self) -> None:
+        """
+        Index the vehicles in the box by where they block. _lane_conflicts counts, for a vehicle from each arm, lane
+        and relative direction, the vehicles in the box its path crosses. The extra last lane stands for any lane
+        past the last one a vehicle in the box came from. _destination_counts counts the vehicles going to each arm
+        from each arm.
+        """
+        lane_ids = [lane for lane in self._vehicles.source_lane.tolist() if lane != VehicleStore.NO_LANE]
+        self._lane_rows = max([self._maximum_lane_count] + [lane + 1 for lane in lane_ids]) + 1
+        self._lane_conflicts = [[[0] * self._num_arms for _ in range(self._lane_rows)] for _ in range(self._num_arms)]
+        self._destination_counts = [[0] * self._num_arms for _ in range(self._num_arms)]
+        self._destination_totals = [0] * self._num_arms
+        self._indexed_version = None
+        self._update_conflict_index(self._vehicles, 1)
+
+    def _update_conflict_index(self, vehicles: List[Vehicle], change: int) -> None:
+        """ Add (change = 1) or remove (change = -1) vehicles that have just entered or left the box in the index """
+        if self._indexed_version is not None and self._indexed_version + 1 != self._vehicles.version:
+            #The box was changed without going through add_vehicle or move_all_vehicles, so index it from scratch
+            self._build_conflict_index()
+            return
+
+        for vehicle in vehicles:
+            source, destination = int(vehicle.source), int(vehicle.destination)
+            self._destination_counts[destination][source] += change
+            self._destination_totals[destination] += change
+
+            source_lane = vehicle.source_lane
+            if source_lane is None:
+                continue
+            source_lane, direction = int(source_lane), (source - destination) % self._num_arms
+            if source_lane >= self._lane_rows - 1:
+                self._build_conflict_index()
+                return
+            conflicts = self._lane_conflicts[source]
+            #Block vehicles in lanes to the right turning further left than this one
+            for lane in range(source_lane + 1, self._lane_rows):
+                for blocked_direction in range(direction + 1, self._num_arms):
+                    conflicts[lane][blocked_direction] += change
+            #Block vehicles in lanes to the left turning further right than this one
+            for lane in range(source_lane):
+                for blocked_direction in range(direction):
+                    conflicts[lane][blocked_direction] += change
+        self._indexed_version = self._vehicles.version
+
+    def _check_conflict_index(self) -> None:
+        """ Rebuild the index if the box was changed without going through add_vehicle or move_all_vehicles """
+        if self._indexed_version != self._vehicles.version:
+            self._build_conflict_index()
+
+    def get_state(self) -> dict:
+        """ Returns the box's throughputs, for a snapshot of the junction """
+        return {"arm_throughputs": list(self._arm_throughputs)}
+
+    def set_state(self, state: dict) -> None:
+        """ Restores what get_state returned, once the box's vehicles have been restored """
+        self._arm_throughputs = list(state["arm_throughputs"])
+        self._build_conflict_index()
+
+    def get_steps_until_exit(self, update_length_ms: int) -> float:
+        """
+        Returns a number of simulation steps the box can be moved for without any vehicle leaving it,
+        or infinity if it is empty. Errs a step on the short side, so rounding can never let a vehicle leave early.
+        """
+        if not self._vehicles:
+            return math.inf
+        steps = np.ceil(self._vehicles.distance / (self._vehicles.speed * update_length_ms / 1000)).min()
+        return max(int(steps) - 2, 0)
+
+    def get_vehicles(self) -> VehicleStore:
         return self._vehicles
 
     def get_arm_throughputs(self):
         return self._arm_throughputs
+
+    def reset_throughputs(self) -> None:
+        """ Start counting the vehicles leaving afresh, at the end of a warm-up period """
+        self._arm_throughputs = [0] * len(self._arm_throughputs)
@@ -3,9 +3,15 @@ from Box import Box
 from TrafficLight import TrafficLight
 import Lane
 import Vehicle
-from typing import List, Set
+from VehicleStore import VehicleStore
+from steady_state import confidence_half_width, mser_truncation_point
+from profiling import PhaseProfile
+from typing import Callable, List, Set, Tuple
 from exceptions import TooManyVehiclesException, NotEnoughLanesException
 import numpy as np
+import json
+import math
+import io
 
 class Junction:
     #Assume lanes are 3m wide, 10000m long (length is to halt early if the junction cannot handle throughput)
@@ -19,11 +25,20 @@ class Junction:
     #Set to 5s (2s all red time, 3s red+amber for next direction)
     TRAFFIC_LIGHT_GAP_MS: int = 5000
 
-    # stores the max queue length at given intervals of the simulation for each arm
-    _queue_length_array: List[List[int]] = [[] * 4 for _ in range(4)]
+    #Most steps between checks for an idle stretch in event driven simulations
+    MAX_IDLE_CHECK_INTERVAL: int = 8
 
-    # the amount of time that should pass before we update the queue length
-    _queue_length_timer: int = 0
+    #Arrivals are drawn this far ahead at a time
+    ARRIVAL_CHUNK_MS: int = 60000
+
+    #Defaults for simulate_until_steady: the length of each batch, the fewest batches to judge convergence from,
+    #and the widest 95% confidence interval of the average wait allowed, relative to the average
+    STEADY_STATE_BATCH_MS: int = 120000
+    STEADY_STATE_MIN_BATCHES: int = 8
+    STEADY_STATE_PRECISION: float = 0.05
+
+    #Format of the data written by snapshot. Snapshots in any other format are refused by restore
+    SNAPSHOT_VERSION: int = 2
 
     def __init__(self,
                  traffic_data: list[list[int]],
@@ -35,18 +50,45 @@ class Junction:
                  p_crossing_freq: float = 0,
                  bus_lane: bool = False,
                  bus_ratio: float = 0,
-                 left_turn_lanes: bool = False):
+                 left_turn_lanes: bool = False,
+                 seed: int = None,
+                 queue_sample_interval_ms: int = None,
+                 max_queue_samples: int = 1000,
+                 warm_up_ms: int = 0,
+                 max_step_ms: int = None):
         """
         Initialise junction
         :param traffic_data: The number of vehicles per hour from each arm to another. The first index is the source arm and the second is the destination, numbered clockwise from north.
         :param num_lanes: number of lanes per arm and direction.
         :param pedestrian_crossing: True if a pedestrian crossing is present, false otherwise
+        :param seed: Seed for the random number generator. Junctions built with the same seed see the same random streams.
+        :param queue_sample_interval_ms: How often to record the longest queue in each arm, counted from when the junction started. Defaults to ten times over each call to simulate.
+        :param max_queue_samples: The number of queue length samples to keep. Once full, new samples overwrite the oldest.
+        :param warm_up_ms: How long to simulate before collecting KPIs, so they leave out the junction filling up from empty.
+        :param max_step_ms: The longest step simulate may take while no vehicle is about to reach the junction or a light is about to change. Steps are always update_length_ms if not given.
         """
+        #Keep the parameters, so a snapshot can rebuild the junction before restoring its state
+        self._parameters = {
+            "traffic_data": np.asarray(traffic_data).tolist(),
+            "allowed_lane_directions": allowed_lane_directions,
+            "traffic_light_interval_ms": traffic_light_interval_ms,
+            "num_lanes": num_lanes,
+            "pedestrian_crossing": pedestrian_crossing,
+            "p_crossing_time_s": p_crossing_time_s,
+            "p_crossing_freq": p_crossing_freq,
+            "bus_lane": bus_lane,
+            "bus_ratio": bus_ratio,
+            "left_turn_lanes": left_turn_lanes,
+            "queue_sample_interval_ms": queue_sample_interval_ms,
+            "max_queue_samples": max_queue_samples,
+            "warm_up_ms": warm_up_ms,
+            "max_step_ms": max_step_ms,
+        }
         #If no lane directions are given, allow all directions
         if allowed_lane_directions == None:
             allowed_lane_directions = [{i for i in range(self.NUM_ARMS)} for _ in range(num_lanes)]
         #Initialise random number generator
-        self._random = np.random.default_rng()
+        self._random = np.random.default_rng(seed)
         #Initialise traffic data
         self._traffic_data = traffic_data
         #Precompute scale values for exponential random distribution
@@ -54,8 +96,18 @@ class Junction:
         #Initialise number and directions of lanes
         self._num_lanes: int = num_lanes
         self._allowed_lane_directions = allowed_lane_directions
-        #Initialise time between vehicle creation to 0 for all pairs of sources and destinations
-        self._vehicle_timers_ms:int = np.zeros((self.NUM_ARMS, self.NUM_ARMS))
+        #Arrivals get their own random stream, so when they are drawn doesn't change what the traffic light draws
+        self._arrival_random = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+        #Schedule of upcoming arrivals in time order: when each arrives, its source and destination pair
+        #(source * NUM_ARMS + destination) and whether it is a bus
+        self._arrival_times_ms = np.zeros(0)
+        self._arrival_pairs = np.zeros(0, np.int64)
+        self._arrival_buses = np.zeros(0, bool)
+        #Position in the schedule of the next arrival, and the time arrivals have been drawn up to
+        self._next_arrival: int = 0
+        self._scheduled_until_ms: int = 0
+        #Time of the first arrival not yet in the schedule for each pair. The first vehicle of each pair arrives straight away
+        self._pair_next_arrival_ms = np.zeros(self.NUM_ARMS * self.NUM_ARMS)
 
         #Initialise traffic light
         self._traffic_light = TrafficLight(self.NUM_ARMS, 
@@ -82,7 +134,24 @@ class Junction:
             )
             for i in range (4)
         ]
-        self._box = Box(self.LANE_WIDTH, self._num_lanes)
+        self._box = Box(self.LANE_WIDTH, self._num_lanes, self.NUM_ARMS)
+
+        #Time simulated so far
+        self._elapsed_ms: int = 0
+        #Longest queue in each arm over time, kept in a fixed size ring buffer of the latest samples
+        self._queue_sample_interval_ms = queue_sample_interval_ms
+        self._queue_sample_times_ms = np.zeros(max_queue_samples)
+        self._queue_length_samples = np.zeros((max_queue_samples, self.NUM_ARMS), np.int64)
+        self._queue_sample_count: int = 0
+
+        #Timings of each phase of the simulation steps, if profiling is enabled
+        self._profile: PhaseProfile = None
+
+        #KPIs and throughputs are collected from the end of the warm-up period, if there is one
+        self._warm_up_ms = warm_up_ms
+        self._warming_up: bool = warm_up_ms > 0
+        #Adaptive steps are whole numbers of update_length_ms up to max_step_ms
+        self._max_step_ms = max_step_ms
 
 
     def __str__(self):
@@ -101,6 +170,24 @@ class Junction:
         kpi_list = [arm.get_kpi() for arm in self._arms]
         return kpi_list
 
+    def get_kpi_lower_bounds(self, end_ms: int) -> List[List[float]]:
+        """
+        Returns the lowest KPIs each arm could have once simulated up to a given time. Arrivals are drawn from their
+        own random stream, so drawing them ahead to count the vehicles still to come doesn't change the simulation.
+        During a warm-up period the bounds are all 0.
+
+        :param end_ms: The time the simulation will run to in milliseconds
+        """
+        if self._warming_up:
+            #The KPIs so far will be thrown away at the end of the warm-up, so nothing can be ruled out yet
+            return [[0, 0, 0] for _ in self._arms]
+        while self._scheduled_until_ms <= end_ms:
+            self.schedule_arrivals()
+        last = int(np.searchsorted(self._arrival_times_ms, end_ms, "right"))
+        sources = self._arrival_pairs[self._next_arrival:last] // self.NUM_ARMS
+        arrivals = np.bincount(sources, minlength=self.NUM_ARMS).tolist()
+        return [arm.get_kpi_lower_bound(num_arrivals) for arm, num_arrivals in zip(self._arms, arrivals)]
+
     def get_total_car_count(self) -> List[int]:
         """Retruns a list of the total throughput for each arm of the junction"""
         junction_throughput = [arm.get_total_car_count() for arm in self._arms]
@@ -112,33 +199,353 @@ class Junction:
     
     def get_arm_throughputs(self):
         return self._box.get_arm_throughputs()
+
+    def get_elapsed_ms(self) -> int:
+        """ Returns the time simulated so far in milliseconds """
+        return self._elapsed_ms
     
 
-    def simulate(self, sim_time_ms: int, update_length_ms: int) -> None:
+    def snapshot(self) -> bytes:
+        """
+        Save the junction's whole state, so it can be restored with restore and simulated on from where it is now,
+        giving the same results as carrying on with this junction. Vehicles are saved as columns of numbers and
+        the rest of the state as JSON, together in a compressed NumPy archive, so snapshots are small and loading
+        one never runs code from it.
+
+        :return: The snapshot
+        """
+        #Every store's vehicles one after the other: each arm's lanes in order, then the box
+        stores = [lane.vehicles for arm in self._arms for lane in arm.get_lanes()] + [self._box.get_vehicles()]
+        metadata = {
+            "version": self.SNAPSHOT_VERSION,
+            "parameters": {**self._parameters,
+                           "allowed_lane_directions": [sorted(directions) for directions in self._allowed_lane_directions]},
+            "random": self._random.bit_generator.state,
+            "arrival_random": self._arrival_random.bit_generator.state,
+            "next_arrival": self._next_arrival,
+            "scheduled_until_ms": self._scheduled_until_ms,
+            "elapsed_ms": self._elapsed_ms,
+            "queue_sample_count": self._queue_sample_count,
+            "warm_up_ms": self._warm_up_ms,
+            "warming_up": self._warming_up,
+            "traffic_light": self._traffic_light.get_state(),
+            "arms": [arm.get_state() for arm in self._arms],
+            "box": self._box.get_state(),
+        }
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer,
+                            metadata=np.frombuffer(json.dumps(metadata, default=lambda value: value.tolist()).encode(), np.uint8),
+                            arrival_times_ms=self._arrival_times_ms,
+                            arrival_pairs=self._arrival_pairs,
+                            arrival_buses=self._arrival_buses,
+                            pair_next_arrival_ms=self._pair_next_arrival_ms,
+                            queue_sample_times_ms=self._queue_sample_times_ms,
+                            queue_length_samples=self._queue_length_samples,
+                            store_sizes=np.array([len(store) for store in stores], np.int64),
+                            vehicle_floats=np.concatenate([store.floats for store in stores], axis=1),
+                            vehicle_ints=np.concatenate([store.ints for store in stores], axis=1),
+                            vehicle_buses=np.array([vehicle.vehicle_type == "Bus" for store in stores for vehicle in store], bool))
+        return buffer.getvalue()
+
+    @staticmethod
+    def restore(snapshot: bytes) -> "Junction":
+        """
+        Rebuild a junction from a snapshot, ready to simulate on from where it was taken. It carries on the random
+        streams of the junction the snapshot was taken from.
+
+        :param snapshot: What snapshot returned
+        :return: The restored junction
+        """
+        with np.load(io.BytesIO(snapshot), allow_pickle=False) as arrays:
+            arrays = {name: arrays[name] for name in arrays.files}
+        metadata = json.loads(arrays["metadata"].tobytes())
+        if metadata["version"] != Junction.SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {metadata['version']} is not supported")
+        parameters = metadata["parameters"]
+        parameters["allowed_lane_directions"] = [set(directions) for directions in parameters["allowed_lane_directions"]]
+        junction = Junction(**parameters)
+
+        junction._random.bit_generator.state = metadata["random"]
+        junction._arrival_random.bit_generator.state = metadata["arrival_random"]
+        junction._arrival_times_ms = arrays["arrival_times_ms"]
+        junction._arrival_pairs = arrays["arrival_pairs"]
+        junction._arrival_buses = arrays["arrival_buses"]
+        junction._pair_next_arrival_ms = arrays["pair_next_arrival_ms"]
+        junction._next_arrival = metadata["next_arrival"]
+        junction._scheduled_until_ms = metadata["scheduled_until_ms"]
+        junction._elapsed_ms = metadata["elapsed_ms"]
+        junction._queue_sample_times_ms = arrays["queue_sample_times_ms"]
+        junction._queue_length_samples = arrays["queue_length_samples"]
+        junction._queue_sample_count = metadata["queue_sample_count"]
+        junction._warm_up_ms = metadata["warm_up_ms"]
+        junction._warming_up = metadata["warming_up"]
+
+        #Put the vehicles back in their stores in queue order, as they were
+        stores = [lane.vehicles for arm in junction._arms for lane in arm.get_lanes()] + [junction._box.get_vehicles()]
+        floats, ints, buses = arrays["vehicle_floats"].T, arrays["vehicle_ints"].T, arrays["vehicle_buses"].tolist()
+        columns = {name: i for i, name in enumerate(VehicleStore.FLOAT_COLUMNS)}
+        rows = iter(range(len(buses)))
+        for store, size in zip(stores, arrays["store_sizes"].tolist()):
+            for _ in range(size):
+                row = next(rows)
+                source_lane, source, destination = ints[row].tolist()
+                vehicle_type = Vehicle.Bus if buses[row] else Vehicle.Car
+                vehicle = vehicle_type(floats[row, columns["speed"]].item(), source, destination,
+                                       floats[row, columns["distance"]].item(), junction.NUM_ARMS)
+                vehicle._wait_time = floats[row, columns["wait_time"]].item()
+                vehicle._source_lane = None if source_lane == VehicleStore.NO_LANE else source_lane
+                store.append(vehicle)
+
+        junction._traffic_light.set_state(metadata["traffic_light"])
+        for arm, state in zip(junction._arms, metadata["arms"]):
+            arm.set_state(state)
+        junction._box.set_state(metadata["box"])
+        return junction
+
+    def enable_profiling(self) -> PhaseProfile:
+        """
+        Start timing each phase of the simulation steps: creating vehicles, the traffic light, the box, and each
+        arm's lanes and lane switching, with counts of the vehicle updates, lane merges checked and made, and box
+        collision checks. The methods for each phase are wrapped for this junction only, so a junction that isn't
+        profiled pays nothing, and one that is pays a clock reading either side of each phase.
+
+        :return: The profile, which fills in as the junction is simulated
+        """
+        if self._profile is not None:
+            return self._profile
+        profile = self._profile = PhaseProfile(self.NUM_ARMS)
+        self.update = profile.timed(self.update, "update")
+        self.skip_idle_steps = profile.timed(self.skip_idle_steps, "skip_idle_steps")
+        self.create_new_vehicles = profile.timed(self.create_new_vehicles, "create_new_vehicles")
+        self._traffic_light.update_traffic_light = profile.timed(self._traffic_light.update_traffic_light, "update_traffic_light")
+        self._box.move_all_vehicles = profile.timed(self._box.move_all_vehicles, "box_move_all_vehicles")
+        self._box.is_path_blocked = profile.counted(self._box.is_path_blocked, "collision_checks")
+        self._box.is_destination_taken = profile.counted(self._box.is_destination_taken, "collision_checks")
+        for i, arm in enumerate(self._arms):
+            arm.move_all_vehicles = profile.timed(arm.move_all_vehicles, "move_all_vehicles", i)
+            arm.handle_lane_switching = profile.timed(arm.handle_lane_switching, "handle_lane_switching", i)
+            arm.merge_space_mask = profile.counted(arm.merge_space_mask, "merge_checks", len)
+            arm.move_vehicle_to_lane = profile.counted(arm.move_vehicle_to_lane, "lane_switches")
+            for lane in arm.get_lanes():
+                lane.move_all_vehicles = self._count_vehicle_updates(profile.timed(lane.move_all_vehicles, "lane_move_all_vehicles", i), lane)
+        return profile
+
+    def _count_vehicle_updates(self, move_all_vehicles, lane: Lane.Lane):
+        """
+        Wraps a lane's move_all_vehicles to count the vehicles it updates in the profile. Every vehicle in the lane
+        counts, including queued ones that don't move. Steps skipped in one go by event driven mode aren't lane
+        updates, so count nothing.
+        """
+        def wrapper(*args, **kwargs):
+            self._profile.count("vehicle_updates", len(lane.vehicles))
+            return move_all_vehicles(*args, **kwargs)
+        return wrapper
+
+    def disable_profiling(self) -> PhaseProfile:
+        """
+        Stop timing the simulation steps, putting back the methods enable_profiling wrapped
+
+        :return: The profile so far, or None if profiling wasn't enabled
+        """
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        components = [self, self._traffic_light, self._box] + self._arms + [lane for arm in self._arms for lane in arm.get_lanes()]
+        for component in components:
+            for name in ["update", "skip_idle_steps", "create_new_vehicles", "update_traffic_light", "move_all_vehicles",
+                         "is_path_blocked", "is_destination_taken", "handle_lane_switching", "merge_space_mask",
+                         "move_vehicle_to_lane"]:
+                vars(component).pop(name, None)
+        return profile
+
+    def get_profile(self) -> PhaseProfile:
+        """ Returns the profile being filled in, or None if profiling isn't enabled """
+        return self._profile
+
+    def simulate(self,
+                 sim_time_ms: int,
+                 update_length_ms: int,
+                 event_driven: bool = False,
+                 step_callback: Callable[[int], bool] = None) -> None:
         """
         Simulate the junction for a given period of time and at a given precision.
 
         :param sim_time_ms: The total length of time to simulate in milliseconds.
         :param update_length_ms: The length of each simulation step in milliseconds.
+        :param event_driven: If true, stretches where every vehicle is waiting are skipped in one go, up to the next
+                             arrival, light change, pedestrian crossing change or vehicle leaving the box. Gives the
+                             same results as stepping through them.
+        :param step_callback: Called after each step (or stretch of skipped steps) with the time simulated so far in
+                              milliseconds. Returning False stops the simulation there, such as when a sweep is
+                              cancelled.
+
+        If the junction has a max_step_ms, several steps are taken as one longer step whenever nothing is about to
+        happen that depends on when exactly it happens (see get_adaptive_steps). This is an approximation: the KPIs
+        are close to, but not the same as, those from stepping at update_length_ms. step_size_report in sweep.py
+        measures how close for a scenario.
         """
         
-        # configure intervals to wait until we track queue count data
-        self._queue_length_timer = sim_time_ms / 10
+        start_ms = self._elapsed_ms
+        end_ms = start_ms + sim_time_ms
+        # record queue lengths at the configured interval since the start, or ten times over this call by default
+        if self._queue_sample_interval_ms:
+            sample_interval_ms, sample_origin_ms = self._queue_sample_interval_ms, 0
+        else:
+            sample_interval_ms, sample_origin_ms = sim_time_ms / 10, start_ms
+
+        # steps to go before checking for an idle stretch again, backing off while vehicles keep moving
+        idle_check_countdown = 0
+        idle_check_interval = 1
 
         try:
-            while (sim_time_ms > 0):
-                sim_time_ms -= update_length_ms
-                self.update(update_length_ms)
-                
-                # store the current longest queue count for each arm
-                if sim_time_ms % self._queue_length_timer == 0:
-                    for i, arm in enumerate(self._arms):
-                        current_queue_length = arm.get_current_queue_length()
-                        self._queue_length_array[i].append(current_queue_length)
+            while (self._elapsed_ms < end_ms):
+                if event_driven and idle_check_countdown <= 0:
+                    remaining_steps = math.ceil((end_ms - self._elapsed_ms) / update_length_ms)
+                    idle_steps = min(self.get_idle_steps(update_length_ms), remaining_steps)
+                    if idle_steps > 0:
+                        idle_check_interval = 1
+                        self.skip_idle_steps(idle_steps, update_length_ms)
+                        self.advance_clock(idle_steps, update_length_ms, sample_origin_ms, sample_interval_ms)
+                        if step_callback is not None and not step_callback(self._elapsed_ms):
+                            return
+                        continue
+                    idle_check_countdown = idle_check_interval
+                    idle_check_interval = min(idle_check_interval * 2, self.MAX_IDLE_CHECK_INTERVAL)
+                idle_check_countdown -= 1
+
+                num_steps = 1
+                if self._max_step_ms:
+                    remaining_steps = math.ceil((end_ms - self._elapsed_ms) / update_length_ms)
+                    num_steps = self.get_adaptive_steps(update_length_ms, min(self._max_step_ms // update_length_ms, remaining_steps))
+                self.update(num_steps * update_length_ms)
+                self.advance_clock(num_steps, update_length_ms, sample_origin_ms, sample_interval_ms)
+                if step_callback is not None and not step_callback(self._elapsed_ms):
+                    return
 
         except TooManyVehiclesException:
             print("Too many vehicles created in an arm, exiting early")
-    
+
+    def simulate_until_steady(self,
+                              max_time_ms: int,
+                              update_length_ms: int,
+                              event_driven: bool = False,
+                              batch_ms: int = STEADY_STATE_BATCH_MS,
+                              min_batches: int = STEADY_STATE_MIN_BATCHES,
+                              relative_precision: float = STEADY_STATE_PRECISION,
+                              step_callback: Callable[[int], bool] = None) -> dict:
+        """
+        Simulate the junction until its KPIs have converged, or for at most a given time. The simulation runs in
+        batches, and the average wait of the vehicles leaving in each batch is one observation. Unless a warm-up
+        period was given, the MSER rule on those observations finds when the start-up transient is over. The
+        batches before then are dropped, and the ones after it still count towards convergence. The KPIs can't be
+        wound back to that point though, so they are collected afresh from when it was found. The run ends once the
+        95% confidence interval of the batch averages is narrow enough.
+
+        :param max_time_ms: The longest time to simulate in milliseconds
+        :param batch_ms: The length of each batch. Batches should span several light cycles, so they are close to
+                         independent.
+        :param min_batches: The fewest batches to find the warm-up period or judge convergence from
+        :param relative_precision: The widest confidence interval half width allowed, as a share of the average wait
+        :param step_callback: Called after each step as by simulate. Returning False ends the run there.
+        :return: Whether the KPIs converged, the warm-up period left out of the KPIs, when the transient was found to
+                 end (the same as the warm-up unless MSER found it), the time simulated, and the average wait of the
+                 vehicles leaving after the transient with its 95% confidence interval half width
+        """
+        end_ms = self._elapsed_ms + max_time_ms
+        #Without a warm-up period, look for the end of the transient in the batches
+        detecting_warm_up = not self._warming_up and self._warm_up_ms == 0
+        batch_waits = []
+        batch_starts_ms = []
+        transient_ms = None
+        average_wait, half_width, converged = 0.0, math.inf, False
+        while self._elapsed_ms < end_ms and not converged:
+            was_warming_up = self._warming_up
+            batch_start_ms = self._elapsed_ms
+            wait_before, count_before = self.get_departure_totals()
+            batch_end_ms = min(batch_start_ms + batch_ms, end_ms)
+            self.simulate(batch_end_ms - batch_start_ms, update_length_ms, event_driven, step_callback)
+            if step_callback is not None and self._elapsed_ms < batch_end_ms:
+                break
+            wait_after, count_after = self.get_departure_totals()
+            if was_warming_up:
+                continue
+            batch_waits.append((wait_after - wait_before) / (count_after - count_before) if count_after > count_before else 0.0)
+            batch_starts_ms.append(batch_start_ms)
+
+            if detecting_warm_up and len(batch_waits) >= min_batches:
+                truncation = mser_truncation_point(batch_waits)
+                if truncation >= len(batch_waits) // 2:
+                    continue
+                detecting_warm_up = False
+                if truncation > 0:
+                    #The KPIs so far include the transient, so start them again from here. The batches after it are
+                    #steady already, so they are kept.
+                    transient_ms = batch_starts_ms[truncation]
+                    self.end_warm_up()
+                    batch_waits = batch_waits[truncation:]
+
+            if not detecting_warm_up and len(batch_waits) >= min_batches:
+                average_wait = float(np.mean(batch_waits))
+                half_width = float(confidence_half_width(batch_waits))
+                converged = half_width <= relative_precision * average_wait
+
+        return {
+            "converged": converged,
+            "warm_up_ms": self._warm_up_ms,
+            "transient_ms": self._warm_up_ms if transient_ms is None else transient_ms,
+            "elapsed_ms": self._elapsed_ms,
+            "batches": len(batch_waits),
+            "average_wait_s": average_wait,
+            "half_width_s": half_width,
+        }
+
+    def get_departure_totals(self) -> Tuple[float, int]:
+        """ Returns the total wait time in seconds of the vehicles that have left every arm, and how many have left """
+        return sum(arm.get_total_wait_time() for arm in self._arms), sum(self.get_total_car_count())
+
+    def advance_clock(self, num_steps: int, update_length_ms: int, sample_origin_ms: int, sample_interval_ms: float) -> None:
+        """ Move the simulated time on by some steps, recording the queue lengths at each sampling time passed """
+        for _ in range(num_steps):
+            self._elapsed_ms += update_length_ms
+            if self._warming_up and self._elapsed_ms >= self._warm_up_ms:
+                self.end_warm_up()
+            if (self._elapsed_ms - sample_origin_ms) % sample_interval_ms == 0:
+                self.record_queue_lengths()
+
+    def end_warm_up(self) -> None:
+        """
+        Start collecting KPIs, throughputs and queue length samples afresh from now. Called once the warm-up period
+        has been simulated, and by simulate_until_steady when it finds the start-up transient has ended.
+        """
+        for arm in self._arms:
+            arm.reset_kpis()
+        self._box.reset_throughputs()
+        self._queue_sample_count = 0
+        self._warming_up = False
+        self._warm_up_ms = self._elapsed_ms
+
+    def get_warm_up_ms(self) -> int:
+        """ Returns the length of the warm-up period left out of the KPIs, or how long it will be if not yet over """
+        return self._warm_up_ms
+
+    def record_queue_lengths(self) -> None:
+        """ Store the current longest queue in each arm, overwriting the oldest sample if the buffer is full """
+        row = self._queue_sample_count % len(self._queue_sample_times_ms)
+        self._queue_sample_times_ms[row] = self._elapsed_ms
+        self._queue_length_samples[row] = [arm.get_current_queue_length() for arm in self._arms]
+        self._queue_sample_count += 1
+
+    def get_queue_length_samples(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the recorded queue lengths, oldest first, for plotting
+
+        :return: The time of each sample in milliseconds since the start of the simulation, and the longest queue
+                 in each arm at that time with one column per arm
+        """
+        capacity = len(self._queue_sample_times_ms)
+        count = min(self._queue_sample_count, capacity)
+        rows = (np.arange(count) + self._queue_sample_count - count) % capacity
+        return self._queue_sample_times_ms[rows], self._queue_length_samples[rows]
     
     def update(self, update_length_ms: int) -> None:
         """
@@ -154,25 +561,129 @@ class Junction:
             arm.move_all_vehicles(0, self._traffic_light.traffic_light_dir, self._box, update_length_ms, i)
     
 
+    def get_idle_steps(self, update_length_ms: int) -> float:
+        """
+        Count the simulation steps until the next event, if every vehicle in the arms is waiting. Until then no
+        vehicle is created, moves in or out of a lane or leaves the box, and the traffic light doesn't change.
+
+        :param update_length_ms: The length of each simulation step in milliseconds
+        :return: The number of steps that can be skipped, 0 if a vehicle in an arm would move in the next step
+        """
+        #Cheapest checks first, as this runs before every step that isn't skipped
+        steps = (self.get_next_arrival_ms() - self._elapsed_ms) / update_length_ms
+        steps = math.ceil(steps) - 1 if steps != math.inf else steps
+        if steps <= 0:
+            return 0
+        steps = min(steps, self._traffic_light.get_steps_until_change(update_length_ms, self._arms),
+                    self._box.get_steps_until_exit(update_length_ms))
+        if steps <= 0:
+            return 0
+
+        light_dir = self._traffic_light.traffic_light_dir
+        for i, arm in enumerate(self._arms):
+            if not arm.is_stationary(light_dir, self._box, update_length_ms, i):
+                return 0
+        return steps
+
+    def get_adaptive_steps(self, update_length_ms: int, max_steps: int) -> int:
+        """
+        Count the simulation steps that can be taken as one longer step. Steps are only joined while the traffic
+        light won't change, no vehicle will reach the stop line of an arm it could leave, and no vehicle will come
+        near enough to the junction for the lights to respond to it. Queues building up behind a red light and
+        vehicles moving freely along the arms take the longer steps.
+
+        :param update_length_ms: The length of each simulation step in milliseconds
+        :param max_steps: The most steps to join
+        :return: The number of steps to take as one, at least 1
+        """
+        steps = min(max_steps, self._traffic_light.get_steps_until_change(update_length_ms, self._arms))
+        if steps <= 1:
+            return 1
+        step_m = self.VEHICLE_SPEED_MPS * update_length_ms / 1000
+        light_dir = self._traffic_light.traffic_light_dir
+        for i, arm in enumerate(self._arms):
+            distance = arm.nearest_vehicle_distance
+            if distance == math.inf:
+                continue
+            if distance >= TrafficLight.NEAR_DISTANCE_M:
+                #Stop before the vehicle comes near enough to change what the lights do
+                steps = min(steps, math.floor((distance - TrafficLight.NEAR_DISTANCE_M) / step_m))
+            elif arm.can_release(light_dir, i):
+                #Stop before the vehicle reaches the stop line, where it may enter the box or be held back by a conflict
+                steps = min(steps, TrafficLight.steps_until_elapsed(distance, step_m))
+            if steps <= 1:
+                return 1
+        return int(steps)
+
+    def skip_idle_steps(self, num_steps: int, update_length_ms: int) -> None:
+        """
+        Process several steps at once while every vehicle in the arms is waiting. Gives the same result as calling
+        update num_steps times, as long as num_steps is no more than get_idle_steps.
+        """
+        self._traffic_light.skip_steps(num_steps, update_length_ms, self._arms)
+        for _ in range(num_steps):
+            self._box.move_all_vehicles(update_length_ms)
+        for arm in self._arms:
+            arm.add_wait_time(num_steps * update_length_ms)
+
     def create_new_vehicles(self, update_length_ms: int) -> None:
         """
-        Attempt to create new vehicles
+        Create the vehicles arriving during the next simulation step from the arrival schedule
         """
-        for source in range(0, self.NUM_ARMS):
-            for dest in range(0, self.NUM_ARMS):
-                #If an entry has no vehicles, skip it
-                if (self._traffic_data[source][dest] == 0):
-                    continue
-                #Decrement the timer by the length of the update
-                self._vehicle_timers_ms[source][dest] -= update_length_ms
-
-                #If a timer is less than 0, create a car and increment the timer by a random value.
-                #If the timer is still below 0, multiple cars are created in a single update.
-                while(self._vehicle_timers_ms[source][dest] <= 0):
-                    time_to_next_ms = self._random.exponential(self._traffic_scales[source][dest])
-                    self._vehicle_timers_ms[source][dest] += time_to_next_ms
-                    #Create buses if a random number is less than the bus ratio
-                    if self._random.uniform(0, 1) < self._bus_ratio:
-                        self._arms[source].create_vehicle(self.VEHICLE_SPEED_MPS, source, dest, "Bus")
-                    else:
-                        self._arms[source].create_vehicle(self.VEHICLE_SPEED_MPS, source, dest, "Car")
+        #Vehicles arrive in this step if they are due by its end
+        step_end_ms = self._elapsed_ms + update_length_ms
+        while step_end_ms >= self._scheduled_until_ms:
+            self.schedule_arrivals()
+        if self._next_arrival == len(self._arrival_times_ms) or self._arrival_times_ms.item(self._next_arrival) > step_end_ms:
+            return
+        end = int(np.searchsorted(self._arrival_times_ms, step_end_ms, "right"))
+
+        #Create vehicles in order of source and then destination, then arrival time if several arrive in one step
+        due = np.argsort(self._arrival_pairs[self._next_arrival:end], kind="stable") + self._next_arrival
+        self._next_arrival = end
+        for pair, bus in zip(self._arrival_pairs[due].tolist(), self._arrival_buses[due].tolist()):
+            source, dest = divmod(pair, self.NUM_ARMS)
+            self._arms[source].create_vehicle(self.VEHICLE_SPEED_MPS, source, dest, "Bus" if bus else "Car")
+
+    def schedule_arrivals(self) -> None:
+        """
+        Draw the arrivals for the next ARRIVAL_CHUNK_MS of the schedule, with one batch of random numbers for each
+        source and destination pair, and merge them into the schedule in time order.
+        """
+        until_ms = self._scheduled_until_ms + self.ARRIVAL_CHUNK_MS
+        times = [self._arrival_times_ms[self._next_arrival:]]
+        pairs = [self._arrival_pairs[self._next_arrival:]]
+        buses = [self._arrival_buses[self._next_arrival:]]
+        for pair, scale in enumerate(np.ravel(self._traffic_scales)):
+            #If an entry has no vehicles, skip it
+            if np.ravel(self._traffic_data)[pair] == 0 or self._pair_next_arrival_ms[pair] >= until_ms:
+                continue
+            #Draw the gaps between arrivals in batches a little larger than expected, until they pass the end of the chunk
+            batch_size = int((until_ms - self._pair_next_arrival_ms[pair]) / scale * 1.25) + 8
+            pair_times = [self._pair_next_arrival_ms[pair:pair + 1]]
+            while pair_times[-1][-1] < until_ms:
+                pair_times.append(pair_times[-1][-1] + np.cumsum(self._arrival_random.exponential(scale, batch_size)))
+            pair_times = np.concatenate(pair_times)
+            count = int(np.searchsorted(pair_times, until_ms))
+            self._pair_next_arrival_ms[pair] = pair_times[count]
+
+            times.append(pair_times[:count])
+            pairs.append(np.full(count, pair))
+            #Arrivals are buses if a random number is less than the bus ratio
+            buses.append(self._arrival_random.uniform(0, 1, count) < self._bus_ratio if self._bus_ratio else np.zeros(count, bool))
+
+        times = np.concatenate(times)
+        order = np.argsort(times, kind="stable")
+        self._arrival_times_ms = times[order]
+        self._arrival_pairs = np.concatenate(pairs)[order]
+        self._arrival_buses = np.concatenate(buses)[order]
+        self._next_arrival = 0
+        self._scheduled_until_ms = until_ms
+
+    def get_next_arrival_ms(self) -> float:
+        """ Returns the time of the next arrival, or infinity if no traffic is coming """
+        if not np.any(self._traffic_data):
+            return math.inf
+        while self._next_arrival == len(self._arrival_times_ms):
+            self.schedule_arrivals()
+        return self._arrival_times_ms[self._next_arrival]
@@ -1,19 +1,26 @@
 from typing import List, Set
 from abc import ABC, abstractmethod
 from Vehicle import Vehicle, Car, Bus
+from VehicleStore import VehicleStore
 from Box import Box
+import numpy as np
 
 class Lane(ABC):
     """
     The abstract class Lane, which defines the basic interface for all lanes.
     """
+    #Queues with at least this many vehicles are moved with the batched kernel
+    BATCH_MIN_VEHICLES: int = 128
+    #Passes of the batched kernel before the rest of the queue is moved one vehicle at a time
+    BATCH_MAX_PASSES: int = 8
+
     def __init__(self, 
                  allowed_directions: Set[int], 
                  width: int, 
                  length: int,
                  num_arms: int):
-        # the list of all vehicles currently in this lane
-        self._vehicles: List[Vehicle] = []
+        # all vehicles currently in this lane, front of the queue first
+        self._vehicles: VehicleStore = VehicleStore()
 
         # the directions vehicles in this lane can go
         self._allowed_directions: Set[int] = allowed_directions
@@ -33,7 +40,7 @@ class Lane(ABC):
         """ Returns the directions cars in this lane are allowed to travel """
         return self._allowed_directions
     @property
-    def vehicles(self) -> List[Vehicle]:
+    def vehicles(self) -> VehicleStore:
         return self._vehicles
     @property
     def width(self) -> int:
@@ -62,6 +69,38 @@ class Lane(ABC):
         # return the last index of the list or none if empty
         return self._vehicles[-1] if self._vehicles else None
     
+    def get_tail_position(self) -> float:
+        """
+        Method to get the distance from the traffic light behind which a new vehicle can join the lane
+
+        :return: The back of the last vehicle plus its stopping distance, or 0 if the lane is empty
+        """
+        if not self._vehicles:
+            return 0
+        return self._vehicles.distance.item(-1) + self._vehicles.length.item(-1) + self._vehicles.stopping_distance.item(-1)
+
+    def get_merge_index(self, distance: float, length: float, stopping_distance: float) -> int:
+        """
+        Method to find where a vehicle could merge into this lane. The lane's distance column is kept in queue order,
+        so it is searched directly rather than copied.
+
+        :param distance: The distance from the traffic light of the vehicle merging
+        :param length: The length of the vehicle merging
+        :param stopping_distance: The stopping distance of the vehicle merging
+        :return: The index the vehicle can merge into, -1 if the vehicles either side would be too close
+        """
+        distances = self._vehicles.distance
+        index = int(np.searchsorted(distances, distance, "right"))
+
+        # check there is enough space for the vehicle to stop behind the vehicle ahead
+        if index > 0 and distance - distances.item(index - 1) - self._vehicles.length.item(index - 1) <= stopping_distance:
+            return -1
+
+        # check there is enough space for the vehicle behind to stop
+        if index < len(distances) and distances.item(index) - distance - length <= self._vehicles.stopping_distance.item(index):
+            return -1
+        return index
+
     def get_vehicle_ahead(self, current_vehicle: Vehicle) -> Vehicle:
         """
         Method to get the vehicle in front of a given vehicle
@@ -126,51 +165,182 @@ class Lane(ABC):
         :return: the vehicles currently leaving the junction
         """
         leaving_vehicles = set()
-        vehicle_ahead = None
+        vehicles = self._vehicles
+        if not vehicles:
+            return leaving_vehicles
+
+        # long queues are moved with array operations, short ones are quicker to move one vehicle at a time
+        if len(vehicles) >= self.BATCH_MIN_VEHICLES:
+            leaving_indexes = self.move_queue_batched(traffic_light_dir, update_length_ms, box, arm_id, lane_id)
+        else:
+            # work on plain lists of the store's columns, then write the new positions and wait times back in one go
+            columns = vehicles.floats.tolist()
+            leaving_indexes = self.move_queue(columns, 0, traffic_light_dir, update_length_ms, box, arm_id, lane_id)
+            vehicles.floats[:2] = columns[:2]
+
+        for i in leaving_indexes:
+            vehicles.source_lane[i] = lane_id
+            leaving_vehicles.add(vehicles[i])
+
+        return leaving_vehicles
+
+    def move_queue(self, columns: List[list], start: int, traffic_light_dir: int, update_length_ms: int, box: Box,
+                   arm_id: int, lane_id: int) -> List[int]:
+        """
+        Moves the vehicles from a given position in the queue to the back, one at a time
+
+        :param columns: The lane's float columns as lists, in the order of VehicleStore.FLOAT_COLUMNS. Positions and
+                        wait times are updated in place. Vehicles ahead of start must already have been moved.
+        :param start: The position in the queue of the first vehicle to move
+        :return: the positions in the queue of the vehicles leaving the lane
+        """
+        distances, wait_times, lengths, stopping_distances, speeds = columns
+        leaving_indexes = []
+        ahead_leaving = False
+
+        for i in range(start, len(distances)):
+            distance = distances[i]
+            next_position = distance - speeds[i] * update_length_ms / 1000
+            leaving = False
 
-        for i, vehicle in enumerate(self._vehicles):
             # if the vehicles next move will put them in the junction
-            if vehicle.get_next_position(update_length_ms) <= 0:
-                if self.can_enter_box(vehicle, box, arm_id, lane_id, traffic_light_dir):
+            if next_position <= 0:
+                if self.can_enter_box(self._vehicles[i], box, arm_id, lane_id, traffic_light_dir):
                     # this vehicle will leave the junction
-                    vehicle.set_source_lane(lane_id)
                     #Move forwards. This allows vehicles to move in both the lane and box in one tick.
-                    vehicle.set_position(vehicle.get_next_position(update_length_ms))
-                    leaving_vehicles.add(vehicle)
+                    distances[i] = next_position
+                    leaving_indexes.append(i)
+                    leaving = True
 
                 else:
                     # set distance to 0 if at front of queue, otherwise move forward if space
-                    new_vehicle_distance = min(vehicle_ahead.distance + vehicle_ahead.length + vehicle.stopping_distance, vehicle.distance) if vehicle_ahead else 0
-                    
+                    new_vehicle_distance = min(distances[i - 1] + lengths[i - 1] + stopping_distances[i], distance) if i > 0 else 0
+
                     # update wait time if the vehicle hasn't moved
-                    if new_vehicle_distance == vehicle.distance:
-                        vehicle.update_wait_time(update_length_ms)
+                    if new_vehicle_distance == distance:
+                        wait_times[i] += update_length_ms
 
                     # set the new vehicle distance
-                    vehicle.set_position(new_vehicle_distance)
+                    distances[i] = new_vehicle_distance
 
             # if the vehicle is at the front of the queue and not at the junction (no need to check vehicle ahead)
-            elif i == 0 or vehicle_ahead in leaving_vehicles:
-                vehicle.set_position(vehicle.get_next_position(update_length_ms))
+            elif i == 0 or ahead_leaving:
+                distances[i] = next_position
 
             # update vehicle distance if there is enough space to move forward
-            elif self.has_space_to_move(vehicle, vehicle_ahead):
+            elif distance > distances[i - 1] + lengths[i - 1] + stopping_distances[i]:
                 # new position is the furthest the vehicle can travel in the time step ensuring it doesn't get too
                 # close to the vehicle ahead
-                new_vehicle_distance = max(vehicle.get_next_position(update_length_ms),
-                                           vehicle_ahead.distance + vehicle_ahead.length + vehicle.stopping_distance)
-                
-                vehicle.set_position(new_vehicle_distance)
+                distances[i] = max(next_position, distances[i - 1] + lengths[i - 1] + stopping_distances[i])
 
             # update the wait time if the vehicle doesn't have space to move
             else:
-                vehicle.update_wait_time(update_length_ms)
+                wait_times[i] += update_length_ms
 
             # update the vehicle ahead for the next iteration
-            vehicle_ahead = vehicle
+            ahead_leaving = leaving
+
+        return leaving_indexes
+
+    def move_queue_batched(self, traffic_light_dir: int, update_length_ms: int, box: Box, arm_id: int,
+                           lane_id: int) -> List[int]:
+        """
+        Moves every vehicle in the lane using whole-column operations, giving exactly the same positions and wait
+        times as moving them one at a time.
+
+        Vehicles whose next move reaches the junction, and the one behind them, are moved one at a time. Every
+        other vehicle either moves freely, stays where it is, or stops just behind the vehicle ahead, so its new
+        position is min(distance, max(next position, position ahead + length ahead + stopping distance)). That
+        depends on the new position of the vehicle ahead, so it is solved in passes: each pass recomputes every
+        position from the last guess, and everything before the first position that changed is final. A run of
+        vehicles each stopping just behind the one ahead is then filled in with a running sum, which adds in the
+        same order as the one at a time loop. Anything not settled after BATCH_MAX_PASSES is moved one at a time.
+
+        :return: the positions in the queue of the vehicles leaving the lane
+        """
+        floats = self._vehicles.floats
+        count = floats.shape[1]
+        distances, wait_times, lengths, stopping_distances, speeds = floats
+        next_positions = distances - speeds * update_length_ms / 1000
+
+        # move the vehicles that could reach the junction this step, and the one behind them, one at a time
+        reaching_junction = next_positions <= 0
+        first_batched = count - reaching_junction[::-1].argmax() + 1 if reaching_junction.any() else 1
+        if first_batched >= count:
+            columns = floats.tolist()
+            leaving_indexes = self.move_queue(columns, 0, traffic_light_dir, update_length_ms, box, arm_id, lane_id)
+            floats[:2] = columns[:2]
+            return leaving_indexes
+        head = floats[:, :first_batched].tolist()
+        leaving_indexes = self.move_queue(head, 0, traffic_light_dir, update_length_ms, box, arm_id, lane_id)
+
+        # new positions, exact up to and including settled. Everything behind is the current guess.
+        positions = distances.copy()
+        positions[:first_batched] = head[0]
+        settled = first_batched - 1
+        for _ in range(self.BATCH_MAX_PASSES):
+            # recompute every unsettled position from the positions ahead of it
+            gaps = positions[settled:-1] + lengths[settled:-1] + stopping_distances[settled + 1:]
+            new_positions = np.minimum(distances[settled + 1:], np.maximum(next_positions[settled + 1:], gaps))
+            changed = new_positions != positions[settled + 1:]
+            first_changed = changed.argmax()
+            if not changed[first_changed]:
+                settled = count - 1
+                break
+            positions[settled + 1:] = new_positions
+            settled += first_changed + 1
+            if settled == count - 1:
+                break
+
+            # fill in the run of vehicles stopping just behind the vehicle ahead with a running sum
+            running = np.empty(2 * (count - 1 - settled) + 1)
+            running[0] = positions[settled]
+            running[1::2] = lengths[settled:-1]
+            running[2::2] = stopping_distances[settled + 1:]
+            gaps = np.add.accumulate(running)[2::2]
+            new_positions = np.minimum(distances[settled + 1:], np.maximum(next_positions[settled + 1:], gaps))
+            run_ends = new_positions != gaps
+            run_length = run_ends.argmax() + 1 if run_ends.any() else len(gaps)
+            positions[settled + 1:settled + 1 + run_length] = new_positions[:run_length]
+            settled += run_length
+            if settled == count - 1:
+                break
+
+        # vehicles that didn't move waited, as there was no space ahead of them
+        waited = distances[first_batched:settled + 1] <= (positions[first_batched - 1:settled] + lengths[first_batched - 1:settled]
+                                                           + stopping_distances[first_batched:settled + 1])
+        wait_times[first_batched:settled + 1][waited] += update_length_ms
+        distances[:settled + 1] = positions[:settled + 1]
+        wait_times[:first_batched] = head[1]
+
+        # move any vehicles that haven't settled one at a time
+        if settled < count - 1:
+            columns = floats.tolist()
+            self.move_queue(columns, settled + 1, traffic_light_dir, update_length_ms, box, arm_id, lane_id)
+            floats[:2] = columns[:2]
+
+        return leaving_indexes
+
+    def is_stationary(self, traffic_light_dir: int, update_length_ms: int, box: Box, arm_id: int, lane_id: int) -> bool:
+        """
+        Checks if no vehicle in the lane would move or leave in the next step: the front vehicle is held at the
+        junction and every other vehicle is queued up too close to the one ahead to move.
+        """
+        vehicles = self._vehicles
+        if not vehicles:
+            return True
+        distances, _, lengths, stopping_distances, speeds = vehicles.floats
+        if distances[0] != 0 or self.can_enter_box(vehicles[0], box, arm_id, lane_id, traffic_light_dir):
+            return False
+        # vehicles further back must not reach the junction either, as they could then enter it
+        behind = distances[1:]
+        return bool((behind - speeds[1:] * update_length_ms / 1000 > 0).all()
+                    and (behind <= distances[:-1] + lengths[:-1] + stopping_distances[1:]).all())
+
+    def add_wait_time(self, wait_time_ms: float) -> None:
+        """ Adds to the wait time of every vehicle in the lane """
+        self._vehicles.wait_time[:] += wait_time_ms
 
-        return leaving_vehicles
-        
     def has_space_to_move(self, vehicle: Vehicle, vehicle_ahead: Vehicle) -> bool:
         """ checks if there is any space between a vehicle and the car ahead """
         if vehicle_ahead is None:
@@ -205,33 +375,9 @@ class Lane(ABC):
         """
         Returns true if there are no vehicles in the box blocking the path from the given lane to the given vehicles destination
         """
-        #Vehicle's relative direction. 1 = right, 2 = forward, 3 = left
-        #For more/less arms, represents the number of arms anticlockwise
-        vehicle_relative_dir = vehicle.get_relative_direction()
-
-        for box_vehicle in box.get_vehicles():
-            box_v_r_d = box_vehicle.get_relative_direction()
-            
-            #If the box vehicle is from a different arm, it is in a left turn lane and will not cause a collision
-            if box_vehicle.source != vehicle.source:
-                continue
-
-            #If a vehicle came from a lane to the left
-            if box_vehicle.source_lane < lane_id:
-                #If the box vehicle is moving somewhere right of the vehicles target, it blocks.
-                #Eg: if the box vehicle is moving forwards (2), it blocks left (3) turns.
-                if box_v_r_d < vehicle_relative_dir:
-                    #print(f"Vehicle in {lane_id} turning {vehicle_relative_dir} blocked by vehicle in {box_vehicle.source_lane} turning {box_v_r_d}")
-                    return False
-
-            #If a vehicle came from the right
-            elif box_vehicle.source_lane > lane_id:
-                #If the box vehicle is moving somewhere right of the vehicles target, it blocks.
-                if box_v_r_d > vehicle_relative_dir:
-                    #print(f"Vehicle in {lane_id} turning {vehicle_relative_dir} blocked by vehicle in {box_vehicle.source_lane} turning {box_v_r_d}")
-                    return False
-        #If the light is green and no vehicle in the box blocks it, enter the box
-        return True
+        #Vehicles from other arms are in left turn lanes and will not cause a collision. Vehicles from lanes to the
+        #left block turns further left than theirs, and vehicles from lanes to the right block turns further right.
+        return not box.is_path_blocked(vehicle.source, lane_id, vehicle.get_relative_direction())
     
     def create_vehicle(self, speed: int, source: int, destination: int, type: str, start_position: int) -> Vehicle:
         """
@@ -247,6 +393,22 @@ class Lane(ABC):
             return v
         return None
     
+    def can_enter_lane_mask(self, vehicles: VehicleStore) -> np.ndarray:
+        """
+        Check which vehicles in a store are allowed to enter this lane
+        :return: One boolean per vehicle, true if allowed
+        """
+        return np.array([self.can_enter_lane(vehicle) for vehicle in vehicles], bool)
+
+    def allowed_direction_mask(self, vehicles: VehicleStore) -> np.ndarray:
+        """
+        Check which vehicles in a store are going in one of this lane's allowed directions
+        :return: One boolean per vehicle, true if going in an allowed direction
+        """
+        relative_directions = (vehicles.source - vehicles.destination) % self._num_arms
+        allowed = np.array([(self._num_arms - direction) % self._num_arms in self.allowed_directions for direction in range(self._num_arms)])
+        return allowed[relative_directions]
+
     @abstractmethod
     def can_enter_lane(self, vehicle: Vehicle)-> bool:
         """
@@ -264,6 +426,9 @@ class CarLane(Lane):
         # a vehicle can enter a lane if its going in the intended direction
         return (self._num_arms - vehicle.get_relative_direction()) % self._num_arms in self.allowed_directions
 
+    def can_enter_lane_mask(self, vehicles: VehicleStore) -> np.ndarray:
+        return self.allowed_direction_mask(vehicles)
+
 
 class BusLane(Lane):
 
@@ -285,6 +450,9 @@ class LeftTurnLane(Lane):
     def can_enter_lane(self, vehicle: Vehicle):
         #Can enter only if moving left
         return (self._num_arms - vehicle.get_relative_direction()) % self._num_arms in self.allowed_directions
+
+    def can_enter_lane_mask(self, vehicles: VehicleStore) -> np.ndarray:
+        return self.allowed_direction_mask(vehicles)
     
     def can_enter_box(self, vehicle: Vehicle, box: Box, arm_id: int, lane_id: int, traffic_light_dir: int) -> bool:
         #Never enter during a pedestrian crossing
@@ -301,10 +469,9 @@ class LeftTurnLane(Lane):
             return True
         else:
             #For other arms, check if a vehicle is turning into the same arm from a different arm
-            for v in box.get_vehicles():
-                if v.destination == vehicle.destination and v.source != vehicle.source:
-                    #print("Vehicle blocked from left turn")
-                    return False
+            if box.is_destination_taken(vehicle.destination, vehicle.source):
+                #print("Vehicle blocked from left turn")
+                return False
         #print("Vehicle turned left from other arm")
         return True
 
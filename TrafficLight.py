@@ -1,6 +1,10 @@
 from Arm import Arm
 from numpy import random as Random
+import math
 class TrafficLight:
+    #Lights only respond to vehicles within this distance of the junction
+    NEAR_DISTANCE_M: int = 100
+
     def __init__(self, num_arms: int,
                  traffic_light_interval_ms: int,
                  traffic_light_gap_ms: int,
@@ -42,25 +46,36 @@ class TrafficLight:
     def p_crossing(self) -> bool:
         return self._p_crossing
 
+    def get_state(self) -> dict:
+        """ Returns the light's direction, timers and crossing state, for a snapshot of the junction """
+        # methods wrapped by Junction.enable_profiling are kept on the light too, but aren't state
+        return {name: value for name, value in vars(self).items() if name != "_random" and not callable(value)}
+
+    def set_state(self, state: dict) -> None:
+        """ Restores what get_state returned. The random number generator is the junction's, so it restores it. """
+        vars(self).update(state)
+
     def update_traffic_light(self, update_length_ms: int, arms: list[Arm]) -> None:
         """
         Process one simulation step for the traffic light.
 
         :param update_length_ms: The length of the simulation step in milliseconds
         """
+        #Vehicles don't move during the update, so check which arms have vehicles near the junction once
+        vehicles_near = self.get_vehicles_near(arms)
         #Branch depending on if the light is currently in a gap between changes or not.
         if self._traffic_light_gap_timer_ms <= 0:
-            self.update_traffic_light_green(update_length_ms, arms)
+            self.update_traffic_light_green(update_length_ms, vehicles_near)
         else:
             #If pedestrian crossings are enabled, only do the all_red update if the pedestrian crossing is not active
             if self._p_crossing:
                 if self._p_crossing_timer_ms <= 0:
-                    self.update_traffic_light_all_red(update_length_ms, arms)
+                    self.update_traffic_light_all_red(update_length_ms, vehicles_near)
             else:
-                self.update_traffic_light_all_red(update_length_ms, arms)
+                self.update_traffic_light_all_red(update_length_ms, vehicles_near)
 
         #If there are no vehicles within 100m, set all traffic lights to red as if at the start of a gap
-        if all([arms[i].no_vehicles_within(100) for i in range(self._num_arms)]):
+        if not any(vehicles_near):
             self._traffic_light_dir = -1
             self._traffic_light_gap_timer_ms = self._traffic_light_gap_ms
         #If pedestrian crossings are enabled, update them every time
@@ -72,15 +87,19 @@ class TrafficLight:
         #Test print for light timing
         #print(f"Current light direction: {self.traffic_light_dir}\nCurrent light timer: {self.traffic_light_time_ms}\nGap timer: {self.traffic_light_gap_timer_ms}")
 
-    def update_traffic_light_green(self, update_length_ms: int, arms: list[Arm]) -> None:
+    def get_vehicles_near(self, arms: list[Arm]) -> list[bool]:
+        """ Returns whether each arm has a vehicle within NEAR_DISTANCE_M of the junction """
+        return [arm.nearest_vehicle_distance < self.NEAR_DISTANCE_M for arm in arms]
+
+    def update_traffic_light_green(self, update_length_ms: int, vehicles_near: list[bool]) -> None:
         """ Process one traffic light step when one of the lights is green"""
         #Subtract the length of the update from the timer
         self._traffic_light_time_ms -= update_length_ms
 
         #If no cars are within 100m of the light or the time is below 0
-        if arms[self._traffic_light_dir].no_vehicles_within(100) or self._traffic_light_time_ms <= 0:
+        if not vehicles_near[self._traffic_light_dir] or self._traffic_light_time_ms <= 0:
             #If there are no cars in any other direction and no crossing request, stay green
-            if (all([arms[i].no_vehicles_within(100) for i in range(0, self._num_arms) if i != self._traffic_light_dir]) and not self._p_crossing_queued):
+            if (not any([vehicles_near[i] for i in range(0, self._num_arms) if i != self._traffic_light_dir]) and not self._p_crossing_queued):
                 self._traffic_light_time_ms = self._traffic_light_interval_ms
             else:
                 #Otherwise, set all lights to red and start gap timer
@@ -89,7 +108,7 @@ class TrafficLight:
                 self._traffic_light_dir = -1
                 #print("Light changed to red")
     
-    def update_traffic_light_all_red(self, update_length_ms: int, arms: list[Arm]) -> None:
+    def update_traffic_light_all_red(self, update_length_ms: int, vehicles_near: list[bool]) -> None:
         """ Process one traffic light update when in between light cycles when no pedestrian crossing is active """
         #Subtract the length of the update
         self._traffic_light_gap_timer_ms -= update_length_ms
@@ -102,7 +121,7 @@ class TrafficLight:
             self._traffic_light_dir = self._prev_light_dir
             for i in range(0,self._num_arms):
                 self._traffic_light_dir = self.get_left_arm(self._traffic_light_dir)
-                if not arms[self._traffic_light_dir].no_vehicles_within(100):
+                if vehicles_near[self._traffic_light_dir]:
                     break
             #print(f"Light changed to green, direction {self.traffic_light_dir}")
     
@@ -133,6 +152,71 @@ class TrafficLight:
                 #print("Crossing request received")
             #print(f"Crossing time: {self.p_crossing_interval_time_ms}, queued? {self.p_crossing_queued}")
 
+    def get_steps_until_change(self, update_length_ms: int, arms: list[Arm]) -> float:
+        """
+        Count how many simulation steps can pass before the lights change or a pedestrian crossing is requested,
+        started or ended, assuming no vehicle moves in the meantime. Only the timers count down during those steps.
+
+        :param update_length_ms: The length of each simulation step in milliseconds
+        :return: The number of steps, or infinity if nothing would ever change
+        """
+        vehicles_near = self.get_vehicles_near(arms)
+        crossing_active = self._p_crossing and self._p_crossing_timer_ms > 0
+        steps = math.inf
+
+        if self._traffic_light_gap_timer_ms <= 0:
+            #A green light changes as soon as its arm is clear, otherwise when its timer runs out
+            if not vehicles_near[self._traffic_light_dir]:
+                return 0
+            steps = self.steps_until_elapsed(self._traffic_light_time_ms, update_length_ms)
+        elif not crossing_active:
+            if any(vehicles_near):
+                steps = self.steps_until_elapsed(self._traffic_light_gap_timer_ms, update_length_ms)
+            #With every arm clear, the gap restarts each step unless it runs out in this one
+            elif self._traffic_light_gap_timer_ms <= update_length_ms:
+                return 0
+
+        if self._p_crossing:
+            if crossing_active:
+                steps = min(steps, self.steps_until_elapsed(self._p_crossing_timer_ms, update_length_ms))
+            #A queued crossing starts at the next step that begins a gap
+            elif self._p_crossing_queued and not any(vehicles_near):
+                return 0
+            else:
+                steps = min(steps, self.steps_until_elapsed(self._p_crossing_interval_time_ms, update_length_ms))
+        return steps
+
+    def skip_steps(self, num_steps: int, update_length_ms: int, arms: list[Arm]) -> None:
+        """
+        Process several simulation steps at once. Gives the same result as calling update_traffic_light num_steps
+        times, as long as num_steps is no more than get_steps_until_change and no vehicle moves.
+
+        :param num_steps: The number of steps to process
+        :param update_length_ms: The length of each simulation step in milliseconds
+        """
+        duration_ms = num_steps * update_length_ms
+        vehicles_near = any(self.get_vehicles_near(arms))
+        crossing_active = self._p_crossing and self._p_crossing_timer_ms > 0
+
+        if self._traffic_light_gap_timer_ms <= 0:
+            self._traffic_light_time_ms -= duration_ms
+        elif not crossing_active and vehicles_near:
+            self._traffic_light_gap_timer_ms -= duration_ms
+        if not vehicles_near:
+            self._traffic_light_dir = -1
+            self._traffic_light_gap_timer_ms = self._traffic_light_gap_ms
+
+        if self._p_crossing:
+            if crossing_active:
+                self._p_crossing_timer_ms -= duration_ms
+            else:
+                self._p_crossing_interval_time_ms -= duration_ms
+
+    @staticmethod
+    def steps_until_elapsed(timer_ms: float, update_length_ms: int) -> int:
+        """ Returns the number of steps a timer can be counted down by before it reaches 0 """
+        return max(math.ceil(timer_ms / update_length_ms) - 1, 0)
+
     def get_left_arm(self, arm_index: int) -> int:
         """ Get the index in arms of the arm clockwise to the given index"""
         return (arm_index + 1) % self._num_arms
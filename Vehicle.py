@@ -1,6 +1,12 @@
 from abc import ABC
+from VehicleStore import StoredAttribute
 
 class Vehicle(ABC):
+    #Attributes that live in the vehicle's store while it is in a lane or the box, so they can be updated in bulk
+    _distance = StoredAttribute("distance")
+    _wait_time = StoredAttribute("wait_time")
+    _source_lane = StoredAttribute("source_lane")
+
     def __init__(self, 
                  vehicle_type: str, 
                  length: float, 
@@ -9,6 +15,9 @@ class Vehicle(ABC):
                  destination: int, 
                  start_position: float,
                  num_arms: int):
+        #The store holding this vehicle's attributes and its row in it, or None if not in a lane or the box
+        self._store = None
+        self._slot = None
         #Arm ID of the vehicle's start and end
         self._source = source
         self._destination = destination
@@ -45,6 +54,9 @@ class Vehicle(ABC):
     def stopping_distance(self):
         return self._stopping_distance
     @property
+    def speed(self):
+        return self._speed
+    @property
     def destination(self):
         return self._destination
     @property
@@ -0,0 +1,285 @@
+from typing import List
+import numpy as np
+
+class StoredAttribute:
+    """
+    A vehicle attribute that lives in a column of the vehicle's store while the vehicle is in a lane or the box,
+    and on the vehicle itself otherwise.
+    """
+    def __init__(self, column: str):
+        self._column = column
+
+    def __set_name__(self, owner, name: str):
+        self._name = name
+
+    def __get__(self, vehicle, owner=None):
+        if vehicle is None:
+            return self
+        store = vehicle._store
+        if store is None:
+            return vehicle.__dict__[self._name]
+        # read the row directly rather than through store.get, as this is on the hot path
+        block, row = store._columns[self._column]
+        value = block.item(row, vehicle._slot)
+        if value == store.NO_LANE and self._column == "source_lane":
+            return None
+        return value
+
+    def __set__(self, vehicle, value) -> None:
+        store = vehicle.__dict__.get("_store")
+        if store is None:
+            vehicle.__dict__[self._name] = value
+        else:
+            store.set(self._column, vehicle._slot, value)
+
+
+class VehicleStore(list):
+    """
+    An ordered queue of vehicles kept as parallel NumPy arrays (structure of arrays), one array per attribute.
+    Vehicles in the store become views onto their row for the attributes that change as they move, so lanes and
+    the box can move every vehicle at once by working on whole columns. A vehicle belongs to at most one store;
+    adding it to another store moves it. It is a list of the vehicles in queue order for everything else, but
+    vehicles must only be added and removed through append, insert, remove and remove_where.
+
+    The queue starts at a head row that moves back as vehicles leave the front, so the vehicle at the front of a
+    lane leaves without the rows of the vehicles behind it being moved. Each vehicle's slot is its row, and its
+    position in the queue is its slot less the head.
+    """
+    #Columns are rows of one float and one integer block, so a whole block can be read or written in one go.
+    #The first columns of each block change while a vehicle is in the store, so the vehicle reads them from its row.
+    #The rest are fixed for the vehicle's life and are copied in when it is added, so it keeps its own copy.
+    FLOAT_COLUMNS: List[str] = ["distance", "wait_time", "length", "stopping_distance", "speed"]
+    INT_COLUMNS: List[str] = ["source_lane", "source", "destination"]
+    STORED_COLUMNS: List[str] = ["distance", "wait_time", "source_lane"]
+
+    #Integer columns can't hold None, so a vehicle without a source lane is stored as -1
+    NO_LANE: int = -1
+
+    def __init__(self, vehicles: List = (), capacity: int = 16):
+        # the store itself lists the vehicles in queue order, each one's row in the columns is its slot
+        super().__init__()
+        self._head: int = 0
+        self._count: int = 0
+        # counts every change to which vehicles are in the store, so others can tell when it has changed
+        self._version: int = 0
+        self._capacity: int = max(capacity, len(vehicles), 1)
+        self._floats = np.zeros((len(self.FLOAT_COLUMNS), self._capacity), np.float64)
+        self._ints = np.zeros((len(self.INT_COLUMNS), self._capacity), np.int64)
+        self._index_columns()
+        for vehicle in vehicles:
+            self.append(vehicle)
+
+    @property
+    def version(self) -> int:
+        """ A number that changes whenever a vehicle is added to or removed from the store """
+        return self._version
+
+    # ===== columns of the vehicles currently in the store, in queue order. Writes go straight to the vehicles =====
+    @property
+    def floats(self) -> np.ndarray:
+        """ Every float column at once, one row per column in the order of FLOAT_COLUMNS """
+        return self._floats[:, self._head:self._head + self._count]
+    @property
+    def ints(self) -> np.ndarray:
+        """ Every integer column at once, one row per column in the order of INT_COLUMNS """
+        return self._ints[:, self._head:self._head + self._count]
+
+    @property
+    def distance(self) -> np.ndarray:
+        return self._floats[0, self._head:self._head + self._count]
+    @property
+    def wait_time(self) -> np.ndarray:
+        return self._floats[1, self._head:self._head + self._count]
+    @property
+    def length(self) -> np.ndarray:
+        return self._floats[2, self._head:self._head + self._count]
+    @property
+    def stopping_distance(self) -> np.ndarray:
+        return self._floats[3, self._head:self._head + self._count]
+    @property
+    def speed(self) -> np.ndarray:
+        return self._floats[4, self._head:self._head + self._count]
+    @property
+    def source_lane(self) -> np.ndarray:
+        return self._ints[0, self._head:self._head + self._count]
+    @property
+    def source(self) -> np.ndarray:
+        return self._ints[1, self._head:self._head + self._count]
+    @property
+    def destination(self) -> np.ndarray:
+        return self._ints[2, self._head:self._head + self._count]
+
+    def get(self, column: str, slot: int):
+        """ Returns a single value of a vehicle in the store as a Python number """
+        block, row = self._columns[column]
+        value = block.item(row, slot)
+        if value == self.NO_LANE and column == "source_lane":
+            return None
+        return value
+
+    def set(self, column: str, slot: int, value) -> None:
+        """ Sets a single value of a vehicle in the store """
+        if column == "source_lane" and value is None:
+            value = self.NO_LANE
+        block, row = self._columns[column]
+        block[row, slot] = value
+
+    # ===== list behaviour =====
+    def __contains__(self, vehicle) -> bool:
+        return getattr(vehicle, "_store", None) is self
+
+    def __repr__(self) -> str:
+        return f"VehicleStore({list.__repr__(self)})"
+
+    def __reduce__(self):
+        # the list can't be rebuilt through its own methods, so pickle the columns and the vehicles in queue order
+        return VehicleStore.__new__, (type(self),), (self.__dict__, list(self))
+
+    def __setstate__(self, state) -> None:
+        attributes, vehicles = state
+        self.__dict__.update(attributes)
+        list.extend(self, vehicles)
+
+    def index(self, vehicle) -> int:
+        """ Returns the position of a vehicle in the queue """
+        if vehicle not in self:
+            raise ValueError("vehicle is not in this store")
+        return vehicle._slot - self._head
+
+    def append(self, vehicle) -> None:
+        """ Adds a vehicle to the back of the queue """
+        self.insert(self._count, vehicle)
+
+    def insert(self, index: int, vehicle) -> None:
+        """ Adds a vehicle at a given position in the queue, moving it out of any store it was in """
+        if getattr(vehicle, "_store", None) is not None:
+            vehicle._store.remove(vehicle)
+        index = min(index, self._count)
+
+        # make room by moving whichever side of the new vehicle has fewer vehicles, if there is space on that side
+        if index < self._count / 2 and self._head > 0:
+            self._shift(self._head, self._head + index, -1)
+            self._head -= 1
+        else:
+            if self._head + self._count == self._capacity:
+                self._make_room()
+            self._shift(self._head + index, self._head + self._count, 1)
+        slot = self._head + index
+        list.insert(self, index, vehicle)
+        self._count += 1
+        self._version += 1
+
+        # copy the vehicle's attributes into its row, then make the vehicle a view onto that row
+        self._floats[:, slot] = [float(getattr(vehicle, name)) for name in self.FLOAT_COLUMNS]
+        source_lane = vehicle.source_lane
+        self._ints[:, slot] = [self.NO_LANE if source_lane is None else int(source_lane),
+                               int(vehicle.source), int(vehicle.destination)]
+        vehicle._store = self
+        vehicle._slot = slot
+
+    def remove(self, vehicle) -> None:
+        """ Removes a vehicle from the queue, copying its attributes back onto it """
+        index = self.index(vehicle)
+        self._detach(vehicle)
+
+        # close the gap by moving whichever side of it has fewer vehicles, so leaving the front moves nothing
+        if index < self._count / 2:
+            self._shift(self._head, self._head + index, 1)
+            self._head += 1
+        else:
+            self._shift(self._head + index + 1, self._head + self._count, -1)
+        list.__delitem__(self, index)
+        self._count -= 1
+        self._version += 1
+        if self._count == 0:
+            self._head = 0
+
+    def remove_front(self, count: int) -> list:
+        """
+        Removes the vehicles at the front of the queue without moving the rest
+
+        :param count: The number of vehicles to remove
+        :return: The removed vehicles, front first
+        """
+        removed = list.__getitem__(self, slice(0, count))
+        for vehicle in removed:
+            self._detach(vehicle)
+        list.__delitem__(self, slice(0, count))
+        self._count -= len(removed)
+        self._version += 1
+        self._head = self._head + len(removed) if self._count else 0
+        return removed
+
+    def remove_where(self, mask: np.ndarray) -> list:
+        """
+        Removes every vehicle whose entry in mask is true, keeping the rest in order
+
+        :param mask: One boolean per vehicle in the store
+        :return: The removed vehicles
+        """
+        removed = [vehicle for vehicle, remove in zip(self, mask) if remove]
+        if not removed:
+            return removed
+        for vehicle in removed:
+            self._detach(vehicle)
+
+        keep = ~mask
+        count = int(np.count_nonzero(keep))
+        for block in (self._floats, self._ints):
+            block[:, :count] = block[:, self._head:self._head + self._count][:, keep]
+        list.__setitem__(self, slice(None), [vehicle for vehicle, kept in zip(self, keep) if kept])
+        self._head = 0
+        self._count = count
+        self._version += 1
+        for slot, vehicle in enumerate(self):
+            vehicle._slot = slot
+        return removed
+
+    def _shift(self, start: int, end: int, offset: int) -> None:
+        """ Move the rows from start up to end by offset rows, along with the slots of their vehicles """
+        if start == end:
+            return
+        for block in (self._floats, self._ints):
+            block[:, start + offset:end + offset] = block[:, start:end]
+        first = start - self._head
+        for vehicle in list.__getitem__(self, slice(first, first + end - start)):
+            vehicle._slot += offset
+
+    def _detach(self, vehicle) -> None:
+        """ Copy a vehicle's row back onto the vehicle so it no longer depends on the store """
+        slot = vehicle._slot
+        values = [("_" + name, self.get(name, slot)) for name in self.STORED_COLUMNS]
+        vehicle._store = None
+        vehicle._slot = None
+        for attribute, value in values:
+            setattr(vehicle, attribute, value)
+
+    def _make_room(self) -> None:
+        """
+        Make room after the back of the queue by moving the queue to the first row, doubling the capacity of every
+        column unless at least half of the rows are free
+        """
+        if self._count > self._capacity / 2:
+            self._capacity *= 2
+        for name in ("_floats", "_ints"):
+            block = getattr(self, name)
+            moved = np.zeros((block.shape[0], self._capacity), block.dtype)
+            moved[:, :self._count] = block[:, self._head:self._head + self._count]
+            setattr(self, name, moved)
+        self._head = 0
+        for slot, vehicle in enumerate(self):
+            vehicle._slot = slot
+        self._index_columns()
+
+    def _index_columns(self) -> None:
+        """ Record the block and row holding each column """
+        self._columns: dict = {name: (self._floats, row) for row, name in enumerate(self.FLOAT_COLUMNS)}
+        self._columns.update({name: (self._ints, row) for row, name in enumerate(self.INT_COLUMNS)})
+
+    def _unsupported(self, *args, **kwargs):
+        raise TypeError("vehicles can only be added to or removed from a VehicleStore with append, insert, remove "
+                        "and remove_where")
+
+    # any other way of changing the list would leave the columns out of step with it
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _unsupported
+    extend = pop = clear = sort = reverse = _unsupported
@@ -0,0 +1,221 @@
+from typing import List
+from Junction import Junction
+from exceptions import NotEnoughLanesException
+from cache import simulator_version
+from sweep import lane_dir_presets, write_json
+import tracemalloc
+import platform
+import argparse
+import fnmatch
+import time
+import json
+import sys
+import numpy as np
+
+#Vehicles per hour between each pair of arms for each traffic level. 100 is the GUI's default, 600 is close to what
+#two lanes can take and 1200 is more than any configuration can
+FLOW_LEVELS = {"light": 20, "default": 100, "near_saturation": 600, "oversaturated": 1200}
+
+#Junction parameters for each variant of a lane preset
+VARIANTS = {
+    "plain": {},
+    "pedestrian": {"pedestrian_crossing": True, "p_crossing_time_s": 15, "p_crossing_freq": 10},
+    "bus": {"bus_lane": True, "bus_ratio": 5},
+    "left": {"left_turn_lanes": True},
+}
+
+#Seed every benchmark scenario is simulated with, so runs are comparable
+BENCHMARK_SEED: int = 24
+
+
+class BenchmarkScenario:
+    """ One fixed junction to time the simulation of """
+    def __init__(self, flow_level: str, num_lanes: int, variant: str):
+        self.flow_level = flow_level
+        self.num_lanes = num_lanes
+        self.variant = variant
+
+    @property
+    def name(self) -> str:
+        return f"{self.flow_level}/{self.num_lanes}-lane/{self.variant}"
+
+    def build_junction(self) -> Junction:
+        """
+        Build the junction, using the first lane preset with left turn lanes for the left variant
+
+        :return: The junction, or None if the variant can't be built with this many lanes
+        """
+        flow = FLOW_LEVELS[self.flow_level]
+        traffic_data = [[0 if source == dest else flow for dest in range(Junction.NUM_ARMS)] for source in range(Junction.NUM_ARMS)]
+        variant = VARIANTS[self.variant]
+        # a bus lane takes one of the lanes, so the cars get the presets for one fewer
+        car_lanes = self.num_lanes - 1 if variant.get("bus_lane") else self.num_lanes
+        if car_lanes < 1:
+            return None
+        presets = lane_dir_presets[car_lanes - 1]
+        if variant.get("left_turn_lanes"):
+            presets = [preset for preset in presets if preset[0] == {1}]
+        try:
+            return Junction(traffic_data, presets[0], num_lanes=self.num_lanes, seed=BENCHMARK_SEED, **variant)
+        except (NotEnoughLanesException, IndexError):
+            return None
+
+
+def get_scenarios(pattern: str = "*") -> List[BenchmarkScenario]:
+    """
+    Every flow level with one to five lanes and every variant, leaving out those that can't be built
+
+    :param pattern: Only include scenarios whose names match this shell style pattern, such as "oversaturated/*"
+    """
+    scenarios = [BenchmarkScenario(flow_level, num_lanes, variant)
+                 for flow_level in FLOW_LEVELS
+                 for num_lanes in range(1, len(lane_dir_presets) + 1)
+                 for variant in VARIANTS]
+    return [scenario for scenario in scenarios
+            if fnmatch.fnmatch(scenario.name, pattern) and scenario.build_junction() is not None]
+
+
+def run_scenario(scenario: BenchmarkScenario,
+                 sim_time_ms: int,
+                 update_length_ms: int = 100,
+                 event_driven: bool = False,
+                 measure_memory: bool = True,
+                 repeats: int = 3) -> dict:
+    """
+    Time simulating one scenario, keeping the quickest of several runs as the others were slowed by whatever else
+    the machine was doing. Memory is measured with tracemalloc in another run, as tracing slows the simulation down
+    too much to time it at once.
+
+    :return: The wall time, simulated seconds and steps per wall second, peak memory traced while simulating,
+             vehicles that left the arms and the KPIs reached
+    """
+    wall_seconds = float("inf")
+    for _ in range(max(repeats, 1)):
+        junction = scenario.build_junction()
+        start = time.perf_counter()
+        junction.simulate(sim_time_ms, update_length_ms, event_driven)
+        wall_seconds = min(wall_seconds, time.perf_counter() - start)
+
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            scenario.build_junction().simulate(sim_time_ms, update_length_ms, event_driven)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "name": scenario.name,
+        "flow_level": scenario.flow_level,
+        "num_lanes": scenario.num_lanes,
+        "variant": scenario.variant,
+        "wall_seconds": wall_seconds,
+        "simulated_seconds_per_second": junction.get_elapsed_ms() / 1000 / wall_seconds,
+        "ticks_per_second": junction.get_elapsed_ms() / update_length_ms / wall_seconds,
+        "peak_memory_bytes": peak_memory,
+        "vehicles_processed": sum(junction.get_total_car_count()),
+        "kpi": junction.get_kpi(),
+    }
+
+
+def run_benchmarks(pattern: str = "*",
+                   duration: float = 10,
+                   update_length_ms: int = 100,
+                   event_driven: bool = False,
+                   measure_memory: bool = True,
+                   repeats: int = 3,
+                   progress=None) -> dict:
+    """
+    Time simulating every benchmark scenario matching a pattern
+
+    :param duration: Minutes to simulate each scenario for
+    :param repeats: The number of times to time each scenario, keeping the quickest
+    :param progress: Called with each scenario's results as it finishes, if given
+    :return: The environment and settings the benchmark ran with, and the results of each scenario
+    """
+    sim_time_ms = int(duration * 60 * 1000)
+    results = []
+    for scenario in get_scenarios(pattern):
+        result = run_scenario(scenario, sim_time_ms, update_length_ms, event_driven, measure_memory, repeats)
+        if progress:
+            progress(result)
+        results.append(result)
+    return {
+        "simulator": simulator_version(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "sim_time_ms": sim_time_ms,
+        "update_length_ms": update_length_ms,
+        "event_driven": event_driven,
+        "seed": BENCHMARK_SEED,
+        "repeats": repeats,
+        "scenarios": results,
+    }
+
+
+def compare_benchmarks(baseline: dict, current: dict, threshold: float = 0.1) -> List[dict]:
+    """
+    Compare two benchmark runs scenario by scenario
+
+    :param threshold: The share of throughput a scenario can lose before it counts as a regression
+    :return: For each scenario in both: the ratio of the current throughput to the baseline's, whether that is a
+             regression, and whether the KPIs changed, which means the two simulators don't give the same results
+    """
+    baseline_results = {result["name"]: result for result in baseline["scenarios"]}
+    comparison = []
+    for result in current["scenarios"]:
+        before = baseline_results.get(result["name"])
+        if before is None:
+            continue
+        speedup = result["simulated_seconds_per_second"] / before["simulated_seconds_per_second"]
+        comparison.append({
+            "name": result["name"],
+            "speedup": speedup,
+            "regression": speedup < 1 - threshold,
+            "kpi_changed": result["kpi"] != before["kpi"],
+        })
+    return comparison
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point: run the benchmark scenarios and write their results as JSON """
+    parser = argparse.ArgumentParser(description="Time the simulator on fixed reference junctions.")
+    parser.add_argument("-o", "--output", help="file to write the results to (default: standard output)")
+    parser.add_argument("-k", "--scenarios", default="*",
+                        help="only run scenarios whose names match this pattern, such as 'oversaturated/*' (default: all)")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="minutes to simulate each scenario for (default: 10)")
+    parser.add_argument("-n", "--repeats", type=int, default=3, help="times to time each scenario, keeping the quickest (default: 3)")
+    parser.add_argument("--event-driven", action="store_true", help="skip idle stretches while simulating")
+    parser.add_argument("--no-memory", action="store_true", help="don't measure peak memory, which simulates every scenario twice")
+    parser.add_argument("--compare", help="results of an earlier run to compare with. Exits with 1 if any scenario is slower")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="share of throughput a scenario can lose before it counts as slower (default: 0.1)")
+    parser.add_argument("-l", "--list", action="store_true", help="list the scenarios instead of running them")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for scenario in get_scenarios(args.scenarios):
+            print(scenario.name)
+        return
+
+    def progress(result: dict) -> None:
+        print(f"{result['name']}: {result['simulated_seconds_per_second']:.0f} simulated s/s", file=sys.stderr)
+
+    results = run_benchmarks(args.scenarios, args.duration, event_driven=args.event_driven,
+                             measure_memory=not args.no_memory, repeats=args.repeats, progress=progress)
+    write_json(results, args.output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            comparison = compare_benchmarks(json.load(baseline_file), results, args.threshold)
+        for scenario in comparison:
+            flags = " REGRESSION" * scenario["regression"] + " KPIs changed" * scenario["kpi_changed"]
+            print(f"{scenario['name']}: {scenario['speedup']:.2f}x{flags}", file=sys.stderr)
+        if any(scenario["regression"] for scenario in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
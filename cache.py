@@ -0,0 +1,134 @@
+from typing import List, Optional
+import functools
+import importlib
+import hashlib
+import sqlite3
+import json
+import time
+import sys
+import os
+
+#Modules whose code decides a simulation's results. Changing any of them gives every scenario a new key.
+#sweep builds and simulates the junction for each job, so it is one of them.
+SIMULATOR_MODULES: List[str] = ["Arm", "Box", "Junction", "Lane", "TrafficLight", "Vehicle", "VehicleStore", "sweep"]
+
+#Results kept by default before the least recently used are removed, around 50MB
+MAX_CACHE_ENTRIES: int = 20000
+
+
+@functools.lru_cache(maxsize=None)
+def simulator_version() -> str:
+    """
+    Returns a hash of the simulator's source code, so results simulated by an older version are never reused.
+    The frozen executable has no source files, so it uses the executable's modification time instead.
+    """
+    digest = hashlib.sha256()
+    try:
+        for name in SIMULATOR_MODULES:
+            with open(importlib.import_module(name).__file__, "rb") as source_file:
+                digest.update(source_file.read())
+    except (OSError, TypeError):
+        digest.update(f"{sys.executable}:{os.path.getmtime(sys.executable)}".encode())
+    return digest.hexdigest()
+
+
+def scenario_key(job,
+                 traffic_data: List[List[int]],
+                 sim_time_ms: int,
+                 update_length_ms: int,
+                 steady_state: bool = False,
+                 **junction_kwargs) -> str:
+    """
+    Returns a canonical hash of everything that decides the results of simulating one sweep job
+
+    :param job: The sweep job, giving the junction's layout and seed
+    :param steady_state: Whether the job is simulated until its KPIs converge, with sim_time_ms as the longest time
+    :param junction_kwargs: Parameters shared by every job in the sweep (crossing time/frequency, bus ratio)
+    """
+    junction_kwargs = {name: value for name, value in junction_kwargs.items() if value is not None}
+    # crossing parameters make no difference to a junction without a crossing
+    if not job.pedestrian_crossing:
+        junction_kwargs.pop("p_crossing_time_s", None)
+        junction_kwargs.pop("p_crossing_freq", None)
+
+    scenario = {
+        "traffic_data": [[float(value) for value in row] for row in traffic_data],
+        "num_lanes": int(job.num_lanes),
+        "lane_directions": [sorted(int(direction) for direction in directions) for directions in job.lane_directions],
+        "pedestrian_crossing": bool(job.pedestrian_crossing),
+        "bus_lane": bool(job.bus_lane),
+        "left_turn_lanes": bool(job.left_turn_lanes),
+        "junction": {name: float(value) for name, value in junction_kwargs.items()},
+        "sim_time_ms": int(sim_time_ms),
+        "update_length_ms": int(update_length_ms),
+        "steady_state": bool(steady_state),
+        "seed": int(job.seed),
+        "simulator": simulator_version(),
+    }
+    return hashlib.sha256(json.dumps(scenario, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Results of simulated sweep jobs kept in an SQLite database on disk, keyed by scenario_key, so running a sweep
+    again with some of the same configurations only simulates the new ones. Results that stop being used, such as
+    those of an older simulator or of another session's seed, are removed once there are too many.
+    """
+    def __init__(self, path: str, max_entries: Optional[int] = MAX_CACHE_ENTRIES):
+        """
+        :param max_entries: The number of results to keep. When opened with more than this, the least recently used
+        are removed. None keeps them all.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                                     "last_used REAL NOT NULL DEFAULT 0)")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(results)")]
+            # caches written before results were evicted have no last use, so they go first
+            if "last_used" not in columns:
+                self._connection.execute("ALTER TABLE results ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        if max_entries is not None:
+            self.prune(max_entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        """ Returns the stored result for a scenario, or None if it hasn't been simulated """
+        row = self._connection.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._connection:
+            self._connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict) -> None:
+        """ Stores the result of simulating a scenario """
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO results (key, result, last_used) VALUES (?, ?, ?)",
+                                     (key, json.dumps(result), time.time()))
+
+    def prune(self, max_entries: int) -> int:
+        """
+        Remove the least recently used results until there are at most max_entries
+
+        :return: The number of results removed
+        """
+        with self._connection:
+            removed = self._connection.execute("DELETE FROM results WHERE key NOT IN "
+                                               "(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)", (max_entries,)).rowcount
+        if removed:
+            self._connection.execute("VACUUM")
+        return removed
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
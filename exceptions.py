@@ -2,4 +2,7 @@ class TooManyVehiclesException(Exception):
     pass
 
 class NotEnoughLanesException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class SweepCancelledException(Exception):
+    pass
@@ -0,0 +1,79 @@
+from typing import Callable, Dict, List
+import functools
+import time
+
+
+class PhaseProfile:
+    """
+    Wall time and call counts for each phase of a junction's simulation steps, overall and for each arm, and counts
+    of the work done in them. Filled in by wrappers Junction.enable_profiling puts around the methods for each
+    phase, so a junction that isn't being profiled runs exactly the same code as before.
+    """
+    def __init__(self, num_arms: int):
+        # [seconds, calls] for each phase, and for each arm's phases
+        self.phases: Dict[str, List[float]] = {}
+        self.arm_phases: List[Dict[str, List[float]]] = [{} for _ in range(num_arms)]
+        self.counters: Dict[str, int] = {}
+
+    def timed(self, function: Callable, phase: str, arm: int = None) -> Callable:
+        """ Returns the function wrapped to add its wall time and a call to a phase, of one arm if given """
+        timings = (self.phases if arm is None else self.arm_phases[arm]).setdefault(phase, [0.0, 0])
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings[0] += clock() - start
+                timings[1] += 1
+        return wrapper
+
+    def counted(self, function: Callable, counter: str, amount: Callable = None) -> Callable:
+        """
+        Returns the function wrapped to add to a counter each time it is called
+
+        :param amount: Works out how much to add from the function's result. Adds 1 if not given.
+        """
+        self.counters.setdefault(counter, 0)
+        counters = self.counters
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            result = function(*args, **kwargs)
+            counters[counter] += 1 if amount is None else amount(result)
+            return result
+        return wrapper
+
+    def count(self, counter: str, amount: int) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self) -> dict:
+        """ Returns the profile as plain data, with seconds and calls for each phase """
+        def phases(timings: Dict[str, List[float]]) -> dict:
+            return {phase: {"seconds": seconds, "calls": calls} for phase, (seconds, calls) in timings.items()}
+        return {
+            "phases": phases(self.phases),
+            "arms": [phases(timings) for timings in self.arm_phases],
+            "counters": dict(self.counters),
+        }
+
+    @staticmethod
+    def combine(profiles: List[dict]) -> dict:
+        """ Adds up profiles returned by to_dict, such as those of every configuration in a sweep """
+        total = PhaseProfile(max([len(profile["arms"]) for profile in profiles], default=0))
+
+        def add(timings: Dict[str, List[float]], phases: dict) -> None:
+            for phase, timing in phases.items():
+                phase_total = timings.setdefault(phase, [0.0, 0])
+                phase_total[0] += timing["seconds"]
+                phase_total[1] += timing["calls"]
+
+        for profile in profiles:
+            add(total.phases, profile["phases"])
+            for arm_timings, arm_phases in zip(total.arm_phases, profile["arms"]):
+                add(arm_timings, arm_phases)
+            for counter, amount in profile["counters"].items():
+                total.count(counter, amount)
+        return total.to_dict()
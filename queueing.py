@@ -0,0 +1,161 @@
+from typing import List, Set
+from Junction import Junction
+from Vehicle import Car, Bus
+from exceptions import NotEnoughLanesException
+import math
+
+
+class QueueEstimate:
+    """
+    Approximate steady state behaviour of every lane in a junction, from treating each lane as a queue served at
+    its saturation flow while its light is green
+    """
+    def __init__(self, arrival_rates: List[List[float]], utilisations: List[List[float]], waits_s: List[List[float]]):
+        # one list per arm with one entry per lane, in the arm's lane order
+        self.arrival_rates = arrival_rates
+        self.utilisations = utilisations
+        self.waits_s = waits_s
+
+    @property
+    def max_utilisation(self) -> float:
+        """ The utilisation of the busiest lane. A lane at or above 1 can't keep up with its arrivals. """
+        return max(max(arm, default=0) for arm in self.utilisations)
+
+    @property
+    def saturated(self) -> bool:
+        return self.max_utilisation >= 1
+
+    def get_arm_average_waits_s(self) -> List[float]:
+        """ Returns the approximate average wait in seconds of the vehicles arriving in each arm """
+        return [self._average_wait(rates, waits) for rates, waits in zip(self.arrival_rates, self.waits_s)]
+
+    def get_average_wait_s(self) -> float:
+        """ Returns the approximate average wait in seconds of every vehicle arriving at the junction """
+        return self._average_wait(sum(self.arrival_rates, []), sum(self.waits_s, []))
+
+    @staticmethod
+    def _average_wait(rates: List[float], waits: List[float]) -> float:
+        total_rate = sum(rates)
+        if total_rate == 0:
+            return 0
+        if any(wait == math.inf for rate, wait in zip(rates, waits) if rate > 0):
+            return math.inf
+        return sum(rate * wait for rate, wait in zip(rates, waits) if rate > 0) / total_rate
+
+
+def get_cycle_length_ms(traffic_light_interval_ms: int,
+                        pedestrian_crossing: bool = False,
+                        p_crossing_time_s: int = 0,
+                        p_crossing_freq: float = 0) -> float:
+    """
+    Approximate length of a full traffic light cycle while every arm has traffic: each arm's green interval and the
+    gap after it, plus the crossings. A crossing request waits for the next gap, so there is at most one per gap.
+    """
+    cycle_ms = Junction.NUM_ARMS * (traffic_light_interval_ms + Junction.TRAFFIC_LIGHT_GAP_MS)
+    if not pedestrian_crossing or not p_crossing_freq:
+        return cycle_ms
+    crossing_ms = p_crossing_time_s * 1000
+    requests_per_ms = p_crossing_freq / (60 * 60 * 1000)
+    # the cycle stretches by a crossing for each request made during it, up to one a gap
+    if crossing_ms * requests_per_ms < 1:
+        stretched_ms = cycle_ms / (1 - crossing_ms * requests_per_ms)
+        if stretched_ms * requests_per_ms < Junction.NUM_ARMS:
+            return stretched_ms
+    return cycle_ms + Junction.NUM_ARMS * crossing_ms
+
+
+def get_lane_wait_s(arrival_rate: float, saturation_flow: float, green_ratio: float, cycle_s: float) -> float:
+    """
+    Webster's approximation of the average wait at a traffic light: the wait for the light to turn green plus the
+    wait from random arrivals queueing
+
+    :param arrival_rate: Vehicles arriving each second
+    :param saturation_flow: Vehicles leaving each second while the light is green and the lane is queued
+    :param green_ratio: The share of the cycle the light is green for
+    :param cycle_s: The length of the cycle in seconds
+    :return: The average wait in seconds, infinite if the lane can't keep up
+    """
+    if arrival_rate == 0:
+        return 0
+    utilisation = arrival_rate / (saturation_flow * green_ratio)
+    if utilisation >= 1:
+        return math.inf
+    uniform_wait = cycle_s * (1 - green_ratio) ** 2 / (2 * (1 - utilisation * green_ratio))
+    random_wait = utilisation ** 2 / (2 * arrival_rate * (1 - utilisation))
+    return uniform_wait + random_wait
+
+
+def estimate_junction(traffic_data: List[List[int]],
+                      allowed_lane_directions: List[Set[int]],
+                      num_lanes: int = 2,
+                      traffic_light_interval_ms: int = 20000,
+                      pedestrian_crossing: bool = False,
+                      p_crossing_time_s: int = 0,
+                      p_crossing_freq: float = 0,
+                      bus_lane: bool = False,
+                      bus_ratio: float = 0,
+                      left_turn_lanes: bool = False) -> QueueEstimate:
+    """
+    Estimate how well a junction copes with its traffic without simulating it. Takes the same parameters as
+    Junction. Arrivals are shared evenly between the lanes they can use, as lane switching tends to balance them,
+    and a lane serves its queue at the rate vehicles can follow each other into the box while its light is green.
+    Left turn lanes can go whenever any light is green. Lights are taken to run their full cycle, which overstates
+    waits in light traffic, and conflicts in the box are ignored, so the estimates are for ranking configurations
+    and spotting the ones that can't cope rather than predicting the simulation's KPIs.
+
+    :return: The estimated utilisation and wait of every lane
+    """
+    num_arms = Junction.NUM_ARMS
+    bus_ratio = bus_ratio / 100
+    if bus_lane:
+        num_lanes -= 1
+    if num_lanes <= 0:
+        raise NotEnoughLanesException("Number of lanes must be > 1 if using a bus lane")
+    if left_turn_lanes and allowed_lane_directions[0] != {1}:
+        raise NotEnoughLanesException("This preset doesn't generate left turn lanes")
+
+    # each vehicle needs its length and stopping distance to itself when following another into the box
+    car, bus = Car(0, 0, 1, 0, num_arms), Bus(0, 0, 1, 0, num_arms)
+    car_spacing = car.length + car.stopping_distance
+    bus_spacing = bus.length + bus.stopping_distance
+
+    cycle_ms = get_cycle_length_ms(traffic_light_interval_ms, pedestrian_crossing, p_crossing_time_s, p_crossing_freq)
+    arm_green_ratio = traffic_light_interval_ms / cycle_ms
+    any_green_ratio = min(num_arms * arm_green_ratio, 1)
+
+    arrival_rates, utilisations, waits_s = [], [], []
+    for source in range(num_arms):
+        # vehicles per second and total spacing of the cars and buses arriving in each lane
+        lanes = [set(directions) for directions in allowed_lane_directions[:num_lanes]]
+        car_rates, bus_rates = [0.0] * len(lanes), [0.0] * len(lanes)
+        for destination in range(num_arms):
+            rate = traffic_data[source][destination] / (60 * 60)
+            if rate == 0:
+                continue
+            direction = (destination - source) % num_arms
+            usable = [i for i, directions in enumerate(lanes) if direction in directions]
+            for i in usable:
+                car_rates[i] += rate * (1 - bus_ratio) / len(usable)
+                if not bus_lane:
+                    bus_rates[i] += rate * bus_ratio / len(usable)
+        green_ratios = [any_green_ratio if left_turn_lanes and directions == {1} else arm_green_ratio for directions in lanes]
+
+        # the bus lane comes first and takes every bus
+        if bus_lane:
+            car_rates.insert(0, 0.0)
+            bus_rates.insert(0, sum(traffic_data[source]) * bus_ratio / (60 * 60))
+            green_ratios.insert(0, arm_green_ratio)
+
+        arm_rates, arm_utilisations, arm_waits = [], [], []
+        for car_rate, bus_rate, green_ratio in zip(car_rates, bus_rates, green_ratios):
+            rate = car_rate + bus_rate
+            spacing = (car_rate * car_spacing + bus_rate * bus_spacing) / rate if rate else car_spacing
+            saturation_flow = Junction.VEHICLE_SPEED_MPS / spacing
+            arm_rates.append(rate)
+            arm_utilisations.append(rate / (saturation_flow * green_ratio))
+            arm_waits.append(get_lane_wait_s(rate, saturation_flow, green_ratio, cycle_ms / 1000))
+        arrival_rates.append(arm_rates)
+        utilisations.append(arm_utilisations)
+        waits_s.append(arm_waits)
+
+    return QueueEstimate(arrival_rates, utilisations, waits_s)
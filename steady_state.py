@@ -0,0 +1,50 @@
+from typing import List
+import numpy as np
+
+#Two-sided 95% critical values of Student's t distribution for 1 to 30 degrees of freedom.
+#The normal distribution's value is close enough past that.
+T_CRITICAL_95: List[float] = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                              2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                              2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_CRITICAL_95: float = 1.960
+
+
+def confidence_half_width(samples: np.ndarray) -> np.ndarray:
+    """
+    Half the width of the 95% confidence interval of the mean of some samples
+
+    :param samples: One sample per row. Each column gets its own interval.
+    :return: The half widths, infinite with fewer than two samples
+    """
+    samples = np.asarray(samples, float)
+    if len(samples) < 2:
+        return np.full(samples.shape[1:], np.inf)
+    degrees_of_freedom = len(samples) - 1
+    t = T_CRITICAL_95[degrees_of_freedom - 1] if degrees_of_freedom <= len(T_CRITICAL_95) else Z_CRITICAL_95
+    return t * samples.std(axis=0, ddof=1) / np.sqrt(len(samples))
+
+
+def mser_truncation_point(series: List[float], batch_size: int = 1) -> int:
+    """
+    Find where the start-up transient of a series ends with the MSER rule: drop the first observations that
+    minimise the squared error of the mean of what is left, per observation left. Only the first half of the
+    series is searched, as dropping more leaves too little to judge by.
+
+    :param series: The observations in time order
+    :param batch_size: Average the observations in batches of this size first (MSER-5 uses 5) to smooth out noise
+    :return: The number of observations to drop. If it is half the series or more, the transient hasn't ended yet.
+    """
+    num_batches = len(series) // batch_size
+    if num_batches < 2:
+        return 0
+    batches = np.asarray(series[:num_batches * batch_size], float).reshape(num_batches, batch_size).mean(axis=1)
+
+    #Sums of what is left after dropping each number of batches, from the end so every truncation is found at once
+    remaining = np.arange(num_batches, 0, -1)
+    totals = np.cumsum(batches[::-1])[::-1]
+    squared_totals = np.cumsum(batches[::-1] ** 2)[::-1]
+    squared_errors = squared_totals - totals ** 2 / remaining
+    statistics = squared_errors / remaining ** 2
+
+    searched = num_batches // 2 + 1
+    return int(np.argmin(statistics[:searched])) * batch_size
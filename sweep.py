@@ -0,0 +1,1097 @@
+from typing import List, Set, Tuple, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Junction import Junction
+from exceptions import NotEnoughLanesException, SweepCancelledException
+from queueing import estimate_junction, QueueEstimate
+from cache import ResultCache, scenario_key
+from steady_state import confidence_half_width
+from profiling import PhaseProfile
+import multiprocessing
+import math
+import numpy as np
+import argparse
+import json
+import time
+import sys
+
+# list of lane presets which denote which relative dirs each lane can travel in
+lane_dir_presets = [
+    # all presets for 1 lane configurations
+    [[{1, 2, 3}]],
+
+    # all presets for 2 lane configurations
+    [[{1}, {2, 3}], [{1, 2}, {3}], [{1}, {1, 2, 3}], [{1, 2, 3}, {3}]],
+
+    # all presets for 3 lane configurations
+    [[{1}, {2}, {3}], [{1, 2}, {2}, {2, 3}], [{1}, {2}, {2, 3}], [{1, 2}, {2}, {3}],
+     [{1}, {2, 3}, {3}], [{1}, {1, 2}, {3}]],
+
+    # all presets for 4 lane configurations
+    [[{1}, {2}, {2}, {3}], [{1}, {2}, {3}, {3}], [{1}, {1}, {2}, {3}], [{1}, {1, 2}, {2, 3}, {3}],
+     [{1}, {1, 2}, {2}, {3}], [{1}, {2}, {2, 3}, {3}]],
+
+    # all presets for 5 lane configurations
+    [[{1}, {1}, {2}, {3}, {3}], [{1}, {1, 2}, {2}, {2, 3}, {3}], [{1}, {1}, {1}, {2, 3}, {3}],
+     [{1}, {1, 2}, {3}, {3}, {3}],
+     [{1}, {1}, {2}, {2, 3}, {3}], [{1}, {1, 2}, {2}, {3}, {3}], [{1, 2}, {2}, {2}, {2}, {2, 3}],
+     [{1}, {1, 2}, {2}, {2}, {3}], [{1}, {2}, {2}, {2, 3}, {3}]]
+
+]
+
+
+def calc_efficiency(north_arm, south_arm, east_arm, west_arm, w_avg, w_max, w_len) -> float:
+    """
+    Calculates a junction-wide efficiency, ensuring that if all arms are perfect (zero wait times & zero queue), the overall
+    score is 100. This relies on w_avg + w_max + w_queue == 1.
+    Each arm is a tuple of (avg_wait, max_wait, max_queue)
+    """
+    # Scale constants (expected values for each of the metrics)
+    avg_wait_scale = 20
+    max_wait_scale = 60
+    max_queue_scale = 30
+    # Gather all arms in a list
+    arms = [north_arm, south_arm, east_arm, west_arm]
+    # Sum partial scores across the 4 arms
+    # Because w_avg + w_max + w_queue = 1, a perfect arm yields 1.0
+    # Summing 4 perfect arms => 4. Therefore need to scale to 100 below
+    raw_sum = 0.0
+    for (avg_wait, max_wait, queue_len) in arms:
+        # Weighted sum for this arm
+        arm_score = (w_avg * (1.0 / (1.0 + avg_wait/avg_wait_scale))
+                     + w_max * (1.0 / (1.0 + max_wait/max_wait_scale))
+                     + w_len * (1.0 / (1.0 + queue_len/max_queue_scale))
+                     )
+        raw_sum += arm_score
+    # Perfect sceneario => raw_sum = 4. We want that => 100 => multiply by 25
+    total_score = 25.0 * raw_sum
+    return total_score
+
+
+class SweepJob:
+    """
+    A single junction configuration within a sweep, along with the seed used to simulate it
+    """
+    def __init__(self,
+                 index: int,
+                 num_lanes: int,
+                 pedestrian_crossing: bool,
+                 bus_lane: bool,
+                 left_turn_lanes: bool,
+                 lane_directions: List[Set[int]],
+                 seed: int,
+                 replication: int = 0):
+        # position of the job in the sweep, used to give results a stable order
+        self.index = index
+        self.num_lanes = num_lanes
+        self.pedestrian_crossing = pedestrian_crossing
+        self.bus_lane = bus_lane
+        self.left_turn_lanes = left_turn_lanes
+        self.lane_directions = lane_directions
+        # seed for the junction's random number generator, so each job is reproducible on its own
+        self.seed = seed
+        # which of the configuration's independent replications this job is, when simulated more than once
+        self.replication = replication
+
+
+class SweepResult:
+    """
+    The key performance indicators produced by simulating one sweep job
+    """
+    def __init__(self,
+                 job: SweepJob,
+                 kpi: List[List[float]],
+                 arm_throughputs: List[int],
+                 queue_times_ms: List[float] = None,
+                 queue_lengths: List[List[int]] = None,
+                 profile: dict = None,
+                 steady_state: dict = None):
+        self.job = job
+        self.kpi = kpi
+        self.arm_throughputs = arm_throughputs
+        # the longest queue in each arm over the simulation, from Junction.get_queue_length_samples
+        self.queue_times_ms = queue_times_ms
+        self.queue_lengths = queue_lengths
+        # time spent in each phase of the simulation, from PhaseProfile.to_dict, if it was profiled
+        self.profile = profile
+        # what Junction.simulate_until_steady reported, if the job was simulated until its KPIs converged
+        self.steady_state = steady_state
+        # junction-wide efficiency, set once the sweep's weightings are applied
+        self.efficiency: float = None
+
+    def to_cache_entry(self) -> dict:
+        """ Returns everything simulating the job produced, for storing in a ResultCache """
+        return {
+            "kpi": self.kpi,
+            "arm_throughputs": self.arm_throughputs,
+            "queue_times_ms": self.queue_times_ms,
+            "queue_lengths": self.queue_lengths,
+            "steady_state": self.steady_state,
+        }
+
+    @staticmethod
+    def from_cache_entry(job: SweepJob, entry: dict) -> "SweepResult":
+        """ Rebuilds the result of a job from what to_cache_entry stored """
+        return SweepResult(job, entry["kpi"], entry["arm_throughputs"], entry.get("queue_times_ms"), entry.get("queue_lengths"),
+                           steady_state=entry.get("steady_state"))
+
+    def to_dict(self) -> dict:
+        """ Returns the result in a form that can be written out as JSON """
+        result = {
+            "efficiency": self.efficiency,
+            "num_lanes": self.job.num_lanes,
+            "pedestrian_crossing": self.job.pedestrian_crossing,
+            "bus_lane": self.job.bus_lane,
+            "left_turn_lanes": self.job.left_turn_lanes,
+            "lane_directions": [sorted(directions) for directions in self.job.lane_directions],
+            "seed": self.job.seed,
+            # average wait time, maximum wait time and maximum queue length for each arm
+            "kpi": self.kpi,
+            "arm_throughputs": self.arm_throughputs,
+        }
+        if self.steady_state is not None:
+            result["steady_state"] = self.steady_state
+        if self.profile is not None:
+            result["profile"] = self.profile
+        return result
+
+
+def create_jobs(lane_configs: List[int],
+                combinations: List[Tuple[bool, bool, bool]],
+                seed: int = None,
+                common_random_numbers: bool = False) -> List[SweepJob]:
+    """
+    Expand the lane counts and (pedestrian, bus, left turn) combinations of a sweep into one job per lane preset
+
+    :param lane_configs: The numbers of lanes to simulate
+    :param combinations: The (pedestrian crossing, bus lane, left turn lane) options to simulate
+    :param seed: Seed the per-job seeds are derived from. Random if not given.
+    :param common_random_numbers: Give every job the same seed, so every configuration sees the same arrivals and
+    pedestrian crossing requests and differences between them come from the configuration alone
+    :return: The jobs in the order the GUI has always simulated them
+    """
+    configurations = []
+    for num_lanes in lane_configs:
+        for (ped_yes, bus_yes, left_yes) in combinations:
+            # a bus lane takes one of the lanes, so use the presets for one fewer lane
+            chosen_lane_presets = num_lanes - 1 if (not bus_yes or num_lanes < 2) else num_lanes - 2
+            for lane_directions in lane_dir_presets[chosen_lane_presets]:
+                configurations.append((num_lanes, ped_yes, bus_yes, left_yes, lane_directions))
+
+    # derive an independent seed for every job from a single sweep seed, or one seed shared by them all
+    num_seeds = 1 if common_random_numbers else len(configurations)
+    job_seeds = np.random.SeedSequence(seed).generate_state(num_seeds) if configurations else []
+    if common_random_numbers:
+        job_seeds = [job_seeds[0]] * len(configurations)
+    return [SweepJob(i, *configuration, int(job_seeds[i])) for i, configuration in enumerate(configurations)]
+
+
+def simulate_job(job: SweepJob,
+                 traffic_data: List[List[int]],
+                 sim_time_ms: int,
+                 update_length_ms: int = 100,
+                 profile: bool = False,
+                 progress_slot: int = None,
+                 steady_state: bool = False,
+                 **junction_kwargs) -> SweepResult:
+    """
+    Build and simulate the junction for one sweep job. Runs inside a worker process.
+
+    :param profile: Time each phase of the simulation and return the profile with the KPIs
+    :param progress_slot: Where to keep the time simulated so far in the sweep's shared progress, if it has any
+    :param steady_state: Simulate until the KPIs converge (see Junction.simulate_until_steady), for at most sim_time_ms
+    :param junction_kwargs: Parameters shared by every job in the sweep (crossing time/frequency, bus ratio)
+    :return: The job's results, or None if the junction can't be built with this preset
+    """
+    junction = build_junction(job, traffic_data, **junction_kwargs)
+    if junction is None:
+        return None
+
+    step_callback = None
+    if progress_slot is not None and _worker_progress is not None:
+        simulated_ms, cancel_flag = _worker_progress
+        if cancel_flag.value:
+            return None
+
+        def step_callback(elapsed_ms: int) -> bool:
+            simulated_ms[progress_slot] = elapsed_ms
+            return not cancel_flag.value
+
+    if profile:
+        junction.enable_profiling()
+    report = None
+    if steady_state:
+        report = junction.simulate_until_steady(sim_time_ms, update_length_ms, step_callback=step_callback)
+    else:
+        junction.simulate(sim_time_ms, update_length_ms, step_callback=step_callback)
+    # a cancelled simulation stops part way, so has no results. One that finished before it was cancelled does.
+    finished = junction.get_elapsed_ms() >= sim_time_ms or (report is not None and report["converged"])
+    if step_callback is not None and cancel_flag.value and not finished:
+        return None
+    queue_times_ms, queue_lengths = junction.get_queue_length_samples()
+    profile = junction.disable_profiling()
+    return SweepResult(job, junction.get_kpi(), junction.get_arm_throughputs(), queue_times_ms.tolist(), queue_lengths.tolist(),
+                       profile.to_dict() if profile else None, report)
+
+
+def build_junction(job: SweepJob, traffic_data: List[List[int]], **junction_kwargs) -> Junction:
+    """
+    Build the junction for one sweep job
+
+    :return: The junction, or None if it can't be built with this preset
+    """
+    try:
+        return Junction(
+            traffic_data,
+            job.lane_directions,
+            num_lanes=job.num_lanes,
+            pedestrian_crossing=job.pedestrian_crossing,
+            bus_lane=job.bus_lane,
+            left_turn_lanes=job.left_turn_lanes,
+            seed=job.seed,
+            **junction_kwargs
+        )
+    except NotEnoughLanesException:
+        # Not adding junctions that fail to create
+        return None
+
+
+def estimate_job(job: SweepJob,
+                 traffic_data: List[List[int]],
+                 crossing_time: int = None,
+                 crossing_frequency: int = None,
+                 bus_percentage: float = 0) -> QueueEstimate:
+    """
+    Estimate how well the junction for one sweep job copes with its traffic, without simulating it
+
+    :return: The estimate, or None if the junction can't be built with this preset
+    """
+    try:
+        return estimate_junction(traffic_data,
+                                 job.lane_directions,
+                                 num_lanes=job.num_lanes,
+                                 pedestrian_crossing=job.pedestrian_crossing,
+                                 p_crossing_time_s=crossing_time or 0,
+                                 p_crossing_freq=crossing_frequency or 0,
+                                 bus_lane=job.bus_lane,
+                                 bus_ratio=bus_percentage,
+                                 left_turn_lanes=job.left_turn_lanes)
+    except NotEnoughLanesException:
+        return None
+
+
+def prescreen_jobs(jobs: List[SweepJob],
+                   traffic_data: List[List[int]],
+                   crossing_time: int = None,
+                   crossing_frequency: int = None,
+                   bus_percentage: float = 0,
+                   skip_saturated: bool = True) -> List[SweepJob]:
+    """
+    Order the jobs of a sweep by their estimated average wait, so the most promising are simulated first
+
+    :param skip_saturated: Leave out jobs with a lane that can't keep up with its traffic, unless every job has one
+    :return: The jobs that can be built, best estimate first
+    """
+    estimates = {job.index: estimate_job(job, traffic_data, crossing_time, crossing_frequency, bus_percentage) for job in jobs}
+    jobs = [job for job in jobs if estimates[job.index] is not None]
+    if skip_saturated and not all(estimates[job.index].saturated for job in jobs):
+        jobs = [job for job in jobs if not estimates[job.index].saturated]
+    return sorted(jobs, key=lambda job: (estimates[job.index].saturated, estimates[job.index].get_average_wait_s(), job.index))
+
+
+def simulate_slice(junction: Junction, sim_time_ms: int, update_length_ms: int, profile: bool = False) -> Tuple[Junction, dict]:
+    """
+    Carry on simulating a junction for a slice of time. Runs inside a worker process, so returns the junction.
+
+    :param profile: Time each phase of the slice. The profiling is turned off again before the junction is returned,
+    as the methods it wraps can't be sent back from a worker process.
+    :return: The junction, and the slice's profile if profiled
+    """
+    if profile:
+        junction.enable_profiling()
+    junction.simulate(sim_time_ms, update_length_ms)
+    slice_profile = junction.disable_profiling()
+    return junction, slice_profile.to_dict() if slice_profile else None
+
+
+def _mp_context():
+    """
+    Start worker processes from a fork server where there is one, or by spawning them. Forking the calling process
+    would copy it mid-way through whatever its other threads are doing, such as the GUI's SDL threads, which can
+    deadlock the workers. The frozen executable only sets up spawned workers.
+    """
+    if not getattr(sys, 'frozen', False) and "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class SweepProgress:
+    """
+    How far a running sweep has got, for showing while it runs, and a way to cancel it. The simulated time of each
+    job and the cancel flag are in shared memory, so the worker processes update and check them as they step. Safe
+    to read from another thread while the sweep runs.
+    """
+    def __init__(self):
+        context = _mp_context()
+        self._context = context
+        self._cancel_flag = context.RawValue("b", 0)
+        self._simulated_ms = context.RawArray("d", 0)
+        self._slots = {}
+        self._sim_time_ms = 0
+        self._skipped_ms = 0.0
+        self._done = 0
+        self._start_time = time.perf_counter()
+
+    def start(self, jobs: List[SweepJob], sim_time_ms: int) -> None:
+        """ Start tracking the jobs of a sweep, each simulated for sim_time_ms """
+        self._simulated_ms = self._context.RawArray("d", len(jobs))
+        self._slots = {(job.index, job.replication): slot for slot, job in enumerate(jobs)}
+        self._sim_time_ms = sim_time_ms
+        self._skipped_ms = 0.0
+        self._done = 0
+        self._start_time = time.perf_counter()
+
+    def get_slot(self, job: SweepJob) -> int:
+        """ Returns where the job's simulated time is kept in shared memory """
+        return self._slots[job.index, job.replication]
+
+    def set_simulated(self, job: SweepJob, simulated_ms: int) -> None:
+        """ Record how far a job has been simulated, for sweeps that simulate in the calling process """
+        self._simulated_ms[self.get_slot(job)] = simulated_ms
+
+    def finish_job(self, job: SweepJob, simulated: bool = True) -> None:
+        """
+        Mark a job as done
+
+        :param simulated: False if the job came from the cache or couldn't be built, so the time it adds to the
+        progress took no simulating and is left out of the speed the ETA is worked out from
+        """
+        slot = self.get_slot(job)
+        if not simulated:
+            self._skipped_ms += self._sim_time_ms - self._simulated_ms[slot]
+        self._simulated_ms[slot] = self._sim_time_ms
+        self._done += 1
+
+    def cancel(self) -> None:
+        """ Ask the sweep to stop. Running simulations stop at the end of their current step. """
+        self._cancel_flag.value = 1
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self._cancel_flag.value)
+
+    def get_done(self) -> Tuple[int, int]:
+        """ Returns the number of jobs done and the number in the sweep """
+        return self._done, len(self._slots)
+
+    def get_running(self) -> dict:
+        """ Returns the time simulated so far in milliseconds of each job part way through, by job index """
+        simulated_ms = self._simulated_ms[:]
+        return {index: simulated_ms[slot] for (index, _), slot in self._slots.items() if 0 < simulated_ms[slot] < self._sim_time_ms}
+
+    def get_fraction(self) -> float:
+        """ Returns the share of the sweep's simulation done so far, between 0 and 1 """
+        if not self._slots or not self._sim_time_ms:
+            return 0.0
+        return min(sum(self._simulated_ms[:]) / (len(self._slots) * self._sim_time_ms), 1.0)
+
+    def get_eta_s(self) -> float:
+        """
+        Returns the seconds the rest of the sweep should take at the speed jobs have been simulated so far, or None
+        before any simulating is done
+        """
+        if not self._slots:
+            return None
+        done_ms = sum(self._simulated_ms[:])
+        remaining_ms = len(self._slots) * self._sim_time_ms - done_ms
+        if remaining_ms <= 0:
+            return 0.0
+        simulated_ms = done_ms - self._skipped_ms
+        if simulated_ms <= 0:
+            return None
+        return (time.perf_counter() - self._start_time) * remaining_ms / simulated_ms
+
+
+#The shared simulated times and cancel flag of the sweep a worker process is running jobs for, set by _init_worker
+_worker_progress = None
+
+
+def _init_worker(simulated_ms, cancel_flag) -> None:
+    """ Runs at the start of each worker process, and in the calling process when it simulates jobs itself """
+    global _worker_progress
+    _worker_progress = (simulated_ms, cancel_flag)
+
+
+def iter_sweep(jobs: List[SweepJob],
+               traffic_data: List[List[int]],
+               sim_time_ms: int,
+               update_length_ms: int = 100,
+               workers: int = None,
+               cache: ResultCache = None,
+               profile: bool = False,
+               progress: SweepProgress = None,
+               steady_state: bool = False,
+               **junction_kwargs) -> Iterator[SweepResult]:
+    """
+    Simulate every job of a sweep on a pool of worker processes, yielding results as they complete
+
+    :param workers: Number of worker processes. Defaults to one per CPU; 1 simulates in the calling process.
+    :param cache: Where to look up jobs simulated before and store the results of the rest
+    :param profile: Time each phase of every simulation. Results from the cache weren't simulated, so have no profile.
+    :param progress: Where to publish how far the sweep has got. Once it is cancelled no more results are yielded,
+    but the ones finished before are still stored in the cache.
+    :param steady_state: Simulate each job until its KPIs converge, for at most sim_time_ms
+    :return: An iterator over the results in completion order. Jobs that can't be built are skipped.
+    """
+    if progress is not None:
+        progress.start(jobs, sim_time_ms)
+    if cache is None:
+        yield from _simulate_jobs(jobs, traffic_data, sim_time_ms, update_length_ms, workers, profile, progress, steady_state,
+                                  **junction_kwargs)
+        return
+
+    keys = {(job.index, job.replication): scenario_key(job, traffic_data, sim_time_ms, update_length_ms, steady_state, **junction_kwargs)
+            for job in jobs}
+    to_simulate = []
+    for job in jobs:
+        entry = cache.get(keys[job.index, job.replication])
+        if entry is None:
+            to_simulate.append(job)
+        else:
+            if progress is not None:
+                progress.finish_job(job, simulated=False)
+            yield SweepResult.from_cache_entry(job, entry)
+
+    for result in _simulate_jobs(to_simulate, traffic_data, sim_time_ms, update_length_ms, workers, profile, progress, steady_state,
+                                 **junction_kwargs):
+        cache.put(keys[result.job.index, result.job.replication], result.to_cache_entry())
+        yield result
+
+
+def _simulate_jobs(jobs: List[SweepJob],
+                   traffic_data: List[List[int]],
+                   sim_time_ms: int,
+                   update_length_ms: int,
+                   workers: int,
+                   profile: bool = False,
+                   progress: SweepProgress = None,
+                   steady_state: bool = False,
+                   **junction_kwargs) -> Iterator[SweepResult]:
+    """ Simulate jobs on a pool of worker processes as iter_sweep does, without a cache """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(jobs)))
+    worker_progress = (progress._simulated_ms, progress._cancel_flag) if progress is not None else None
+
+    def finished(job: SweepJob, result: SweepResult) -> bool:
+        """ Records a job as done, unless it was stopped by cancelling, and returns whether it has a result """
+        # without cancelling, no result means the job couldn't be built
+        if progress is not None and result is not None:
+            progress.finish_job(job)
+        elif progress is not None and not progress.cancelled:
+            progress.finish_job(job, simulated=False)
+        return result is not None
+
+    # no point paying for process start up when there is only one worker
+    if workers == 1:
+        global _worker_progress
+        if worker_progress is not None:
+            _init_worker(*worker_progress)
+        try:
+            for job in jobs:
+                if progress is not None and progress.cancelled:
+                    return
+                slot = progress.get_slot(job) if progress is not None else None
+                result = simulate_job(job, traffic_data, sim_time_ms, update_length_ms, profile, slot, steady_state, **junction_kwargs)
+                if finished(job, result):
+                    yield result
+        finally:
+            _worker_progress = None
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                             initializer=_init_worker if worker_progress else None, initargs=worker_progress or ()) as executor:
+        futures = {executor.submit(simulate_job, job, traffic_data, sim_time_ms, update_length_ms, profile,
+                                   progress.get_slot(job) if progress is not None else None, steady_state, **junction_kwargs): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            result = future.result()
+            if finished(futures[future], result):
+                yield result
+            if progress is not None and progress.cancelled:
+                # jobs that haven't started yet are dropped, running ones stop at the end of their step
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+
+
+def run_pruned_sweep(traffic_data: List[List[int]],
+                     lane_configs: List[int],
+                     combinations: List[Tuple[bool, bool, bool]],
+                     weights: Tuple[float, float, float],
+                     duration: int,
+                     crossing_time: int = None,
+                     crossing_frequency: int = None,
+                     bus_percentage: float = 0,
+                     update_length_ms: int = 100,
+                     workers: int = None,
+                     seed: int = None,
+                     common_random_numbers: bool = False,
+                     top: int = 3,
+                     num_slices: int = 10,
+                     cache: ResultCache = None,
+                     warm_up: int = 0,
+                     max_step_ms: int = None,
+                     profile: bool = False,
+                     prescreen: bool = False,
+                     progress: SweepProgress = None) -> List[SweepResult]:
+    """
+    Find the most efficient configurations of a sweep without simulating the rest in full. Every configuration is
+    simulated in time slices, the ones that could still finish most efficiently first, starting with the ones the
+    queueing estimate expects to do best. After each slice, the best efficiency a configuration could still finish
+    with comes from Junction.get_kpi_lower_bounds, and it is abandoned once that is below the efficiency of the top
+    configurations that have finished. Takes the same parameters as run_sweep, and gives the same results for the
+    configurations it returns, except with max_step_ms, where a long step can be cut short at the end of a slice.
+
+    :param top: The number of configurations to find
+    :param num_slices: The number of slices each simulation is split into
+    :param cache: Where to look up configurations simulated in full before and store the ones that finish. Configurations
+    abandoned part way have nothing to store. Nor do any with max_step_ms, as their results can differ from run_sweep's.
+    :param profile: Time each phase of every slice, giving each result the total profile of its slices
+    :param prescreen: Skip configurations the queueing estimate finds can't keep up with their traffic, as run_sweep does
+    :param progress: Where to publish how far the search has got, updated after each slice. Abandoned configurations
+    count as done. A cancelled search stops after the slices running at the time and raises SweepCancelledException.
+    The configurations that finished before then are kept in the cache.
+    :return: The top most efficient results, most efficient first
+    """
+    w_avg, w_max, w_queue = weights
+    junction_kwargs = {"p_crossing_time_s": crossing_time, "p_crossing_freq": crossing_frequency, "bus_ratio": bus_percentage,
+                       "warm_up_ms": warm_up * 60 * 1000, "max_step_ms": max_step_ms}
+    jobs = create_jobs(lane_configs, combinations, seed, common_random_numbers)
+    if prescreen:
+        jobs = prescreen_jobs(jobs, traffic_data, crossing_time, crossing_frequency, bus_percentage)
+    # slices are whole steps, so a simulation split into slices steps exactly as it would in one go
+    sim_time_ms = (warm_up + duration) * 60 * 1000
+    slice_ms = math.ceil(sim_time_ms / update_length_ms / max(num_slices, 1)) * update_length_ms
+    if progress is not None:
+        progress.start(jobs, sim_time_ms)
+    jobs = {job.index: job for job in jobs}
+    # queue lengths are sampled from the start of the simulation rather than each slice, as in one go
+    junctions = {index: build_junction(job, traffic_data, queue_sample_interval_ms=sim_time_ms / 10, **junction_kwargs)
+                 for index, job in jobs.items()}
+    for index in [index for index, junction in junctions.items() if junction is None]:
+        del junctions[index]
+        if progress is not None:
+            progress.finish_job(jobs[index], simulated=False)
+    # until they have been simulated for a slice, try the configurations the queueing estimate expects to do best first
+    estimated_order = [job.index for job in prescreen_jobs(list(jobs.values()), traffic_data, crossing_time, crossing_frequency,
+                                                           bus_percentage, skip_saturated=False)]
+    priorities = {index: estimated_order.index(index) if index in estimated_order else len(estimated_order) for index in jobs}
+
+    bounds = {index: math.inf for index in junctions}
+    slice_profiles = {index: [] for index in junctions}
+    finished: List[SweepResult] = []
+
+    # configurations simulated before have finished already
+    for index in list(junctions) if cache is not None else []:
+        entry = cache.get(scenario_key(jobs[index], traffic_data, sim_time_ms, update_length_ms, **junction_kwargs))
+        if entry is not None:
+            result = SweepResult.from_cache_entry(jobs[index], entry)
+            kpi = result.kpi
+            result.efficiency = calc_efficiency(kpi[0], kpi[1], kpi[2], kpi[3], w_avg, w_max, w_queue)
+            finished.append(result)
+            del bounds[index], junctions[index]
+            if progress is not None:
+                progress.finish_job(jobs[index], simulated=False)
+    finished.sort(key=lambda result: (-result.efficiency, result.job.index))
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, max(len(junctions), 1)))
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) if workers > 1 else None
+    try:
+        while True:
+            # abandon configurations that can no longer beat the top ones that have finished
+            if len(finished) >= top:
+                threshold = finished[top - 1].efficiency
+                for index in [index for index, bound in bounds.items() if bound < threshold]:
+                    del bounds[index], junctions[index]
+                    if progress is not None:
+                        progress.finish_job(jobs[index], simulated=False)
+            if not bounds:
+                break
+            if progress is not None and progress.cancelled:
+                raise SweepCancelledException("The sweep was cancelled")
+
+            # carry on with the configurations that could still finish most efficiently, one per worker
+            batch = sorted(bounds, key=lambda index: (-bounds[index], priorities[index]))[:workers]
+            starts_ms = [junctions[index].get_elapsed_ms() for index in batch]
+            slice_lengths = [min(slice_ms, sim_time_ms - start_ms) for start_ms in starts_ms]
+            if executor:
+                futures = [executor.submit(simulate_slice, junctions[index], slice_length, update_length_ms, profile)
+                           for index, slice_length in zip(batch, slice_lengths)]
+                simulated = [future.result() for future in futures]
+            else:
+                simulated = [simulate_slice(junctions[index], slice_length, update_length_ms, profile)
+                             for index, slice_length in zip(batch, slice_lengths)]
+
+            for index, start_ms, slice_length, (junction, slice_profile) in zip(batch, starts_ms, slice_lengths, simulated):
+                junctions[index] = junction
+                if slice_profile:
+                    slice_profiles[index].append(slice_profile)
+                if progress is not None:
+                    progress.set_simulated(jobs[index], junction.get_elapsed_ms())
+                kpi = junction.get_kpi()
+                # the simulation stops early if an arm fills up, which ends it just as it would in one go
+                if junction.get_elapsed_ms() >= sim_time_ms or junction.get_elapsed_ms() < start_ms + slice_length:
+                    queue_times_ms, queue_lengths = junction.get_queue_length_samples()
+                    result = SweepResult(jobs[index], kpi, junction.get_arm_throughputs(), queue_times_ms.tolist(),
+                                         queue_lengths.tolist(),
+                                         profile=PhaseProfile.combine(slice_profiles[index]) if profile else None)
+                    result.efficiency = calc_efficiency(kpi[0], kpi[1], kpi[2], kpi[3], w_avg, w_max, w_queue)
+                    finished.append(result)
+                    del bounds[index], junctions[index]
+                    if cache is not None and not max_step_ms:
+                        cache.put(scenario_key(jobs[index], traffic_data, sim_time_ms, update_length_ms, **junction_kwargs),
+                                  result.to_cache_entry())
+                    if progress is not None:
+                        progress.finish_job(jobs[index])
+                else:
+                    # the least the KPIs could be at the end gives the most efficient it could be
+                    kpi = junction.get_kpi_lower_bounds(sim_time_ms)
+                    bounds[index] = calc_efficiency(kpi[0], kpi[1], kpi[2], kpi[3], w_avg, w_max, w_queue)
+
+            # ties are ranked in sweep order, as run_sweep does
+            finished.sort(key=lambda result: (-result.efficiency, result.job.index))
+    finally:
+        if executor:
+            executor.shutdown()
+    return finished[:top]
+
+
+def run_sweep(traffic_data: List[List[int]],
+              lane_configs: List[int],
+              combinations: List[Tuple[bool, bool, bool]],
+              weights: Tuple[float, float, float],
+              duration: int,
+              crossing_time: int = None,
+              crossing_frequency: int = None,
+              bus_percentage: float = 0,
+              update_length_ms: int = 100,
+              workers: int = None,
+              seed: int = None,
+              common_random_numbers: bool = False,
+              prescreen: bool = False,
+              cache: ResultCache = None,
+              warm_up: int = 0,
+              max_step_ms: int = None,
+              profile: bool = False,
+              progress: SweepProgress = None,
+              steady_state: bool = False) -> List[SweepResult]:
+    """
+    Simulate every configuration of a sweep and rank them. Does not need pygame, so can run on servers without a display.
+
+    :param traffic_data: The number of vehicles per hour from each arm to another
+    :param lane_configs: The numbers of lanes to simulate
+    :param combinations: The (pedestrian crossing, bus lane, left turn lane) options to simulate
+    :param weights: The (average wait, maximum wait, maximum queue length) weightings, which must sum to 1
+    :param duration: The length of each simulation in minutes
+    :param common_random_numbers: Simulate every configuration with the same arrivals and pedestrian crossing requests,
+    which gives a stable ranking from much shorter simulations
+    :param prescreen: Skip configurations the queueing estimate finds can't keep up with their traffic, and simulate
+    the rest best estimate first
+    :param cache: Where to look up configurations simulated before and store the rest. Efficiencies are always worked
+    out afresh, so changing only the weightings needs no simulation.
+    :param warm_up: Minutes to simulate before the KPIs are collected, on top of the duration, so they leave out the
+    junction filling up from empty
+    :param max_step_ms: Let simulations take steps up to this long while nothing is about to happen (see
+    Junction.simulate). Faster, but only close to the results of stepping at update_length_ms throughout.
+    :param profile: Time each phase of every simulation, giving each result a profile (see Junction.enable_profiling)
+    :param progress: Where to publish how far the sweep has got, and check if it has been cancelled. A cancelled sweep
+    raises SweepCancelledException, and the configurations it finished are kept in the cache.
+    :param steady_state: Simulate each configuration only until its KPIs converge, with the warm-up and duration as
+    the longest it can run. Without a warm-up, the start-up transient is found and left out of the KPIs.
+    :return: The results sorted from most to least efficient
+    """
+    w_avg, w_max, w_queue = weights
+    jobs = create_jobs(lane_configs, combinations, seed, common_random_numbers)
+    if prescreen:
+        jobs = prescreen_jobs(jobs, traffic_data, crossing_time, crossing_frequency, bus_percentage)
+    results = list(iter_sweep(jobs,
+                              traffic_data,
+                              (warm_up + duration) * 60 * 1000,
+                              update_length_ms,
+                              workers=workers,
+                              cache=cache,
+                              profile=profile,
+                              progress=progress,
+                              steady_state=steady_state,
+                              p_crossing_time_s=crossing_time,
+                              p_crossing_freq=crossing_frequency,
+                              bus_ratio=bus_percentage,
+                              warm_up_ms=warm_up * 60 * 1000,
+                              max_step_ms=max_step_ms))
+    if progress is not None and progress.cancelled:
+        raise SweepCancelledException("The sweep was cancelled")
+
+    for result in results:
+        kpi = result.kpi
+        result.efficiency = calc_efficiency(kpi[0], kpi[1], kpi[2], kpi[3], w_avg, w_max, w_queue)
+
+    # results arrive in completion order, put them back in sweep order so ties are ranked consistently
+    results.sort(key=lambda result: result.job.index)
+    results.sort(key=lambda result: result.efficiency, reverse=True)
+    return results
+
+
+class ReplicatedResult:
+    """
+    The results of simulating one sweep configuration with several independent seeds, summarised by their means
+    and 95% confidence intervals
+    """
+    def __init__(self, job: SweepJob, weights: Tuple[float, float, float]):
+        self.job = job
+        self.replications: List[SweepResult] = []
+        self._weights = weights
+
+    def add(self, result: SweepResult) -> None:
+        """ Add the result of one replication, keeping them in replication order """
+        kpi = result.kpi
+        result.efficiency = calc_efficiency(kpi[0], kpi[1], kpi[2], kpi[3], *self._weights)
+        self.replications.append(result)
+        self.replications.sort(key=lambda replication: replication.job.replication)
+
+    @property
+    def efficiency(self) -> float:
+        """ Mean efficiency over the replications """
+        return float(np.mean([result.efficiency for result in self.replications]))
+    @property
+    def efficiency_half_width(self) -> float:
+        return float(confidence_half_width([result.efficiency for result in self.replications]))
+    @property
+    def kpi(self) -> List[List[float]]:
+        """ Mean average wait time, maximum wait time and maximum queue length for each arm """
+        return np.mean([result.kpi for result in self.replications], axis=0).tolist()
+    @property
+    def kpi_half_width(self) -> List[List[float]]:
+        return confidence_half_width([result.kpi for result in self.replications]).tolist()
+    @property
+    def arm_throughputs(self) -> List[float]:
+        return np.mean([result.arm_throughputs for result in self.replications], axis=0).tolist()
+    @property
+    def profile(self) -> dict:
+        """ Total profile of the replications that were profiled, or None if none were """
+        profiles = [result.profile for result in self.replications if result.profile]
+        return PhaseProfile.combine(profiles) if profiles else None
+
+    def is_beaten_by(self, leader: "ReplicatedResult") -> bool:
+        """ Returns true if this configuration's efficiency interval lies wholly below the leader's """
+        return self.efficiency + self.efficiency_half_width < leader.efficiency - leader.efficiency_half_width
+
+    def to_dict(self) -> dict:
+        """ Returns the result in the same form as SweepResult.to_dict, with the confidence intervals added """
+        result = SweepResult(self.job, self.kpi, self.arm_throughputs, profile=self.profile)
+        result.efficiency = self.efficiency
+        summary = result.to_dict()
+        del summary["seed"]
+        summary.update({
+            "efficiency_half_width": self.efficiency_half_width,
+            "kpi_half_width": self.kpi_half_width,
+            "seeds": [replication.job.seed for replication in self.replications],
+        })
+        return summary
+
+
+def run_replications(traffic_data: List[List[int]],
+                     lane_configs: List[int],
+                     combinations: List[Tuple[bool, bool, bool]],
+                     weights: Tuple[float, float, float],
+                     duration: int,
+                     crossing_time: int = None,
+                     crossing_frequency: int = None,
+                     bus_percentage: float = 0,
+                     update_length_ms: int = 100,
+                     workers: int = None,
+                     seed: int = None,
+                     common_random_numbers: bool = False,
+                     min_replications: int = 3,
+                     max_replications: int = 10,
+                     cache: ResultCache = None,
+                     warm_up: int = 0,
+                     max_step_ms: int = None,
+                     profile: bool = False,
+                     prescreen: bool = False,
+                     steady_state: bool = False) -> List[ReplicatedResult]:
+    """
+    Simulate every configuration of a sweep with several independent seeds and rank them by mean efficiency.
+    Configurations are raced: every configuration still in the race gets one more replication per round, and a
+    configuration leaves the race once its efficiency interval lies below the leader's or it reaches
+    max_replications. Takes the same parameters as run_sweep.
+
+    :param min_replications: The number of replications every configuration gets before any leave the race
+    :param max_replications: The most replications any configuration gets
+    :param profile: Time each phase of every simulation, giving each result the total profile of its replications
+    :param prescreen: Skip configurations the queueing estimate finds can't keep up with their traffic, as run_sweep does
+    :param steady_state: Simulate each replication only until its KPIs converge, as run_sweep does
+    :return: The results sorted from most to least efficient
+    """
+    # each replication is a sweep of its own, so common random numbers pair the configurations within a replication
+    replication_seeds = np.random.SeedSequence(seed).generate_state(max_replications)
+    replication_jobs = [create_jobs(lane_configs, combinations, int(replication_seed), common_random_numbers)
+                        for replication_seed in replication_seeds]
+    if prescreen:
+        # the estimate doesn't depend on the seed, so every replication keeps the same configurations
+        kept = {job.index for job in prescreen_jobs(replication_jobs[0], traffic_data, crossing_time, crossing_frequency, bus_percentage)}
+        replication_jobs = [[job for job in jobs if job.index in kept] for jobs in replication_jobs]
+    for replication, jobs in enumerate(replication_jobs):
+        for job in jobs:
+            job.replication = replication
+    replication_jobs = [{job.index: job for job in jobs} for jobs in replication_jobs]
+
+    results = {index: ReplicatedResult(job, weights) for index, job in replication_jobs[0].items()}
+    racing = set(results)
+    round_size = max(1, min(min_replications, max_replications))
+    while racing:
+        jobs = [replication_jobs[replication][index]
+                for index in sorted(racing)
+                for replication in range(len(results[index].replications),
+                                         min(len(results[index].replications) + round_size, max_replications))]
+        for result in iter_sweep(jobs,
+                                 traffic_data,
+                                 (warm_up + duration) * 60 * 1000,
+                                 update_length_ms,
+                                 workers=workers,
+                                 cache=cache,
+                                 profile=profile,
+                                 steady_state=steady_state,
+                                 p_crossing_time_s=crossing_time,
+                                 p_crossing_freq=crossing_frequency,
+                                 bus_ratio=bus_percentage,
+                                 warm_up_ms=warm_up * 60 * 1000,
+                                 max_step_ms=max_step_ms):
+            results[result.job.index].add(result)
+        round_size = 1
+
+        # drop configurations that can't be built
+        for index in [index for index in racing if not results[index].replications]:
+            racing.discard(index)
+            del results[index]
+        if not results:
+            break
+
+        leader = max(results.values(), key=lambda result: result.efficiency)
+        racing = {index for index in racing
+                  if len(results[index].replications) < max_replications and not results[index].is_beaten_by(leader)}
+        # the leader has nothing left to race once every other configuration has left
+        if racing == {leader.job.index}:
+            racing = set()
+
+    ranked = sorted(results.values(), key=lambda result: result.job.index)
+    ranked.sort(key=lambda result: result.efficiency, reverse=True)
+    return ranked
+
+
+#(update_length_ms, max_step_ms) pairs compared by step_size_report by default. The first is the reference.
+STEP_SIZE_CANDIDATES: List[Tuple[int, int]] = [(100, None), (100, 500), (100, 1000), (200, None), (250, None),
+                                               (200, 1000), (500, None), (1000, None)]
+
+
+def step_size_report(traffic_data: List[List[int]],
+                     lane_configs: List[int],
+                     combinations: List[Tuple[bool, bool, bool]],
+                     weights: Tuple[float, float, float],
+                     duration: int,
+                     candidates: List[Tuple[int, int]] = None,
+                     tolerance: float = 1.0,
+                     seed: int = 0,
+                     **sweep_kwargs) -> dict:
+    """
+    Run the same sweep with different step sizes and compare every configuration's results with those from the
+    first, smallest step, to find the cheapest step size that gives the same answers. Every run uses the same seed,
+    so the configurations see the same arrivals. Takes the same parameters as run_sweep.
+
+    :param candidates: The (update_length_ms, max_step_ms) pairs to compare, the reference first. A max_step_ms of
+    None steps at update_length_ms throughout.
+    :param tolerance: The largest difference in efficiency score allowed in any configuration
+    :return: For each candidate: how long the sweep took, the largest efficiency and KPI differences from the
+    reference, whether the most efficient configuration is the same and whether it is within tolerance. Also the
+    quickest candidate within tolerance as recommended, or None if none is, such as when no configuration can be built.
+    """
+    candidates = candidates or STEP_SIZE_CANDIDATES
+    reference = None
+    report = []
+    for update_length_ms, max_step_ms in candidates:
+        start = time.perf_counter()
+        results = run_sweep(traffic_data, lane_configs, combinations, weights, duration, seed=seed,
+                            update_length_ms=update_length_ms, max_step_ms=max_step_ms, **sweep_kwargs)
+        seconds = time.perf_counter() - start
+        by_index = {result.job.index: result for result in results}
+        if reference is None:
+            reference = by_index
+        efficiency_error = max([abs(result.efficiency - reference[index].efficiency) for index, result in by_index.items()], default=0)
+        kpi_error = max([float(np.max(np.abs(np.subtract(result.kpi, reference[index].kpi)))) for index, result in by_index.items()], default=0)
+        same_best = bool(results) and results[0].job.index == max(reference.values(), key=lambda result: result.efficiency).job.index
+        report.append({
+            "update_length_ms": update_length_ms,
+            "max_step_ms": max_step_ms,
+            "seconds": round(seconds, 3),
+            "max_efficiency_error": round(efficiency_error, 3),
+            "max_kpi_error": round(kpi_error, 3),
+            "same_best": same_best,
+            "within_tolerance": efficiency_error <= tolerance and same_best,
+        })
+
+    within = [candidate for candidate in report if candidate["within_tolerance"]]
+    return {"tolerance": tolerance, "candidates": report,
+            "recommended": min(within, key=lambda candidate: candidate["seconds"], default=None)}
+
+
+def parse_lane_configs(lanes) -> List[int]:
+    """ Turns a number of lanes (3), a range ("2-4") or a list ([2, 4]) into the list of lane counts to simulate """
+    if isinstance(lanes, int):
+        return [lanes]
+    if isinstance(lanes, str):
+        if "-" in lanes:
+            start, end = lanes.split("-")
+            return list(range(int(start), int(end) + 1))
+        return [int(lanes)]
+    return [int(lane) for lane in lanes]
+
+
+def parse_option(option) -> List[bool]:
+    """ Turns a yes/no/maybe option into the values to simulate. "maybe" simulates with and without the option """
+    if isinstance(option, bool):
+        return [option]
+    option = str(option).lower()
+    if option == "maybe":
+        return [False, True]
+    return [option == "yes"]
+
+
+def load_scenario(path: str) -> dict:
+    """
+    Read a JSON or YAML scenario file. Any parameter left out takes the same default as the GUI.
+
+    :return: The keyword arguments for run_sweep
+    """
+    with open(path) as scenario_file:
+        if path.endswith((".yaml", ".yml")):
+            # only needed for YAML scenarios, so don't make it a hard dependency
+            import yaml
+            scenario = yaml.safe_load(scenario_file)
+        else:
+            scenario = json.load(scenario_file)
+
+    traffic_data = scenario.get("traffic_data",
+                                [[0 if source == dest else 100 for dest in range(Junction.NUM_ARMS)] for source in range(Junction.NUM_ARMS)])
+    combinations = [(ped, bus, left)
+                    for ped in parse_option(scenario.get("pedestrian_crossing", "no"))
+                    for bus in parse_option(scenario.get("bus_lane", "no"))
+                    for left in parse_option(scenario.get("left_turn_lane", "no"))]
+
+    return {
+        "traffic_data": traffic_data,
+        "lane_configs": parse_lane_configs(scenario.get("lanes", 3)),
+        "combinations": combinations,
+        "weights": tuple(scenario.get("weights", (0.3333, 0.3333, 0.3334))),
+        "duration": scenario.get("duration", 60),
+        "crossing_time": scenario.get("crossing_time", 15),
+        "crossing_frequency": scenario.get("crossing_frequency", 10),
+        "bus_percentage": scenario.get("bus_percentage", 1),
+        "seed": scenario.get("seed"),
+        "common_random_numbers": scenario.get("common_random_numbers", False),
+        "warm_up": scenario.get("warm_up", 0),
+        "max_step_ms": scenario.get("max_step_ms"),
+        "steady_state": scenario.get("until_steady", False),
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    """ Command line entry point: simulate the sweep described by a scenario file and write the ranked results as JSON """
+    parser = argparse.ArgumentParser(description="Simulate every junction configuration in a scenario without the GUI.")
+    parser.add_argument("scenario", help="JSON or YAML scenario file")
+    parser.add_argument("-o", "--output", help="file to write the ranked results to (default: standard output)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the sweep, overriding the scenario's")
+    parser.add_argument("--crn", action="store_true",
+                        help="simulate every configuration with the same arrivals and crossing requests (common random numbers)")
+    parser.add_argument("--warm-up", type=int, default=None,
+                        help="minutes to simulate before collecting KPIs, overriding the scenario's")
+    parser.add_argument("--max-step", type=int, default=None,
+                        help="longest step in milliseconds simulations may take while nothing is about to happen")
+    parser.add_argument("--until-steady", action="store_true",
+                        help="end each simulation once its KPIs converge, treating the duration as the longest it can run")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite file to keep simulated results in, so configurations simulated before aren't simulated again")
+    parser.add_argument("--prescreen", action="store_true",
+                        help="skip configurations a queueing estimate finds can't keep up with their traffic")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each phase of a sweep's simulations, adding the profiles to the results and their total to standard error")
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument("-r", "--replications", type=int, default=1,
+                        help="simulate each configuration with up to this many seeds and report confidence intervals (default: 1)")
+    search.add_argument("-t", "--top", type=int, default=None,
+                        help="only find this many of the most efficient configurations, abandoning the rest early")
+    search.add_argument("--step-report", action="store_true",
+                        help="compare the results of different step sizes instead of ranking the configurations")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    if args.seed is not None:
+        scenario["seed"] = args.seed
+    if args.crn:
+        scenario["common_random_numbers"] = True
+    if args.warm_up is not None:
+        scenario["warm_up"] = args.warm_up
+    if args.max_step is not None:
+        scenario["max_step_ms"] = args.max_step
+    if args.until_steady:
+        scenario["steady_state"] = True
+    steady_state = scenario.pop("steady_state")
+    # --top compares configurations part way through their full duration, and --step-report compares full runs
+    if steady_state and (args.top or args.step_report):
+        parser.error("--until-steady can't be used with --top or --step-report")
+    if args.step_report:
+        # results from the cache take no time and profiling slows every step down, either of which spoils the timings
+        if args.cache or args.profile:
+            parser.error("--step-report times each step size, so can't be used with --cache or --profile")
+        # every step size is compared with the same seed, so one is needed even if the scenario has none
+        scenario.pop("max_step_ms")
+        scenario["seed"] = 0 if scenario["seed"] is None else scenario["seed"]
+        report = step_size_report(**scenario, workers=args.workers, prescreen=args.prescreen)
+        write_json(report, args.output)
+        if report["recommended"] is None:
+            print("No step size gave the same results as the reference, or there were no configurations to compare",
+                  file=sys.stderr)
+        return
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        if args.replications > 1:
+            results = run_replications(**scenario, workers=args.workers, max_replications=args.replications, cache=cache,
+                                       profile=args.profile, prescreen=args.prescreen, steady_state=steady_state)
+        elif args.top:
+            results = run_pruned_sweep(**scenario, workers=args.workers, top=args.top, cache=cache, profile=args.profile,
+                                       prescreen=args.prescreen)
+        else:
+            results = run_sweep(**scenario, workers=args.workers, prescreen=args.prescreen, cache=cache, profile=args.profile,
+                                steady_state=steady_state)
+    finally:
+        if cache is not None:
+            cache.close()
+    write_json([result.to_dict() for result in results], args.output)
+    profiles = [result.profile for result in results if getattr(result, "profile", None)]
+    if profiles:
+        json.dump(PhaseProfile.combine(profiles), sys.stderr, indent=2)
+        print(file=sys.stderr)
+
+
+def write_json(data, path: str = None) -> None:
+    """ Write data as JSON to a file, or to standard output if no file is given """
+    if path:
+        with open(path, "w") as output_file:
+            json.dump(data, output_file, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
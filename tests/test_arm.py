@@ -4,6 +4,7 @@ from Lane import Lane, CarLane, BusLane, LeftTurnLane
 from Vehicle import Vehicle, Car, Bus
 from Box import Box
 import unittest
+import math
 
 class TestArm(unittest.TestCase):
     def setUp(self):
@@ -90,9 +91,9 @@ class TestArm(unittest.TestCase):
         vehicle2 = Car(5, 0, 1, 15, 4)
         
         # configure lanes
-        lane1._vehicles = [vehicle1, vehicle2]
+        lane1.add_vehicle(vehicle1)
+        lane1.add_vehicle(vehicle2)
         lane1.queue_length = 2
-        lane2._vehicles = []
         lane2.queue_length = 0
 
         # configure arm
@@ -121,9 +122,8 @@ class TestArm(unittest.TestCase):
         vehicle1 = Car(5, 0, 1, 5, 4)
         
         # configure lanes
-        lane1._vehicles = [vehicle1]
+        lane1.add_vehicle(vehicle1)
         lane1.queue_length = 1
-        lane2._vehicles = []
         lane2.queue_length = 0
         lane2._allowed_directions = {1, 2}
 
@@ -138,6 +138,42 @@ class TestArm(unittest.TestCase):
         self.assertTrue(vehicle1 not in lane2.vehicles)
         
     
+    def test_merge_space_mask(self):
+        """ Tests the vehicles found able to merge at once match those enough_space_to_merge lets merge one by one """
+        lane1 = CarLane({1, 2}, 15, 3, 4)
+        lane2 = CarLane({1, 2}, 15, 3, 4)
+        for distance in (0, 6, 12, 20, 31, 40, 52, 60):
+            lane1.add_vehicle(Car(5, 0, 1, distance, 4))
+        for distance in (5, 25, 45):
+            lane2.add_vehicle(Bus(5, 0, 1, distance, 4))
+
+        expected = [self.arm.enough_space_to_merge(vehicle, lane2) != -1 for vehicle in lane1.vehicles[2:]]
+        mask = self.arm.merge_space_mask(lane1.vehicles, 2, lane2)
+        self.assertEqual(mask.tolist(), expected)
+        self.assertIn(True, expected)
+        self.assertIn(False, expected)
+
+        # every vehicle fits into an empty lane
+        self.assertTrue(self.arm.merge_space_mask(lane1.vehicles, 0, CarLane({1}, 15, 3, 4)).all())
+
+    def test_handle_lane_switching_balances_lanes(self):
+        """Test that vehicles keep switching until the lanes are within one vehicle of each other"""
+        lane1 = CarLane({1, 2}, 15, 3, 4)
+        lane2 = CarLane({1, 2}, 15, 3, 4)
+        vehicles = [Car(5, 0, 1, distance, 4) for distance in (5, 20, 35, 50, 65)]
+        for vehicle in vehicles:
+            lane1.add_vehicle(vehicle)
+        lane1.queue_length = 5
+        lane2.queue_length = 0
+        self.arm._lanes = [lane1, lane2]
+
+        self.arm.handle_lane_switching()
+
+        # the front vehicles move over first, until lane 1 is only one vehicle longer
+        self.assertEqual(list(lane2.vehicles), vehicles[:2])
+        self.assertEqual(list(lane1.vehicles), vehicles[2:])
+        self.assertEqual((lane1.queue_length, lane2.queue_length), (3, 2))
+
     def test_move_vehicle_to_lane_success(self):
         """Test that a vehicle successfully moves to a new lane when there is space."""
         vehicle = MagicMock(spec=Vehicle)
@@ -162,6 +198,16 @@ class TestArm(unittest.TestCase):
         target_lane.add_vehicle_to_index.assert_not_called()
         self.assertFalse(result)
     
+    def make_lane(self, distances):
+        """ create a lane holding vehicles 2 long with a stopping distance of 3 at the given distances """
+        lane = CarLane({1, 2}, 15, 100, 4)
+        for distance in distances:
+            car = Car(5, 0, 1, distance, 4)
+            car._length = 2
+            car._stopping_distance = 3
+            lane.add_vehicle(car)
+        return lane
+
     def test_enough_space_to_merge_true(self):
         """ Tests vehicles can merge into lane on valid and boundary cases """
         # mock the vehicle we want to merge
@@ -169,38 +215,21 @@ class TestArm(unittest.TestCase):
         car1.distance = 6
         car1.stopping_distance = 3
         car1.length = 2
-        
-        # mock vehicles already in the lane
-        car2 = MagicMock(spec=Vehicle)
-        car3 = MagicMock(spec=Vehicle)
-        car2.distance = 0
-        car2.stopping_distance = 3
-        car2.length = 2
-        car3.distance = 12
-        car3.stopping_distance = 3
-        car3.length = 2
-
-        # mock the lane to merge into
-        lane = MagicMock(spec=Lane)
-        lane.vehicles = [car2, car3]
-        
+
         # assert that we can merge into the lane at index 1
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([0, 12]))
         self.assertEqual(space_to_merge, 1)
 
         # test we can merge into index 0 if no car ahead
-        lane.vehicles = [car3]
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([12]))
         self.assertEqual(space_to_merge, 0)
 
         # test we can merge into the lane if no cars behind
-        lane.vehicles = [car2]
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([0]))
         self.assertEqual(space_to_merge, 1)
 
         # test we can merge into the lane if it is empty
-        lane.vehicles = []
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([]))
         self.assertEqual(space_to_merge, 0)
 
     def test_enough_space_to_merge_false(self):
@@ -210,45 +239,25 @@ class TestArm(unittest.TestCase):
         car1.distance = 6
         car1.stopping_distance = 3
         car1.length = 2
-        
-        # mock vehicles already in the lane
-        car2 = MagicMock(spec=Vehicle)
-        car3 = MagicMock(spec=Vehicle)
-        car2.distance = 3
-        car2.stopping_distance = 3
-        car2.length = 2
-        car3.distance = 12
-        car3.stopping_distance = 3
-        car3.length = 2
-
-        # mock the lane to merge into
-        lane = MagicMock(spec=Lane)
-        lane.vehicles = [car2, car3]
-        
+
         # assert that we can't merge when vehicle ahead is too close
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([3, 12]))
         self.assertEqual(space_to_merge, -1)
 
         # assert we can't merge when the vehicle behind is too closee
-        car2.distance = 0
-        car3.distance = 8
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([0, 8]))
         self.assertEqual(space_to_merge, -1)
 
         # assert we can't merge when vehicle behind has same distance
-        car3.distance = 6
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([0, 6]))
         self.assertEqual(space_to_merge, -1)
 
         # assert we can't merge when vehicle ahead has same distance
-        car2.distance = 6
-        car3.distance = 12
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([6, 12]))
         self.assertEqual(space_to_merge, -1)
 
         # assert we can't merge when any vehicle has a boundary distance
-        car2.distance = 1
-        space_to_merge = self.arm.enough_space_to_merge(car1, lane)
+        space_to_merge = self.arm.enough_space_to_merge(car1, self.make_lane([1, 12]))
         self.assertEqual(space_to_merge, -1)
 
     
@@ -326,6 +335,20 @@ class TestArm(unittest.TestCase):
         car2.distance = 175
         self.assertTrue(self.arm.no_vehicles_within(100))
 
+    def test_nearest_vehicle_distance(self):
+        """ Test the closest vehicle's distance is kept until vehicles move or join a lane """
+        self.assertEqual(self.arm.nearest_vehicle_distance, math.inf)
+
+        # a vehicle joining a lane is picked up straight away
+        car = Car(18, 1, 2, 50, 4)
+        self.arm._lanes[1].add_vehicle(car)
+        self.assertEqual(self.arm.nearest_vehicle_distance, 50)
+
+        # moving the vehicles updates it
+        self.arm.move_all_vehicles(0, 0, Box(2, 3), 1000, 1)
+        self.assertEqual(self.arm.nearest_vehicle_distance, 32)
+        self.assertEqual(self.arm.nearest_vehicle_distance < 100, not self.arm.no_vehicles_within(100))
+
     def test_lane_creation(self):
         """ Tests that bus lanes, car lanes and left turn lanes are properly created """
         # test lane configurations are properly passed in
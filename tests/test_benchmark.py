@@ -0,0 +1,58 @@
+from benchmark import get_scenarios, run_benchmarks, compare_benchmarks, main, FLOW_LEVELS, VARIANTS
+import unittest
+import tempfile
+import json
+import os
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_scenarios(self):
+        """ every flow level should have every lane count and variant that can be built """
+        names = [scenario.name for scenario in get_scenarios()]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("default/3-lane/pedestrian", names)
+        # a single lane can't have a bus lane or a left turn lane
+        self.assertNotIn("light/1-lane/bus", names)
+        self.assertNotIn("light/1-lane/left", names)
+        self.assertEqual(len(names), len(FLOW_LEVELS) * (5 * len(VARIANTS) - 2))
+        self.assertEqual([scenario.name for scenario in get_scenarios("oversaturated/2-lane/*")],
+                         ["oversaturated/2-lane/" + variant for variant in VARIANTS])
+
+    def test_run_benchmarks(self):
+        """ each scenario should report its throughput, memory and KPIs, which are the same every run """
+        results = run_benchmarks("default/2-lane/*", duration=0.5, repeats=1)
+        self.assertEqual(len(results["scenarios"]), len(VARIANTS))
+        for result in results["scenarios"]:
+            self.assertGreater(result["simulated_seconds_per_second"], 0)
+            self.assertAlmostEqual(result["ticks_per_second"], result["simulated_seconds_per_second"] * 10)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+            self.assertGreater(result["vehicles_processed"], 0)
+
+        again = run_benchmarks("default/2-lane/*", duration=0.5, measure_memory=False, repeats=1)
+        self.assertIsNone(again["scenarios"][0]["peak_memory_bytes"])
+        for comparison in compare_benchmarks(results, again, threshold=1):
+            self.assertFalse(comparison["kpi_changed"])
+            self.assertFalse(comparison["regression"])
+
+    def test_compare_benchmarks(self):
+        """ scenarios that lose more than the threshold should be regressions """
+        def run(rates, kpi):
+            return {"scenarios": [{"name": name, "simulated_seconds_per_second": rate, "kpi": kpi} for name, rate in rates.items()]}
+        baseline = run({"a": 100, "b": 100, "c": 100}, [[1, 2, 3]])
+        comparison = compare_benchmarks(baseline, run({"a": 95, "b": 80, "d": 10}, [[1, 2, 4]]), threshold=0.1)
+        self.assertEqual([scenario["name"] for scenario in comparison], ["a", "b"])
+        self.assertEqual([scenario["regression"] for scenario in comparison], [False, True])
+        self.assertTrue(comparison[0]["kpi_changed"])
+
+    def test_main(self):
+        """ the command line should write the results as JSON """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.json")
+            main(["-k", "light/1-lane/plain", "-d", "0.2", "-n", "1", "--no-memory", "-o", path])
+            with open(path) as results_file:
+                results = json.load(results_file)
+        self.assertEqual([result["name"] for result in results["scenarios"]], ["light/1-lane/plain"])
+
+
+if __name__ == "__main__":
+    unittest.main()
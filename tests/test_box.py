@@ -48,5 +48,46 @@ class TestBox(unittest.TestCase):
         #Move again, and check vehicle 0 has left
         self.box.move_all_vehicles(50)
         self.assertNotIn(vehicle0, self.box._vehicles)
-    
+
+    def test_vehicles_in_exit_order(self):
+        """ Test that vehicles are kept in the order they leave, and the throughput counts their source arms """
+        vehicles = [Car(18, 1, 0, -2, 4), Car(18, 2, 0, 0, 4), Car(18, 3, 0, -10, 4)]
+        for vehicle in vehicles:
+            self.box.add_vehicle(vehicle)
+        self.assertEqual(list(self.box.get_vehicles()), [vehicles[2], vehicles[0], vehicles[1]])
+
+        #After 0.5s only the vehicle 8m from the end has left
+        self.box.move_all_vehicles(500)
+        self.assertEqual(list(self.box.get_vehicles()), [vehicles[0], vehicles[1]])
+        self.assertEqual(self.box.get_arm_throughputs(), [0, 0, 0, 1])
+        self.box.move_all_vehicles(500)
+        self.assertEqual(self.box.get_arm_throughputs(), [0, 1, 1, 1])
+
+    def test_conflict_index(self):
+        """ Test that the box answers collision queries from the vehicles currently in it """
+        #A car from arm 2, lane 1, going forwards (relative direction 2)
+        forward_car = Car(18, 2, 0, 0, 4)
+        forward_car.set_source_lane(1)
+        self.box.add_vehicle(forward_car)
+
+        #It blocks left turns from the lane to its right and right turns from the lane to its left
+        self.assertTrue(self.box.is_path_blocked(2, 2, 3))
+        self.assertTrue(self.box.is_path_blocked(2, 0, 1))
+        self.assertFalse(self.box.is_path_blocked(2, 2, 1))
+        self.assertFalse(self.box.is_path_blocked(2, 1, 3))
+        #Vehicles from other arms are never blocked by it
+        self.assertFalse(self.box.is_path_blocked(1, 2, 3))
+        #Only vehicles from other arms going to arm 0 have their destination taken
+        self.assertTrue(self.box.is_destination_taken(0, 1))
+        self.assertFalse(self.box.is_destination_taken(0, 2))
+        self.assertFalse(self.box.is_destination_taken(1, 1))
+
+        #Once the car has left, nothing is blocked
+        self.box.move_all_vehicles(1000)
+        self.assertFalse(self.box.is_path_blocked(2, 2, 3))
+        self.assertFalse(self.box.is_destination_taken(0, 1))
+
+        #Vehicles put straight into the box's store are indexed too
+        self.box.get_vehicles().append(forward_car)
+        self.assertTrue(self.box.is_path_blocked(2, 2, 3))
 
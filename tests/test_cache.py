@@ -0,0 +1,83 @@
+from cache import ResultCache, scenario_key, simulator_version
+from sweep import create_jobs
+import unittest
+import tempfile
+import sqlite3
+import os
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        """ create an empty cache and a job to key before each test """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "results.sqlite")
+        self.cache = ResultCache(self.path)
+        self.traffic_data = [[0, 100, 100, 100], [100, 0, 100, 100], [100, 100, 0, 100], [100, 100, 100, 0]]
+        self.job = create_jobs([2], [(False, False, False)], seed=1)[0]
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_put_and_get(self):
+        """ stored results should be read back, even after reopening the cache """
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.put("key", {"kpi": [[1.5, 2, 3]] * 4, "arm_throughputs": [1, 2, 3, 4]})
+        self.cache.close()
+
+        self.cache = ResultCache(self.path)
+        self.assertEqual(self.cache.get("key"), {"kpi": [[1.5, 2, 3]] * 4, "arm_throughputs": [1, 2, 3, 4]})
+        self.assertEqual(len(self.cache), 1)
+
+    def test_prune(self):
+        """ the least recently used results should be removed once there are too many """
+        for key in ["a", "b", "c"]:
+            self.cache.put(key, {"kpi": key})
+        self.cache.get("a")
+        self.assertEqual(self.cache.prune(5), 0)
+        self.assertEqual(self.cache.prune(2), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(len(self.cache), 2)
+        self.cache.close()
+
+        self.cache = ResultCache(self.path, max_entries=1)
+        self.assertEqual(self.cache.get("a"), {"kpi": "a"})
+        self.assertEqual(len(self.cache), 1)
+
+    def test_old_cache(self):
+        """ a cache written before results were evicted should still be read, its results going first """
+        self.cache.close()
+        os.remove(self.path)
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("CREATE TABLE results (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+            connection.execute("INSERT INTO results (key, result) VALUES ('old', '{}')")
+        connection.close()
+
+        self.cache = ResultCache(self.path)
+        self.cache.put("new", {})
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.prune(1), 1)
+        self.assertIsNone(self.cache.get("old"))
+        self.assertEqual(self.cache.get("new"), {})
+
+    def test_scenario_key(self):
+        """ the key should change with anything that changes the results and nothing else """
+        key = scenario_key(self.job, self.traffic_data, 60000, 100, p_crossing_time_s=15, p_crossing_freq=10, bus_ratio=1)
+        self.assertEqual(len(simulator_version()), 64)
+        #The same scenario written differently
+        self.assertEqual(key, scenario_key(self.job, [[float(value) for value in row] for row in self.traffic_data], 60000, 100,
+                                           bus_ratio=1.0, p_crossing_freq=10, p_crossing_time_s=15))
+        #Crossing parameters don't matter without a crossing
+        self.assertEqual(key, scenario_key(self.job, self.traffic_data, 60000, 100, p_crossing_time_s=20, bus_ratio=1))
+
+        self.assertNotEqual(key, scenario_key(self.job, self.traffic_data, 120000, 100, bus_ratio=1))
+        self.assertNotEqual(key, scenario_key(self.job, self.traffic_data, 60000, 100, bus_ratio=2))
+        other_seed = create_jobs([2], [(False, False, False)], seed=2)[0]
+        self.assertNotEqual(key, scenario_key(other_seed, self.traffic_data, 60000, 100, bus_ratio=1))
+        self.job.pedestrian_crossing = True
+        self.assertNotEqual(key, scenario_key(self.job, self.traffic_data, 60000, 100, p_crossing_time_s=15, p_crossing_freq=10, bus_ratio=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -85,4 +85,244 @@ class TestJunction(unittest.TestCase):
         self.assertAlmostEqual(cars[2].distance, 3.2)
         self.assertIn(cars[0], self.junction._box._vehicles)
         self.assertIn(cars[1], self.junction._box._vehicles)
-        self.assertIn(cars[2], self.junction._arms[0]._lanes[0]._vehicles)
\ No newline at end of file
+        self.assertIn(cars[2], self.junction._arms[0]._lanes[0]._vehicles)
+
+    def test_event_driven_matches_fixed_step(self):
+        """ Test that skipping idle stretches gives exactly the same results as stepping through them """
+        traffic_data = [[0, 60, 120, 60], [60, 0, 60, 120], [120, 60, 0, 60], [60, 120, 60, 0]]
+        configurations = [{"num_lanes": 2},
+                          {"num_lanes": 3, "pedestrian_crossing": True, "p_crossing_time_s": 10, "p_crossing_freq": 30},
+                          {"num_lanes": 3, "bus_lane": True, "bus_ratio": 20}]
+        for configuration in configurations:
+            with self.subTest(**configuration):
+                results = []
+                for event_driven in (False, True):
+                    junction = Junction(traffic_data, seed=3, **configuration)
+                    junction.simulate(10 * 60 * 1000, 100, event_driven=event_driven)
+                    positions = [(vehicle.distance, vehicle.wait_time) for arm in junction._arms
+                                 for lane in arm._lanes for vehicle in lane.vehicles]
+                    results.append((junction.get_kpi(), junction.get_arm_throughputs(), positions))
+                self.assertEqual(results[0], results[1])
+
+    def test_event_driven_skips_idle_steps(self):
+        """ Test that a queue held at a red light is skipped over rather than stepped through """
+        car = Car(18, 1, 3, 0, 4)
+        self.junction._arms[1]._lanes[0].add_vehicle(car)
+        self.junction.update = MagicMock(wraps=self.junction.update)
+        # the light turns red in the first step, then the gap runs for longer than is simulated
+        self.junction.simulate(4000, 100, event_driven=True)
+
+        self.assertEqual(self.junction.update.call_count, 1)
+        self.assertEqual(car.wait_time, 4000)
+        self.assertEqual(self.junction._traffic_light._traffic_light_gap_timer_ms, 1100)
+
+    def test_step_callback(self):
+        """ Test that the step callback sees the time simulated so far and can stop the simulation """
+        elapsed = []
+        def step_callback(elapsed_ms):
+            elapsed.append(elapsed_ms)
+            return elapsed_ms < 3000
+        self.junction.simulate(10000, 100, step_callback=step_callback)
+
+        self.assertEqual(elapsed, list(range(100, 3100, 100)))
+        self.assertEqual(self.junction.get_elapsed_ms(), 3000)
+
+    def test_queue_length_samples(self):
+        """ Test that queue lengths are sampled per junction at the given interval, keeping only the latest samples """
+        junction = Junction(np.zeros((4, 4)).tolist(), queue_sample_interval_ms=1000, max_queue_samples=3)
+        junction._arms[2]._lanes[0].add_vehicle(Car(0, 2, 0, 50, 4))
+        junction.simulate(5000, 100)
+
+        times, lengths = junction.get_queue_length_samples()
+        self.assertEqual(times.tolist(), [3000, 4000, 5000])
+        self.assertEqual(lengths.tolist(), [[0, 0, 1, 0]] * 3)
+        # other junctions keep their own samples
+        self.assertEqual(len(self.junction.get_queue_length_samples()[0]), 0)
+
+    def test_queue_length_default_interval(self):
+        """ Test that by default queue lengths are sampled ten times over a simulation """
+        self.junction.simulate(10000, 100)
+        times, lengths = self.junction.get_queue_length_samples()
+        self.assertEqual(times.tolist(), [1000 * i for i in range(1, 11)])
+        self.assertEqual(lengths.shape, (10, 4))
+
+    def test_arrival_schedule(self):
+        """ Test that arrivals are drawn ahead in time order, at about the requested rate, and repeat for a seed """
+        traffic_data = [[0, 600, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [3600, 0, 0, 0]]
+        junction = Junction(traffic_data, seed=4)
+        junction.create_new_vehicles(100)
+
+        times = junction._arrival_times_ms
+        self.assertEqual(junction._scheduled_until_ms, Junction.ARRIVAL_CHUNK_MS)
+        self.assertTrue(np.all(np.diff(times) >= 0))
+        self.assertTrue(np.all(times < Junction.ARRIVAL_CHUNK_MS))
+        #Each pair's first vehicle arrives straight away
+        self.assertEqual(sorted(junction._arrival_pairs[:2].tolist()), [1, 12])
+        #About 10 vehicles a minute from arm 0 and 60 from arm 3
+        self.assertAlmostEqual(np.count_nonzero(junction._arrival_pairs == 1), 10, delta=8)
+        self.assertAlmostEqual(np.count_nonzero(junction._arrival_pairs == 12), 60, delta=20)
+
+        repeat = Junction(traffic_data, seed=4)
+        repeat.create_new_vehicles(100)
+        np.testing.assert_array_equal(repeat._arrival_times_ms, times)
+
+    def test_kpi_lower_bounds(self):
+        """ Test that the bounds are never above the KPIs reached, and that finding them doesn't change the simulation """
+        traffic_data = [[0, 400, 400, 400], [400, 0, 400, 400], [400, 400, 0, 400], [400, 400, 400, 0]]
+        junction = Junction(traffic_data, [{1}, {2, 3}], seed=6)
+        junction.simulate(30000, 100)
+        bounds = junction.get_kpi_lower_bounds(120000)
+        junction.simulate(90000, 100)
+
+        for arm_kpi, arm_bounds in zip(junction.get_kpi(), bounds):
+            for kpi, bound in zip(arm_kpi, arm_bounds):
+                self.assertLessEqual(bound, kpi)
+        #The average wait so far is already part way to the final one
+        self.assertGreater(bounds[0][0], 0)
+
+        repeat = Junction(traffic_data, [{1}, {2, 3}], seed=6)
+        repeat.simulate(120000, 100)
+        self.assertEqual(repeat.get_kpi(), junction.get_kpi())
+
+    def test_warm_up(self):
+        """ Test that KPIs leave out the warm-up period without changing the simulation, stepping either way """
+        traffic_data = [[0, 600, 600, 600], [600, 0, 600, 600], [600, 600, 0, 600], [600, 600, 600, 0]]
+        junction = Junction(traffic_data, [{1}, {2, 3}], seed=4)
+        junction.simulate(120000, 100)
+        warmed_up = Junction(traffic_data, [{1}, {2, 3}], seed=4, warm_up_ms=60000)
+        self.assertEqual(warmed_up.get_kpi_lower_bounds(120000), [[0, 0, 0]] * 4)
+        warmed_up.simulate(120000, 100)
+        event_driven = Junction(traffic_data, [{1}, {2, 3}], seed=4, warm_up_ms=60000)
+        event_driven.simulate(120000, 100, event_driven=True)
+
+        self.assertEqual(warmed_up.get_warm_up_ms(), 60000)
+        self.assertLess(sum(warmed_up.get_total_car_count()), sum(junction.get_total_car_count()))
+        self.assertLess(sum(warmed_up.get_arm_throughputs()), sum(junction.get_arm_throughputs()))
+        self.assertEqual(event_driven.get_kpi(), warmed_up.get_kpi())
+        self.assertEqual(event_driven.get_arm_throughputs(), warmed_up.get_arm_throughputs())
+        #Queue lengths are only sampled after the warm-up, like the KPIs
+        sample_times, _ = warmed_up.get_queue_length_samples()
+        self.assertEqual(sample_times.tolist(), list(range(60000, 120001, 12000)))
+        #The vehicles themselves move exactly as without a warm-up
+        for arm, warmed_up_arm in zip(junction._arms, warmed_up._arms):
+            self.assertEqual(arm.get_current_queue_length(), warmed_up_arm.get_current_queue_length())
+
+    def test_simulate_until_steady(self):
+        """ Test that a steady junction stops early with a narrow interval, and a run is cut off at the longest time """
+        traffic_data = [[0, 600, 600, 600], [600, 0, 600, 600], [600, 600, 0, 600], [600, 600, 600, 0]]
+        junction = Junction(traffic_data, [{1}, {2, 3}], seed=3)
+        report = junction.simulate_until_steady(60 * 60 * 1000, 100, event_driven=True)
+        self.assertTrue(report["converged"])
+        self.assertLess(report["elapsed_ms"], 60 * 60 * 1000)
+        self.assertEqual(report["elapsed_ms"], junction.get_elapsed_ms())
+        self.assertLessEqual(report["half_width_s"], Junction.STEADY_STATE_PRECISION * report["average_wait_s"])
+        self.assertGreaterEqual(report["batches"], Junction.STEADY_STATE_MIN_BATCHES // 2)
+        self.assertEqual(report["warm_up_ms"], 0)
+
+        #The batches after the transient count towards convergence, so the run ends soon after it is found
+        transient = Junction(traffic_data, [{1}, {2, 3}], seed=1)
+        report = transient.simulate_until_steady(60 * 60 * 1000, 100, event_driven=True)
+        self.assertTrue(report["converged"])
+        self.assertEqual(report["transient_ms"], 120000)
+        self.assertEqual(report["warm_up_ms"], transient.get_warm_up_ms())
+        self.assertEqual(report["elapsed_ms"], report["warm_up_ms"] + Junction.STEADY_STATE_BATCH_MS)
+
+        #The step callback can end the run part way through a batch
+        stopped = Junction(traffic_data, [{1}, {2, 3}], seed=3)
+        report = stopped.simulate_until_steady(60 * 60 * 1000, 100, step_callback=lambda elapsed_ms: elapsed_ms < 90000)
+        self.assertFalse(report["converged"])
+        self.assertEqual(report["elapsed_ms"], 90000)
+
+        short = Junction(traffic_data, [{1}, {2, 3}], seed=3, warm_up_ms=60000)
+        report = short.simulate_until_steady(300000, 100, batch_ms=60000)
+        self.assertFalse(report["converged"])
+        self.assertEqual(report["warm_up_ms"], 60000)
+        self.assertEqual(report["transient_ms"], 60000)
+        self.assertEqual(report["elapsed_ms"], 300000)
+        self.assertEqual(report["batches"], 4)
+
+    def test_adaptive_steps(self):
+        """ Test that adaptive steps are only joined while nothing is about to happen, and stay close to fixed steps """
+        traffic_data = [[0, 500, 500, 500], [500, 0, 500, 500], [500, 500, 0, 500], [500, 500, 500, 0]]
+        fixed = Junction(traffic_data, [{1}, {2, 3}], seed=3)
+        fixed.simulate(600000, 100)
+        #A longest step of one step is the same as fixed steps
+        single = Junction(traffic_data, [{1}, {2, 3}], seed=3, max_step_ms=100)
+        single.simulate(600000, 100)
+        self.assertEqual(single.get_kpi(), fixed.get_kpi())
+
+        adaptive = Junction(traffic_data, [{1}, {2, 3}], seed=3, max_step_ms=1000)
+        adaptive.simulate(600000, 100)
+        self.assertEqual(adaptive.get_elapsed_ms(), 600000)
+        for arm_kpi, fixed_arm_kpi in zip(adaptive.get_kpi(), fixed.get_kpi()):
+            self.assertAlmostEqual(arm_kpi[0], fixed_arm_kpi[0], delta=2)
+
+        #A vehicle about to reach the stop line on a green light is stepped exactly
+        self.junction._arms[0].create_vehicle(Junction.VEHICLE_SPEED_MPS, 0, 1, "Car")
+        self.junction._arms[0].get_lanes()[0].get_first_vehicle().set_position(2)
+        self.assertEqual(self.junction._traffic_light.traffic_light_dir, 0)
+        self.assertEqual(self.junction.get_adaptive_steps(100, 10), 1)
+        #Once the lights have gone red with nothing near the junction, the longest step is taken
+        empty = Junction(np.zeros((4, 4)).tolist(), max_step_ms=1000)
+        empty.update(100)
+        self.assertEqual(empty.get_adaptive_steps(100, 10), 10)
+
+    def test_profiling(self):
+        """ Test that profiling times every phase without changing the simulation, and can be turned off again """
+        traffic_data = [[0, 400, 400, 400], [400, 0, 400, 400], [400, 400, 0, 400], [400, 400, 400, 0]]
+        junction = Junction(traffic_data, [{1}, {1, 2, 3}], seed=2)
+        junction.simulate(120000, 100, event_driven=True)
+        profiled = Junction(traffic_data, [{1}, {1, 2, 3}], seed=2)
+        profile = profiled.enable_profiling()
+        self.assertIs(profiled.enable_profiling(), profile)
+        profiled.simulate(120000, 100, event_driven=True)
+        self.assertEqual(profiled.get_kpi(), junction.get_kpi())
+
+        profile = profile.to_dict()
+        self.assertEqual(profile["phases"]["update"]["calls"], profile["phases"]["create_new_vehicles"]["calls"])
+        self.assertGreater(profile["phases"]["update"]["calls"], 0)
+        for arm_phases in profile["arms"]:
+            self.assertEqual(arm_phases["lane_move_all_vehicles"]["calls"], 2 * arm_phases["move_all_vehicles"]["calls"])
+        for counter in ["vehicle_updates", "merge_checks", "lane_switches", "collision_checks"]:
+            self.assertGreater(profile["counters"][counter], 0)
+
+        # a profiled junction can still be snapshotted, and restores without the profiling
+        restored = Junction.restore(profiled.snapshot())
+        self.assertEqual(restored.get_kpi(), profiled.get_kpi())
+        self.assertIsNone(restored.get_profile())
+
+        self.assertIsNotNone(profiled.disable_profiling())
+        self.assertIsNone(profiled.get_profile())
+        self.assertNotIn("update", vars(profiled))
+        self.assertNotIn("move_all_vehicles", vars(profiled._arms[0].get_lanes()[0]))
+        self.assertIsNone(profiled.disable_profiling())
+
+    def test_snapshot_restore(self):
+        """ Test that a restored junction carries on exactly as the one the snapshot was taken from """
+        traffic_data = [[0, 500, 500, 500], [500, 0, 500, 500], [500, 500, 0, 500], [500, 500, 500, 0]]
+        junction = Junction(traffic_data, [{1}, {2, 3}], pedestrian_crossing=True, p_crossing_time_s=10,
+                            p_crossing_freq=20, bus_lane=True, bus_ratio=10, num_lanes=3, seed=8,
+                            queue_sample_interval_ms=5000)
+        junction.simulate(60000, 100)
+        snapshot = junction.snapshot()
+        restored = Junction.restore(snapshot)
+        self.assertEqual(restored.get_elapsed_ms(), 60000)
+        self.assertEqual(restored.get_kpi(), junction.get_kpi())
+        self.assertEqual([len(arm.get_lanes()[0].vehicles) for arm in restored._arms],
+                         [len(arm.get_lanes()[0].vehicles) for arm in junction._arms])
+
+        junction.simulate(120000, 100)
+        restored.simulate(120000, 100)
+        self.assertEqual(restored.get_kpi(), junction.get_kpi())
+        self.assertEqual(restored.get_arm_throughputs(), junction.get_arm_throughputs())
+        for restored_samples, samples in zip(restored.get_queue_length_samples(), junction.get_queue_length_samples()):
+            np.testing.assert_array_equal(restored_samples, samples)
+
+        # parameters given as NumPy arrays and scalars are stored as plain values
+        junction = Junction(np.array(traffic_data), [{1}, {2, 3}], seed=8, queue_sample_interval_ms=np.int64(5000))
+        junction.simulate(60000, 100)
+        restored = Junction.restore(junction.snapshot())
+        restored.simulate(120000, 100)
+        junction.simulate(120000, 100)
+        self.assertEqual(restored.get_kpi(), junction.get_kpi())
+
@@ -2,6 +2,7 @@ from unittest.mock import MagicMock
 from Lane import CarLane, BusLane, LeftTurnLane
 from Vehicle import Vehicle, Car, Bus
 from Box import Box
+import numpy as np
 import unittest
 
 
@@ -49,6 +50,25 @@ class TestLanes(unittest.TestCase):
         """ should return None when the lane is empty """
         self.assertIsNone(self.lane.get_last_vehicle())
     
+    def test_tail_position(self):
+        """ should return the back of the last vehicle plus its stopping distance, or 0 when the lane is empty """
+        self.assertEqual(self.lane.get_tail_position(), 0)
+        self.lane.add_vehicle(Car(10, 0, 2, 0, 4))
+        self.lane.add_vehicle(Bus(10, 0, 2, 10, 4))
+
+        bus = self.lane.get_last_vehicle()
+        self.assertEqual(self.lane.get_tail_position(), bus.distance + bus.length + bus.stopping_distance)
+
+    def test_merge_index(self):
+        """ should return where a vehicle would go in the lane, or -1 when the vehicles either side are too close """
+        for distance in (0, 20):
+            self.lane.add_vehicle(Car(10, 0, 2, distance, 4))
+
+        self.assertEqual(self.lane.get_merge_index(10, 4.4, 2.2), 1)
+        self.assertEqual(self.lane.get_merge_index(40, 4.4, 2.2), 2)
+        self.assertEqual(self.lane.get_merge_index(5, 4.4, 2.2), -1)
+        self.assertEqual(self.lane.get_merge_index(15, 4.4, 2.2), -1)
+
     def test_vehicle_ahead(self):
         """ should return the vehicle in front of a given vehicle, or None when not found """
         # create mock vehicles
@@ -96,7 +116,8 @@ class TestLanes(unittest.TestCase):
         car4._length = 3
 
         # create lane with mock vehicles
-        self.lane._vehicles = [car1, car2, car3, car4]
+        for car in [car1, car2, car3, car4]:
+            self.lane.add_vehicle(car)
 
         # update the positions of all cars (per 1 second)
         leaving_vehicle = self.lane.move_all_vehicles(False, 1000, None, 2, 3)
@@ -129,7 +150,8 @@ class TestLanes(unittest.TestCase):
         car4._length = 3
 
         # create lane with mock vehicles
-        self.lane._vehicles = [car1, car2, car3, car4]
+        for car in [car1, car2, car3, car4]:
+            self.lane.add_vehicle(car)
 
         # update the positions of all cars (per 1 second)
         leaving_vehicle = self.lane.move_all_vehicles(2, 1000, Box(2, 3), 2, 3)
@@ -142,6 +164,51 @@ class TestLanes(unittest.TestCase):
         self.assertEqual(car3._distance, 8)
         self.assertEqual(car4._distance, 13)
     
+    def test_is_stationary(self):
+        """ a queue is only stationary while its front vehicle is held at a red light and the rest are queued up """
+        box = Box(3, 3)
+        for distance in (0, 6.6, 13.2):
+            self.lane.add_vehicle(Car(10, 0, 2, distance, 4))
+        self.assertTrue(self.lane.is_stationary(1, 100, box, 0, 0))
+        self.assertFalse(self.lane.is_stationary(0, 100, box, 0, 0))
+
+        # a gap in the queue lets the last vehicle move up
+        self.lane.vehicles[2].set_position(20)
+        self.assertFalse(self.lane.is_stationary(1, 100, box, 0, 0))
+
+    def test_move_all_vehicles_batched(self):
+        """ the batched kernel should move the vehicles in the red and green scenarios exactly like the plain loop """
+        for scenario in [self.test_move_all_vehicles_red, self.test_move_all_vehicles_green]:
+            with self.subTest(scenario=scenario.__name__):
+                self.setUp()
+                self.lane.BATCH_MIN_VEHICLES = 1
+                scenario()
+
+    def test_batched_matches_one_at_a_time(self):
+        """ a long queue should end up in the same place whether it is moved in batches or one vehicle at a time """
+        rng = np.random.default_rng(0)
+        lanes = [CarLane({2}, 5, 10000, 4) for _ in range(2)]
+        boxes = [Box(2, 3), Box(2, 3)]
+        lanes[0].BATCH_MIN_VEHICLES = 1
+        lanes[1].BATCH_MIN_VEHICLES = 10000
+
+        # build the same queue of cars and buses with random gaps in both lanes
+        position = 0
+        for _ in range(200):
+            position += rng.uniform(0, 20)
+            for lane in lanes:
+                lane.add_vehicle(Car(18, 0, 2, position, 4) if position % 3 > 1 else Bus(18, 0, 2, position, 4))
+
+        # alternate red and green lights, sending leaving vehicles into the box
+        for tick in range(600):
+            light = 2 if (tick // 100) % 2 else 0
+            for lane, box in zip(lanes, boxes):
+                for vehicle in lane.move_all_vehicles(light, 100, box, 2, 0):
+                    box.add_vehicle(vehicle)
+                box.move_all_vehicles(100)
+            self.assertEqual(lanes[0].vehicles.distance.tolist(), lanes[1].vehicles.distance.tolist())
+            self.assertEqual(lanes[0].vehicles.wait_time.tolist(), lanes[1].vehicles.wait_time.tolist())
+
     def test_has_space_to_move(self):
         """ test that the program accurately determines if a given vehicle has enough space to move """
         # create mock vehicles
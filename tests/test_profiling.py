@@ -0,0 +1,46 @@
+from profiling import PhaseProfile
+import unittest
+
+
+class TestPhaseProfile(unittest.TestCase):
+    def setUp(self):
+        """ create a profile for a junction with two arms before each test """
+        self.profile = PhaseProfile(2)
+
+    def test_timed(self):
+        """ timed functions should return as before and add a call to their phase, even if they raise """
+        double = self.profile.timed(lambda x: x * 2, "double")
+        fail = self.profile.timed(lambda: 1 / 0, "fail", arm=1)
+        self.assertEqual(double(3), 6)
+        self.assertEqual(double(4), 8)
+        self.assertRaises(ZeroDivisionError, fail)
+
+        profile = self.profile.to_dict()
+        self.assertEqual(profile["phases"]["double"]["calls"], 2)
+        self.assertGreaterEqual(profile["phases"]["double"]["seconds"], 0)
+        self.assertEqual(profile["arms"][1]["fail"]["calls"], 1)
+        self.assertEqual(profile["arms"][0], {})
+
+    def test_counted(self):
+        """ counted functions should add 1 a call, or the amount worked out from their result """
+        items = self.profile.counted(lambda n: list(range(n)), "items", len)
+        calls = self.profile.counted(lambda: None, "calls")
+        items(3)
+        items(4)
+        calls()
+        self.profile.count("calls", 2)
+        self.assertEqual(self.profile.to_dict()["counters"], {"items": 7, "calls": 3})
+
+    def test_combine(self):
+        """ combined profiles should add up the times, calls and counters of each """
+        self.profile.timed(lambda: None, "phase", arm=0)()
+        self.profile.count("vehicle_updates", 5)
+        profile = self.profile.to_dict()
+        total = PhaseProfile.combine([profile, profile])
+        self.assertEqual(total["arms"][0]["phase"]["calls"], 2)
+        self.assertEqual(total["counters"]["vehicle_updates"], 10)
+        self.assertEqual(PhaseProfile.combine([])["counters"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
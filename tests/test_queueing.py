@@ -0,0 +1,56 @@
+from queueing import estimate_junction, get_cycle_length_ms, get_lane_wait_s
+from exceptions import NotEnoughLanesException
+from Junction import Junction
+import unittest
+import math
+
+
+class TestQueueing(unittest.TestCase):
+    def setUp(self):
+        """ create the traffic data for a moderately busy junction before each test """
+        self.traffic_data = [[0 if source == dest else 300 for dest in range(4)] for source in range(4)]
+
+    def test_cycle_length(self):
+        """ the cycle should be every arm's interval and gap, stretched by crossings up to one a gap """
+        self.assertEqual(get_cycle_length_ms(20000), 4 * (20000 + Junction.TRAFFIC_LIGHT_GAP_MS))
+        self.assertEqual(get_cycle_length_ms(20000, False, 15, 10), get_cycle_length_ms(20000))
+        self.assertGreater(get_cycle_length_ms(20000, True, 15, 10), get_cycle_length_ms(20000))
+        self.assertEqual(get_cycle_length_ms(20000, True, 15, 1000), 4 * (20000 + Junction.TRAFFIC_LIGHT_GAP_MS + 15000))
+
+    def test_lane_wait(self):
+        """ the wait should grow with traffic and be infinite once the lane can't keep up """
+        self.assertEqual(get_lane_wait_s(0, 2, 0.25, 100), 0)
+        self.assertLess(get_lane_wait_s(0.1, 2, 0.25, 100), get_lane_wait_s(0.3, 2, 0.25, 100))
+        self.assertEqual(get_lane_wait_s(0.5, 2, 0.25, 100), math.inf)
+
+    def test_estimate_shares_lanes(self):
+        """ arrivals should be shared between the lanes they can use """
+        estimate = estimate_junction(self.traffic_data, [{1}, {1, 2, 3}])
+        left, other = estimate.arrival_rates[0]
+        # half the left turners use each lane, and everyone else uses the second
+        self.assertAlmostEqual(left, 150 / 3600)
+        self.assertAlmostEqual(other, 750 / 3600)
+        self.assertLess(estimate.utilisations[0][0], estimate.utilisations[0][1])
+        self.assertFalse(estimate.saturated)
+        self.assertEqual(len(estimate.get_arm_average_waits_s()), 4)
+
+    def test_estimate_saturated(self):
+        """ a junction with more traffic than its lanes can serve should be saturated with an infinite wait """
+        busy = [[0 if source == dest else 1500 for dest in range(4)] for source in range(4)]
+        estimate = estimate_junction(busy, [{1, 2, 3}], num_lanes=1)
+        self.assertTrue(estimate.saturated)
+        self.assertEqual(estimate.get_average_wait_s(), math.inf)
+        self.assertLess(estimate_junction(busy, [{1}, {2}, {2, 3}, {3}], num_lanes=4).max_utilisation, estimate.max_utilisation)
+
+    def test_estimate_bus_lane(self):
+        """ the bus lane should come first and take every bus """
+        estimate = estimate_junction(self.traffic_data, [{1, 2, 3}], num_lanes=2, bus_lane=True, bus_ratio=10)
+        bus_rate, car_rate = estimate.arrival_rates[0]
+        self.assertAlmostEqual(bus_rate, 90 / 3600)
+        self.assertAlmostEqual(car_rate, 810 / 3600)
+        self.assertRaises(NotEnoughLanesException, estimate_junction, self.traffic_data, [], num_lanes=1, bus_lane=True)
+        self.assertRaises(NotEnoughLanesException, estimate_junction, self.traffic_data, [{1, 2}, {3}], left_turn_lanes=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+from steady_state import confidence_half_width, mser_truncation_point
+import unittest
+import numpy as np
+
+
+class TestSteadyState(unittest.TestCase):
+    def test_mser_finds_transient(self):
+        """ the truncation point should be around the end of a rising start """
+        series = np.concatenate([np.linspace(0, 10, 20), 10 + np.random.default_rng(1).normal(0, 0.5, 80)])
+        truncation = mser_truncation_point(series)
+        self.assertGreaterEqual(truncation, 15)
+        self.assertLessEqual(truncation, 25)
+        self.assertEqual(mser_truncation_point(series, batch_size=5) % 5, 0)
+
+    def test_mser_steady_series(self):
+        """ a series without a transient should have nothing dropped, and a short one can't be judged """
+        self.assertEqual(mser_truncation_point(np.full(50, 3.0)), 0)
+        self.assertEqual(mser_truncation_point([4.0]), 0)
+
+    def test_mser_unfinished_transient(self):
+        """ a series still rising should have half or more dropped, as its transient hasn't ended """
+        series = np.linspace(0, 10, 40)
+        self.assertGreaterEqual(mser_truncation_point(series), 20)
+
+    def test_confidence_half_width_columns(self):
+        """ each column should get its own interval """
+        self.assertEqual(confidence_half_width([[1, 4], [3, 4]]).tolist()[1], 0)
+        self.assertEqual(confidence_half_width([[1, 4]]).tolist(), [np.inf, np.inf])
+
+
+if __name__ == "__main__":
+    unittest.main()
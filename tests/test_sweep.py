@@ -0,0 +1,408 @@
+from sweep import create_jobs, simulate_job, iter_sweep, calc_efficiency, lane_dir_presets, run_sweep, load_scenario, main
+from sweep import confidence_half_width, run_replications, run_pruned_sweep, prescreen_jobs, step_size_report, SweepProgress, _mp_context
+from exceptions import SweepCancelledException
+from Junction import Junction
+from cache import ResultCache
+from unittest.mock import patch
+import unittest
+import tempfile
+import time
+import json
+import sys
+import os
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        """ create a small sweep before each test """
+        self.traffic_data = [[0, 100, 100, 100], [100, 0, 100, 100], [100, 100, 0, 100], [100, 100, 100, 0]]
+        self.jobs = create_jobs([2, 3], [(False, False, False), (False, True, False)], seed=1)
+
+    def test_create_jobs(self):
+        """ one job should be created per lane preset, using the presets for one fewer lane with bus lanes """
+        expected = len(lane_dir_presets[1]) + len(lane_dir_presets[0]) + len(lane_dir_presets[2]) + len(lane_dir_presets[1])
+        self.assertEqual(len(self.jobs), expected)
+        self.assertEqual([job.index for job in self.jobs], list(range(expected)))
+        #Bus lane jobs for 3 lanes use the 2 lane presets
+        self.assertEqual(self.jobs[-1].lane_directions, lane_dir_presets[1][-1])
+
+    def test_job_seeds(self):
+        """ seeds should differ between jobs but be reproducible from the sweep seed """
+        seeds = [job.seed for job in self.jobs]
+        self.assertEqual(len(set(seeds)), len(seeds))
+        self.assertEqual(seeds, [job.seed for job in create_jobs([2, 3], [(False, False, False), (False, True, False)], seed=1)])
+
+    def test_common_random_numbers(self):
+        """ with common random numbers every job should share a seed, so every configuration sees the same arrivals """
+        jobs = create_jobs([2, 3], [(False, False, False), (True, True, False)], seed=1, common_random_numbers=True)
+        self.assertEqual(len({job.seed for job in jobs}), 1)
+
+        junctions = [Junction(self.traffic_data, job.lane_directions, num_lanes=job.num_lanes, pedestrian_crossing=job.pedestrian_crossing,
+                              p_crossing_freq=10, bus_lane=job.bus_lane, bus_ratio=10, seed=job.seed) for job in (jobs[0], jobs[-1])]
+        for junction in junctions:
+            junction.schedule_arrivals()
+        self.assertEqual(junctions[0]._arrival_times_ms.tolist(), junctions[1]._arrival_times_ms.tolist())
+        self.assertEqual(junctions[0]._arrival_pairs.tolist(), junctions[1]._arrival_pairs.tolist())
+        self.assertEqual(junctions[0]._arrival_buses.tolist(), junctions[1]._arrival_buses.tolist())
+
+    def test_prescreen_jobs(self):
+        """ saturated and unbuildable jobs should be skipped and the rest ordered by estimated wait """
+        busy = [[0 if source == dest else 900 for dest in range(4)] for source in range(4)]
+        jobs = create_jobs([1, 2, 3], [(False, False, False), (False, True, False)], seed=1)
+        screened = prescreen_jobs(jobs, busy)
+        self.assertTrue(0 < len(screened) < len(jobs))
+        #One lane can't keep up, and one lane with a bus lane can't be built
+        self.assertNotIn(1, [job.num_lanes for job in screened])
+        self.assertEqual(len(prescreen_jobs(jobs, busy, skip_saturated=False)), len(jobs) - 1)
+        #If every job is saturated they are all kept
+        self.assertEqual(len(prescreen_jobs(jobs[:1], busy)), 1)
+
+    def test_simulate_job_deterministic(self):
+        """ simulating the same job twice should give the same results """
+        result1 = simulate_job(self.jobs[0], self.traffic_data, 60000)
+        result2 = simulate_job(self.jobs[0], self.traffic_data, 60000)
+        self.assertEqual(result1.kpi, result2.kpi)
+        self.assertEqual(result1.arm_throughputs, result2.arm_throughputs)
+
+    def test_simulate_job_not_enough_lanes(self):
+        """ presets that can't be built should give no result """
+        job = create_jobs([1], [(False, True, False)])[0]
+        self.assertIsNone(simulate_job(job, self.traffic_data, 60000))
+
+    def test_parallel_matches_serial(self):
+        """ the process pool should give the same results as simulating in this process """
+        jobs = self.jobs[:4]
+        serial = {result.job.index: result.kpi for result in iter_sweep(jobs, self.traffic_data, 60000, workers=1)}
+        parallel = {result.job.index: result.kpi for result in iter_sweep(jobs, self.traffic_data, 60000, workers=2)}
+        self.assertEqual(serial, parallel)
+
+    def test_mp_context(self):
+        """ workers should never be forked from the calling process, and the frozen executable should spawn them """
+        self.assertIn(_mp_context().get_start_method(), ["forkserver", "spawn"])
+        with patch("sys.frozen", True, create=True):
+            self.assertEqual(_mp_context().get_start_method(), "spawn")
+
+    def test_calc_efficiency_perfect(self):
+        """ a junction with no waiting should score 100 """
+        self.assertAlmostEqual(calc_efficiency([0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], 0.3333, 0.3333, 0.3334), 100)
+
+
+class TestHeadlessSweep(unittest.TestCase):
+    def setUp(self):
+        """ create a scenario file before each test """
+        self.directory = tempfile.TemporaryDirectory()
+        self.scenario_path = os.path.join(self.directory.name, "scenario.json")
+        with open(self.scenario_path, "w") as scenario_file:
+            json.dump({"lanes": "2-3", "bus_lane": "maybe", "duration": 1, "seed": 3}, scenario_file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run_sweep_ranked(self):
+        """ results should be sorted by efficiency and not depend on the number of workers """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        results = run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1, workers=1, seed=5)
+        efficiencies = [result.efficiency for result in results]
+        self.assertEqual(efficiencies, sorted(efficiencies, reverse=True))
+        self.assertEqual(len(results), len(lane_dir_presets[1]))
+        parallel = run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1, workers=2, seed=5)
+        self.assertEqual([result.to_dict() for result in results], [result.to_dict() for result in parallel])
+
+    def test_confidence_half_width(self):
+        """ the interval should use Student's t for few samples and be infinite for a single sample """
+        self.assertAlmostEqual(float(confidence_half_width([1, 2, 3])), 4.303 / 3 ** 0.5)
+        self.assertEqual(float(confidence_half_width([5])), float("inf"))
+        self.assertEqual(confidence_half_width([[1, 4], [3, 4]]).tolist()[1], 0)
+
+    def test_run_replications(self):
+        """ every configuration should get between the minimum and maximum replications, and be ranked by mean efficiency """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        results = run_replications(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1,
+                                   workers=1, seed=5, min_replications=2, max_replications=4)
+        self.assertEqual(len(results), len(lane_dir_presets[1]))
+        for result in results:
+            self.assertTrue(2 <= len(result.replications) <= 4)
+            self.assertEqual([replication.job.replication for replication in result.replications], list(range(len(result.replications))))
+            self.assertEqual(result.efficiency, sum(replication.efficiency for replication in result.replications) / len(result.replications))
+        efficiencies = [result.efficiency for result in results]
+        self.assertEqual(efficiencies, sorted(efficiencies, reverse=True))
+
+        #A configuration only stops early once the leader beats it
+        for result in results[1:]:
+            if len(result.replications) < 4:
+                self.assertTrue(result.is_beaten_by(results[0]))
+
+        parallel = run_replications(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1,
+                                    workers=2, seed=5, min_replications=2, max_replications=4)
+        self.assertEqual([result.to_dict() for result in results], [result.to_dict() for result in parallel])
+
+    def test_run_pruned_sweep(self):
+        """ the top configurations should be the same as a full sweep's, however many workers are used """
+        traffic_data = [[0, 400, 400, 400], [400, 0, 400, 400], [400, 400, 0, 400], [400, 400, 400, 0]]
+        arguments = (traffic_data, [2, 3], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+        expected = [result.to_dict() for result in run_sweep(*arguments, workers=1, seed=5)[:2]]
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                results = run_pruned_sweep(*arguments, workers=workers, seed=5, top=2, num_slices=4)
+                self.assertEqual([result.to_dict() for result in results], expected)
+        expected = [result.to_dict() for result in run_sweep(*arguments, workers=1, seed=5, warm_up=1)[:2]]
+        with self.subTest(warm_up=1):
+            results = run_pruned_sweep(*arguments, workers=1, seed=5, top=2, num_slices=4, warm_up=1)
+            self.assertEqual([result.to_dict() for result in results], expected)
+
+    def test_simulate_job_profile(self):
+        """ a profiled job should give the same KPIs as one that isn't, with its profile """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        job = create_jobs([2], [(False, False, False)], seed=3)[0]
+        result = simulate_job(job, traffic_data, 60000)
+        profiled = simulate_job(job, traffic_data, 60000, profile=True)
+        self.assertIsNone(result.profile)
+        self.assertNotIn("profile", result.to_dict())
+        self.assertEqual(profiled.kpi, result.kpi)
+        self.assertEqual(profiled.to_dict()["profile"]["phases"]["update"]["calls"], 600)
+
+    def test_profile_pruned_and_replicated(self):
+        """ pruned and replicated sweeps should profile their simulations too, without changing the results """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        arguments = (traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                results = run_pruned_sweep(*arguments, workers=workers, seed=5, top=2, num_slices=4)
+                profiled = run_pruned_sweep(*arguments, workers=workers, seed=5, top=2, num_slices=4, profile=True)
+                self.assertEqual([result.kpi for result in profiled], [result.kpi for result in results])
+                for result in profiled:
+                    self.assertEqual(result.to_dict()["profile"]["phases"]["update"]["calls"], 600)
+
+        results = run_replications(*arguments, workers=1, seed=5, min_replications=2, max_replications=2)
+        profiled = run_replications(*arguments, workers=1, seed=5, min_replications=2, max_replications=2, profile=True)
+        self.assertEqual([result.kpi for result in profiled], [result.kpi for result in results])
+        self.assertIsNone(results[0].profile)
+        self.assertEqual(profiled[0].to_dict()["profile"]["phases"]["update"]["calls"], 1200)
+
+    def test_prescreen_pruned_and_replicated(self):
+        """ pruned and replicated sweeps should skip the configurations the prescreen does """
+        busy = [[0 if source == dest else 900 for dest in range(4)] for source in range(4)]
+        arguments = (busy, [1, 2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+        screened = {job.index for job in prescreen_jobs(create_jobs([1, 2], [(False, False, False)], seed=5), busy)}
+        self.assertTrue(screened)
+
+        results = run_replications(*arguments, workers=1, seed=5, min_replications=2, max_replications=2, prescreen=True)
+        self.assertLessEqual({result.job.index for result in results}, screened)
+        results = run_pruned_sweep(*arguments, workers=1, seed=5, top=10, prescreen=True)
+        self.assertEqual({result.job.index for result in results}, screened)
+        self.assertNotIn(1, [result.job.num_lanes for result in results])
+
+    def test_run_sweep_until_steady(self):
+        """ a sweep until steady should stop converged configurations early, and be cached apart from a full one """
+        traffic_data = [[0, 600, 600, 600], [600, 0, 600, 600], [600, 600, 0, 600], [600, 600, 600, 0]]
+        arguments = (traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 60)
+        with ResultCache(os.path.join(self.directory.name, "results.sqlite")) as cache:
+            results = run_sweep(*arguments, workers=1, seed=5, cache=cache, steady_state=True)
+            self.assertEqual(len(cache), len(results))
+            self.assertTrue(any(result.steady_state["converged"] for result in results))
+            for result in results:
+                self.assertLessEqual(result.steady_state["elapsed_ms"], 60 * 60 * 1000)
+                self.assertEqual(result.to_dict()["steady_state"], result.steady_state)
+            cached = run_sweep(*arguments, workers=1, seed=5, cache=cache, steady_state=True)
+            self.assertEqual([result.to_dict() for result in cached], [result.to_dict() for result in results])
+
+            with patch("sweep._simulate_jobs", return_value=iter([])) as simulate:
+                run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 60, workers=1, seed=5, cache=cache)
+            self.assertEqual(len(simulate.call_args[0][0]), len(results))
+
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            main([self.scenario_path, "--until-steady", "--top", "2"])
+
+    def test_step_size_report(self):
+        """ the reference should match itself exactly and the recommendation should be within tolerance """
+        traffic_data = [[0, 300, 300, 300], [300, 0, 300, 300], [300, 300, 0, 300], [300, 300, 300, 0]]
+        report = step_size_report(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 2,
+                                  candidates=[(100, None), (100, 1000), (1000, None)], workers=1, seed=5)
+        reference = report["candidates"][0]
+        self.assertEqual(reference["max_efficiency_error"], 0)
+        self.assertTrue(reference["within_tolerance"])
+        self.assertEqual(len(report["candidates"]), 3)
+        self.assertTrue(report["recommended"]["within_tolerance"])
+        self.assertLessEqual(report["recommended"]["seconds"], reference["seconds"])
+
+        # a bus lane can't be built with one lane, so nothing qualifies
+        report = step_size_report([[0, 10, 10, 10]] * 4, [1], [(False, True, False)], (0.3333, 0.3333, 0.3334), 1,
+                                  candidates=[(100, None), (1000, None)], workers=1)
+        self.assertIsNone(report["recommended"])
+        self.assertFalse(any(candidate["within_tolerance"] for candidate in report["candidates"]))
+
+    def test_run_sweep_cached(self):
+        """ a sweep run again should come from the cache, even with different weightings """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        with ResultCache(os.path.join(self.directory.name, "results.sqlite")) as cache:
+            results = run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1, workers=1, seed=5, cache=cache)
+            self.assertEqual(len(cache), len(results))
+            self.assertEqual(len(results[0].queue_times_ms), 10)
+
+            with patch("sweep._simulate_jobs") as simulate:
+                cached = run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1, workers=1, seed=5, cache=cache)
+                reweighted = run_sweep(traffic_data, [2], [(False, False, False)], (0.8, 0.1, 0.1), 1, workers=1, seed=5, cache=cache)
+                pruned = run_pruned_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1, workers=1, seed=5, top=2, cache=cache)
+            self.assertFalse(simulate.call_args_list[0][0][0])
+            self.assertFalse(simulate.call_args_list[1][0][0])
+
+        self.assertEqual([result.to_dict() for result in cached], [result.to_dict() for result in results])
+        self.assertEqual([result.to_dict() for result in pruned], [result.to_dict() for result in results[:2]])
+        uncached = run_sweep(traffic_data, [2], [(False, False, False)], (0.8, 0.1, 0.1), 1, workers=1, seed=5)
+        self.assertEqual([result.to_dict() for result in reweighted], [result.to_dict() for result in uncached])
+
+    def test_run_pruned_sweep_cached(self):
+        """ the configurations a pruned sweep finishes should be cached just as a full sweep would have them """
+        traffic_data = [[0, 400, 400, 400], [400, 0, 400, 400], [400, 400, 0, 400], [400, 400, 400, 0]]
+        arguments = (traffic_data, [2, 3], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+        with ResultCache(os.path.join(self.directory.name, "results.sqlite")) as cache:
+            pruned = run_pruned_sweep(*arguments, workers=1, seed=5, top=2, num_slices=4, cache=cache)
+            self.assertGreaterEqual(len(cache), 2)
+            cached = len(cache)
+            results = run_sweep(*arguments, workers=1, seed=5, cache=cache)
+            self.assertEqual(len(cache), len(results))
+
+        uncached = run_sweep(*arguments, workers=1, seed=5)
+        self.assertEqual(len(results) - cached, len(uncached) - cached)
+        self.assertEqual([result.to_cache_entry() for result in results], [result.to_cache_entry() for result in uncached])
+        self.assertEqual([(result.queue_times_ms, result.queue_lengths) for result in pruned],
+                         [(result.queue_times_ms, result.queue_lengths) for result in uncached[:2]])
+
+    def test_pruned_sweep_progress(self):
+        """ a pruned sweep should count abandoned configurations as done, and stop when cancelled """
+        traffic_data = [[0, 400, 400, 400], [400, 0, 400, 400], [400, 400, 0, 400], [400, 400, 400, 0]]
+        arguments = (traffic_data, [2, 3], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+        progress = SweepProgress()
+        run_pruned_sweep(*arguments, workers=1, seed=5, top=2, num_slices=4, progress=progress)
+        done, total = progress.get_done()
+        self.assertEqual(done, total)
+        self.assertEqual(progress.get_fraction(), 1)
+        self.assertEqual(progress.get_running(), {})
+
+        class CancelAfterFirst(SweepProgress):
+            def set_simulated(self, job, simulated_ms):
+                super().set_simulated(job, simulated_ms)
+                self.cancel()
+
+        progress = CancelAfterFirst()
+        with self.assertRaises(SweepCancelledException):
+            run_pruned_sweep(*arguments, workers=1, seed=5, top=2, num_slices=4, progress=progress)
+        self.assertEqual(len(progress.get_running()), 1)
+
+    def test_sweep_progress(self):
+        """ a finished sweep should be all done, counting configurations that came from the cache """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        progress = SweepProgress()
+        self.assertEqual(progress.get_fraction(), 0)
+        self.assertIsNone(progress.get_eta_s())
+        with ResultCache(os.path.join(self.directory.name, "results.sqlite")) as cache:
+            # simulated in this process, then in worker processes, then all from the cache
+            for workers, sweep_cache in ((1, None), (2, cache), (1, cache)):
+                with self.subTest(workers=workers, cached=len(cache)):
+                    results = run_sweep(traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1,
+                                        workers=workers, seed=5, cache=sweep_cache, progress=progress)
+                    self.assertEqual(progress.get_done(), (len(results), len(results)))
+                    self.assertEqual(progress.get_fraction(), 1)
+                    self.assertEqual(progress.get_eta_s(), 0)
+                    self.assertEqual(progress.get_running(), {})
+
+    def test_sweep_progress_eta(self):
+        """ the ETA should only count time actually simulated, not configurations from the cache """
+        jobs = create_jobs([2], [(False, False, False)], seed=5)
+        progress = SweepProgress()
+        progress.start(jobs, 1000)
+        for job in jobs[:-1]:
+            progress.finish_job(job, simulated=False)
+        self.assertGreater(progress.get_fraction(), 0.5)
+        self.assertIsNone(progress.get_eta_s())
+        progress._simulated_ms[progress.get_slot(jobs[-1])] = 500
+        eta_s = progress.get_eta_s()
+        self.assertAlmostEqual(eta_s, time.perf_counter() - progress._start_time, delta=0.1)
+        self.assertEqual(progress.get_running(), {jobs[-1].index: 500})
+        progress.finish_job(jobs[-1])
+        self.assertEqual(progress.get_eta_s(), 0)
+
+    def test_simulate_job_cancelled(self):
+        """ a job cancelled part way should give no result, but one that finished before the cancel should """
+        job = create_jobs([2], [(False, False, False)], seed=5)[0]
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        original = Junction.simulate
+        def simulate_then_cancel(junction, *args, **kwargs):
+            original(junction, *args, **kwargs)
+            progress.cancel()
+
+        for simulate, stopped_early in ((lambda junction, *args, **kwargs: progress.cancel(), True), (simulate_then_cancel, False)):
+            with self.subTest(stopped_early=stopped_early):
+                progress = SweepProgress()
+                progress.start([job], 60000)
+                with patch("sweep._worker_progress", (progress._simulated_ms, progress._cancel_flag)), \
+                        patch.object(Junction, "simulate", autospec=True, side_effect=simulate):
+                    result = simulate_job(job, traffic_data, 60000, progress_slot=0)
+                if stopped_early:
+                    self.assertIsNone(result)
+                else:
+                    self.assertEqual(result.kpi, simulate_job(job, traffic_data, 60000).kpi)
+
+    def test_cancel_sweep(self):
+        """ a cancelled sweep should raise, keeping what it finished in the cache to carry on from """
+        traffic_data = [[0, 200, 200, 200], [200, 0, 200, 200], [200, 200, 0, 200], [200, 200, 200, 0]]
+        arguments = (traffic_data, [2], [(False, False, False)], (0.3333, 0.3333, 0.3334), 1)
+
+        class CancelAfterFirst(SweepProgress):
+            def finish_job(self, job):
+                super().finish_job(job)
+                self.cancel()
+
+        with ResultCache(os.path.join(self.directory.name, "results.sqlite")) as cache:
+            with self.assertRaises(SweepCancelledException):
+                run_sweep(*arguments, workers=1, seed=5, cache=cache, progress=CancelAfterFirst())
+            self.assertEqual(len(cache), 1)
+
+            progress = SweepProgress()
+            progress.cancel()
+            with self.assertRaises(SweepCancelledException):
+                run_sweep(*arguments, workers=2, seed=5, cache=cache, progress=progress)
+            self.assertEqual(len(cache), 1)
+
+            results = run_sweep(*arguments, workers=1, seed=5, cache=cache, progress=SweepProgress())
+        uncached = run_sweep(*arguments, workers=1, seed=5)
+        self.assertEqual([result.to_dict() for result in results], [result.to_dict() for result in uncached])
+
+    def test_load_scenario(self):
+        """ scenarios should be expanded the same way as the GUI inputs, with GUI defaults for missing values """
+        scenario = load_scenario(self.scenario_path)
+        self.assertEqual(scenario["lane_configs"], [2, 3])
+        self.assertEqual(scenario["combinations"], [(False, False, False), (False, True, False)])
+        self.assertEqual(scenario["traffic_data"][0], [0, 100, 100, 100])
+        self.assertEqual(scenario["weights"], (0.3333, 0.3333, 0.3334))
+        self.assertEqual(scenario["seed"], 3)
+        self.assertFalse(scenario["common_random_numbers"])
+
+    def test_load_yaml_scenario(self):
+        """ YAML scenarios should be read the same as JSON ones """
+        yaml_path = os.path.join(self.directory.name, "scenario.yaml")
+        with open(yaml_path, "w") as scenario_file:
+            scenario_file.write("lanes: 4\npedestrian_crossing: yes\n")
+        scenario = load_scenario(yaml_path)
+        self.assertEqual(scenario["lane_configs"], [4])
+        self.assertEqual(scenario["combinations"], [(True, False, False)])
+
+    def test_command_line(self):
+        """ the command line should write every configuration, most efficient first """
+        output_path = os.path.join(self.directory.name, "results.json")
+        main([self.scenario_path, "-o", output_path, "-w", "1"])
+        with open(output_path) as output_file:
+            ranked = json.load(output_file)
+        self.assertEqual(len(ranked), len(lane_dir_presets[1]) * 2 + len(lane_dir_presets[2]) + len(lane_dir_presets[0]))
+        self.assertGreaterEqual(ranked[0]["efficiency"], ranked[-1]["efficiency"])
+        #The GUI should never be loaded
+        self.assertNotIn("pygame", sys.modules)
+
+    def test_command_line_step_report(self):
+        """ the step report should take the prescreen, and refuse options that would spoil its timings """
+        with patch("sweep.step_size_report", return_value={"recommended": None}) as report, patch("sys.stderr") as stderr:
+            main([self.scenario_path, "-o", os.path.join(self.directory.name, "report.json"), "--step-report", "--prescreen"])
+        self.assertTrue(report.call_args.kwargs["prescreen"])
+        self.assertTrue(stderr.write.called)
+        for option in ["--profile", "--cache=results.sqlite"]:
+            with self.subTest(option=option), patch("sys.stderr"), self.assertRaises(SystemExit):
+                main([self.scenario_path, "--step-report", option])
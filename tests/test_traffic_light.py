@@ -253,6 +253,26 @@ class TestPedestrianCrossing(unittest.TestCase):
         self.assertEqual(self.t._traffic_light_dir, 0)
 
 
+    def test_skip_steps_matches_updates(self):
+        """ Test that skipping to the next change gives the same light and crossing timers as stepping there """
+        junctions = [Junction(np.zeros((4,4)).tolist(), num_lanes = 3, pedestrian_crossing = True,
+                              p_crossing_freq = 60, p_crossing_time_s = 10, seed = 1) for _ in range(2)]
+        for junction in junctions:
+            for i in range(4):
+                junction._arms[i]._lanes[1]._vehicles.append(Car(0, i, 0, 50, 4))
+        skipped, stepped = [junction._traffic_light for junction in junctions]
+        arms = junctions[0]._arms
+
+        for _ in range(30):
+            steps = skipped.get_steps_until_change(100, arms)
+            skipped.skip_steps(steps, 100, arms)
+            skipped.update_traffic_light(100, arms)
+            for _ in range(steps + 1):
+                stepped.update_traffic_light(100, arms)
+            skipped_state, stepped_state = dict(vars(skipped)), dict(vars(stepped))
+            del skipped_state["_random"], stepped_state["_random"]
+            self.assertEqual(skipped_state, stepped_state)
+
     def normal_cycle_test(self):
         """ Called by other tests to check pedestrian crossing requests are handled correctly"""
         #Wait 10 seconds
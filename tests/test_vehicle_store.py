@@ -0,0 +1,128 @@
+from VehicleStore import VehicleStore
+from Vehicle import Car, Bus
+import numpy as np
+import unittest
+import pickle
+
+
+class TestVehicleStore(unittest.TestCase):
+    def setUp(self):
+        """ create a store holding three cars before each test """
+        self.cars = [Car(18, 0, 1, distance, 4) for distance in (5, 15, 25)]
+        self.store = VehicleStore(self.cars, capacity=2)
+
+    def test_columns_match_vehicles(self):
+        """ the columns should hold each vehicle's attributes in queue order """
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store.distance.tolist(), [5, 15, 25])
+        self.assertEqual(self.store.length.tolist(), [4.4, 4.4, 4.4])
+        self.assertEqual(self.store.speed.tolist(), [18, 18, 18])
+        self.assertEqual(self.store.destination.tolist(), [1, 1, 1])
+        self.assertEqual(list(self.store), self.cars)
+
+    def test_vehicles_are_views(self):
+        """ writing a column should update the vehicle and setting the vehicle should update the column """
+        self.store.distance[:] -= 5
+        self.assertEqual([car.distance for car in self.cars], [0, 10, 20])
+
+        self.cars[1].set_position(12)
+        self.cars[2].update_wait_time(100)
+        self.assertEqual(self.store.distance[1], 12)
+        self.assertEqual(self.store.wait_time.tolist(), [0, 0, 100])
+
+    def test_source_lane_none(self):
+        """ a vehicle without a source lane should read back None """
+        self.assertIsNone(self.cars[0].source_lane)
+        self.cars[0].set_source_lane(2)
+        self.assertEqual(self.cars[0].source_lane, 2)
+        self.assertEqual(self.store.source_lane.tolist(), [2, VehicleStore.NO_LANE, VehicleStore.NO_LANE])
+
+    def test_insert(self):
+        """ inserting should shift the vehicles behind back and keep the columns in step """
+        bus = Bus(18, 0, 2, 10, 4)
+        self.store.insert(1, bus)
+
+        self.assertEqual(list(self.store), [self.cars[0], bus, self.cars[1], self.cars[2]])
+        self.assertEqual(self.store.distance.tolist(), [5, 10, 15, 25])
+        self.assertEqual(self.store.index(self.cars[2]), 3)
+        self.assertEqual(self.store.length[1], 10)
+
+    def test_remove(self):
+        """ a removed vehicle should keep its attributes and no longer be in the store """
+        self.cars[1].update_wait_time(300)
+        self.store.remove(self.cars[1])
+
+        self.assertNotIn(self.cars[1], self.store)
+        self.assertEqual(self.cars[1].distance, 15)
+        self.assertEqual(self.cars[1].wait_time, 300)
+        self.assertEqual(self.store.distance.tolist(), [5, 25])
+        self.assertEqual(self.store.index(self.cars[2]), 1)
+        self.assertRaises(ValueError, self.store.remove, self.cars[1])
+
+    def test_remove_front(self):
+        """ removing the front vehicle should leave the rows of the vehicles behind it where they are """
+        slots = [car._slot for car in self.cars]
+        self.store.remove(self.cars[0])
+
+        self.assertEqual([car._slot for car in self.cars[1:]], slots[1:])
+        self.assertEqual(self.store.index(self.cars[1]), 0)
+        self.assertEqual(self.store.distance.tolist(), [15, 25])
+
+        # the freed row is reused by a vehicle joining the front, and the queue moves up when the back is full
+        self.store.insert(0, self.cars[0])
+        for distance in (35, 45, 55):
+            self.store.append(Car(18, 0, 1, distance, 4))
+        self.assertEqual(self.store.distance.tolist(), [5, 15, 25, 35, 45, 55])
+        self.assertEqual([self.store.index(car) for car in self.store], list(range(6)))
+        self.assertEqual(self.cars[2].distance, 25)
+
+    def test_remove_where(self):
+        """ every masked vehicle should be removed and the rest kept in order """
+        removed = self.store.remove_where(np.array([True, False, True]))
+
+        self.assertEqual(removed, [self.cars[0], self.cars[2]])
+        self.assertEqual(list(self.store), [self.cars[1]])
+        self.assertEqual(self.store.distance.tolist(), [15])
+        self.assertEqual(self.cars[2].distance, 25)
+
+    def test_remove_front_vehicles(self):
+        """ removing from the front should return the vehicles in queue order and keep the rest in their rows """
+        slot = self.cars[2]._slot
+        removed = self.store.remove_front(2)
+
+        self.assertEqual(removed, self.cars[:2])
+        self.assertEqual(self.cars[1].distance, 15)
+        self.assertEqual(list(self.store), [self.cars[2]])
+        self.assertEqual(self.cars[2]._slot, slot)
+        self.assertEqual(self.store.distance.tolist(), [25])
+
+    def test_moving_between_stores(self):
+        """ adding a vehicle to another store should take it out of the one it was in """
+        other = VehicleStore()
+        other.append(self.cars[0])
+
+        self.assertNotIn(self.cars[0], self.store)
+        self.assertIn(self.cars[0], other)
+        self.assertEqual(self.store.distance.tolist(), [15, 25])
+        self.assertEqual(other.distance.tolist(), [5])
+
+    def test_pickle(self):
+        """ a pickled store should come back with its vehicles still views onto its columns """
+        self.store.remove_front(1)
+        store = pickle.loads(pickle.dumps(self.store))
+
+        self.assertEqual(store.distance.tolist(), [15, 25])
+        self.assertEqual([car.distance for car in store], [15, 25])
+        store[0].set_position(10)
+        self.assertEqual(store.distance.tolist(), [10, 25])
+        self.assertEqual(self.cars[1].distance, 15)
+
+    def test_unsupported_changes(self):
+        """ changing the list other than through the store's methods should fail """
+        self.assertRaises(TypeError, self.store.pop)
+        self.assertRaises(TypeError, self.store.__delitem__, 0)
+        self.assertEqual(len(self.store), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()